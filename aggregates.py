@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+from datetime import date, datetime
+
+from parallel_aggregates import CODE_RANGE, default_workers, group_rows, parallel_groups
+
+ROLLUP_VERSION = 1
+LEVELS = ('day', 'week', 'month', 'year')
+_LEVEL_INDEX = {'day': 0, 'week': 1, 'month': 2, 'year': 3, 'all': 4}
+
+
+class Bucket:
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.category_totals = {}
+        self.category_counts = {}
+        # Day number -> expenses on that day, so distinct days survive removals
+        self.day_counts = {}
+
+    def add(self, day, amount, code, sign=1):
+        self.total += sign * amount
+        self.count += sign
+        self.category_totals[code] = self.category_totals.get(code, 0.0) + sign * amount
+        self.category_counts[code] = self.category_counts.get(code, 0) + sign
+        self.day_counts[day] = self.day_counts.get(day, 0) + sign
+        if self.category_counts[code] == 0:
+            del self.category_counts[code]
+            del self.category_totals[code]
+        if self.day_counts[day] == 0:
+            del self.day_counts[day]
+
+    def merge(self, day, code, amount, count):
+        # A whole (day, category) group at once, as produced by group_rows
+        self.total += amount
+        self.count += count
+        self.category_totals[code] = self.category_totals.get(code, 0.0) + amount
+        self.category_counts[code] = self.category_counts.get(code, 0) + count
+        self.day_counts[day] = self.day_counts.get(day, 0) + count
+
+    @property
+    def distinct_days(self):
+        return len(self.day_counts)
+
+    def top_category(self):
+        if not self.category_totals:
+            return None, 0.0
+        return max(self.category_totals.items(), key=lambda x: x[1])
+
+
+EMPTY_BUCKET = Bucket()
+
+
+def period_key(time_filter, today=None):
+    today = (today or datetime.now()).date()
+
+    if time_filter == "This Week":
+        return ('week', today.toordinal() - today.weekday())
+    elif time_filter == "This Month":
+        return ('month', today.year, today.month)
+    elif time_filter == "Last Month":
+        if today.month == 1:
+            return ('month', today.year - 1, 12)
+        return ('month', today.year, today.month - 1)
+    elif time_filter == "This Year":
+        return ('year', today.year)
+    return ('all',)
+
+
+def _next_key(key):
+    level = key[0]
+    if level == 'day':
+        return ('day', key[1] + 1)
+    if level == 'week':
+        return ('week', key[1] + 7)
+    if level == 'month':
+        return ('month', key[1] + key[2] // 12, key[2] % 12 + 1)
+    return ('year', key[1] + 1)
+
+
+def trend_span(time_filter, today=None):
+    # (level, first key, last key) for a period's time series: days for a week
+    # or month, months for a year, months over the whole history otherwise
+    key = period_key(time_filter, today)
+    if key[0] == 'week':
+        return 'day', ('day', key[1]), ('day', key[1] + 6)
+    if key[0] == 'month':
+        start = date(key[1], key[2], 1)
+        end = date(key[1] + key[2] // 12, key[2] % 12 + 1, 1)
+        return 'day', ('day', start.toordinal()), ('day', end.toordinal() - 1)
+    if key[0] == 'year':
+        return 'month', ('month', key[1], 1), ('month', key[1], 12)
+    return 'month', None, None
+
+
+def rollup_path(data_path):
+    # Rollups live next to the data: premium_expenses.json -> premium_expenses.rollups.json
+    return os.path.splitext(data_path)[0] + '.rollups.json'
+
+
+def key_label(key):
+    level = key[0]
+    if level in ('day', 'week'):
+        return date.fromordinal(key[1]).strftime("%Y-%m-%d")
+    if level == 'month':
+        return f"{key[1]}-{key[2]:02d}"
+    return str(key[1])
+
+
+class AggregateEngine:
+    # Rollup cube: running totals per (period bucket, category) for every day,
+    # week, month and year that has expenses, so any period view is a dictionary
+    # lookup and any time series is a walk over one level's buckets
+    def __init__(self, store, rebuild=True, workers=None):
+        self.store = store
+        self.buckets = {}
+        self._day_keys = {}
+        # Processes used for bulk builds; None picks by data size and core count
+        self.workers = workers
+        if rebuild:
+            self.rebuild()
+
+    def rebuild(self):
+        self.buckets = {}
+        self.add_rows(0, len(self.store))
+
+    def add_rows(self, start, stop):
+        # Bulk path: rows are grouped by (day, category) first, in worker
+        # processes for large ranges, then each group is folded into its buckets
+        store = self.store
+        if stop <= start:
+            return
+        workers = self.workers or default_workers(stop - start)
+        if workers > 1:
+            totals, counts = parallel_groups(store.days, store.amounts, store.category_codes,
+                                             start, stop, workers)
+        else:
+            with memoryview(store.days) as days, memoryview(store.amounts) as amounts, \
+                    memoryview(store.category_codes) as codes:
+                totals, counts = group_rows(days[start:stop], amounts[start:stop], codes[start:stop])
+        buckets = self.buckets
+        for key, total in totals.items():
+            day, code = divmod(key, CODE_RANGE)
+            count = counts[key]
+            for bucket_key in self._keys_for_day(day):
+                bucket = buckets.get(bucket_key)
+                if bucket is None:
+                    bucket = buckets[bucket_key] = Bucket()
+                bucket.merge(day, code, total, count)
+        # Tombstoned rows were grouped with the rest; take them back out
+        for row in store.deleted:
+            if start <= row < stop:
+                self.remove_row(row)
+
+    def add_row(self, row, sign=1):
+        store = self.store
+        self.add(store.days[row], store.amounts[row], store.category_codes[row], sign)
+
+    def remove_row(self, row):
+        self.add_row(row, sign=-1)
+
+    def add(self, day, amount, code, sign=1):
+        for key in self._keys_for_day(day):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = Bucket()
+            bucket.add(day, amount, code, sign)
+
+    def _keys_for_day(self, day):
+        keys = self._day_keys.get(day)
+        if keys is None:
+            d = date.fromordinal(day)
+            keys = self._day_keys[day] = (
+                ('day', day),
+                ('week', day - d.weekday()),
+                ('month', d.year, d.month),
+                ('year', d.year),
+                ('all',)
+            )
+        return keys
+
+    def bucket_for(self, level, day):
+        # The level's bucket containing a day, e.g. the month an expense falls in
+        return self.buckets.get(self._keys_for_day(day)[_LEVEL_INDEX[level]], EMPTY_BUCKET)
+
+    def period(self, time_filter, today=None):
+        return self.buckets.get(period_key(time_filter, today), EMPTY_BUCKET)
+
+    def category_totals(self, bucket):
+        names = self.store.category_names
+        return {names[code]: total for code, total in bucket.category_totals.items()}
+
+    def series(self, level, category_code=None, first=None, last=None):
+        # (keys, totals) for every bucket of the level from first to last (by
+        # default the first and last expense), with empty periods as zeros;
+        # never touches the rows
+        span = self._span(level, first, last)
+        buckets = self.buckets
+        if category_code is None:
+            return span, [buckets.get(key, EMPTY_BUCKET).total for key in span]
+        return span, [buckets.get(key, EMPTY_BUCKET).category_totals.get(category_code, 0.0) for key in span]
+
+    def category_series(self, level, top=None, first=None, last=None):
+        # (keys, {category name: totals aligned with keys}), largest categories first
+        span = self._span(level, first, last)
+        buckets = [self.buckets.get(key, EMPTY_BUCKET) for key in span]
+        totals = {}
+        for bucket in buckets:
+            for code, total in bucket.category_totals.items():
+                totals[code] = totals.get(code, 0.0) + total
+        codes = sorted(totals, key=lambda code: -totals[code])[:top]
+        names = self.store.category_names
+        return span, {names[code]: [bucket.category_totals.get(code, 0.0) for bucket in buckets]
+                      for code in codes}
+
+    def _span(self, level, first, last):
+        if first is None or last is None:
+            keys = [key for key in self.buckets if key[0] == level]
+            if not keys:
+                return []
+            first = first or min(keys)
+            last = last or max(keys)
+        span = [first]
+        while span[-1] < last:
+            span.append(_next_key(span[-1]))
+        return span
+
+    # Persistence: the cube is saved next to the data file and reloaded with a
+    # fingerprint of the rows it covers, so startup only folds in newer rows.
+    # The fingerprint hashes every column the cube is built from, so an edit
+    # or delete made by another writer (the service, a script) is caught too.
+
+    def _fingerprint(self, rows, categories):
+        store = self.store
+        digest = hashlib.sha256()
+        for column in (store.ids, store.days, store.amounts, store.category_codes):
+            digest.update(memoryview(column).cast('B')[:rows * column.itemsize])
+        digest.update(json.dumps([store.category_names[:categories],
+                                  sorted(row for row in store.deleted if row < rows)],
+                                 ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def save(self, path):
+        names = self.store.category_names
+        buckets = []
+        for key, bucket in self.buckets.items():
+            buckets.append([
+                list(key), bucket.total, bucket.count,
+                {names[code]: total for code, total in bucket.category_totals.items()},
+                {names[code]: count for code, count in bucket.category_counts.items()},
+                bucket.day_counts
+            ])
+        categories = len(names)
+        data = {
+            'version': ROLLUP_VERSION,
+            'rows': len(self.store),
+            'categories': categories,
+            'fingerprint': self._fingerprint(len(self.store), categories),
+            'buckets': buckets
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, store, path, workers=None):
+        # Saved cube plus the rows appended since, or a full rebuild if the file
+        # is missing, from another version, or does not match the data
+        engine = cls(store, rebuild=False, workers=workers)
+        if path is None:
+            # No local data file to keep a cache next to
+            engine.rebuild()
+            return engine
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rows = data['rows']
+            categories = data['categories']
+            if (data.get('version') != ROLLUP_VERSION or not 0 < rows <= len(store)
+                    or not 0 < categories <= len(store.category_names)
+                    or data['fingerprint'] != engine._fingerprint(rows, categories)):
+                raise ValueError("stale rollups")
+            code = store.intern_category
+            for key, total, count, totals, counts, day_counts in data['buckets']:
+                bucket = Bucket()
+                bucket.total = total
+                bucket.count = count
+                bucket.category_totals = {code(name): value for name, value in totals.items()}
+                bucket.category_counts = {code(name): value for name, value in counts.items()}
+                bucket.day_counts = {int(day): value for day, value in day_counts.items()}
+                engine.buckets[tuple(key)] = bucket
+        except (OSError, ValueError, KeyError, TypeError):
+            engine.rebuild()
+            return engine
+        engine.add_rows(rows, len(store))
+        return engine
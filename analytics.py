@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+from aggregates import AggregateEngine, key_label, rollup_path
+from budgets import ALERT_THRESHOLDS, BudgetEngine
+from expense_store import ExpenseStore
+from importer import MERCHANT_KEYWORDS
+from legacy_loader import OTHER_CATEGORY, RecordNormalizer
+
+PERIODS = ("This Week", "This Month", "Last Month", "This Year", "All Time")
+
+# Every category the tracker knows; used to normalize legacy category names
+CATEGORY_NAMES = tuple(MERCHANT_KEYWORDS) + (OTHER_CATEGORY,)
+
+
+def period_metrics(aggregates, time_filter, today=None, budgets=None):
+    # The numbers behind the metric cards and insights panel for one period
+    period = aggregates.period(time_filter, today)
+    budget = (budgets or BudgetEngine(aggregates)).status(time_filter, today)
+    names = aggregates.store.category_names
+    top_code, top_total = period.top_category()
+    total = period.total if period.count else 0.0
+    days = period.distinct_days
+    return {
+        'period': time_filter,
+        'has_data': aggregates.store.live_count > 0,
+        'count': period.count,
+        'total_spent': round(total, 2),
+        'daily_average': round(total / days, 2) if days else 0.0,
+        'average_expense': round(total / period.count, 2) if period.count else 0.0,
+        'top_category': names[top_code] if top_code is not None else None,
+        'top_category_total': round(top_total, 2),
+        'budget_period': budget['period'],
+        'budget': round(budget['limit'], 2) if budget['limit'] is not None else None,
+        'budget_spent': round(budget['spent'], 2),
+        'budget_left': round(budget['left'], 2) if budget['left'] is not None else None,
+        'budget_used': round(budget['used'], 4) if budget['used'] is not None else None,
+        'category_budgets': [{'category': c['category'], 'limit': c['limit'], 'spent': round(c['spent'], 2),
+                              'used': round(c['used'], 4)} for c in budget['categories']],
+        'category_totals': {name: round(value, 2)
+                            for name, value in aggregates.category_totals(period).items()}
+    }
+
+
+def insights_text(metrics):
+    if not metrics['has_data']:
+        return "💡 Add your first expense to see insights here!"
+    if not metrics['count']:
+        return "💡 No expenses for selected period. Try changing the time filter!"
+
+    top_category = metrics['top_category']
+    lines = [
+        f"💰 Total Spent: ${metrics['total_spent']:.2f}",
+        f"📈 Average Expense: ${metrics['average_expense']:.2f}",
+        f"🏆 Top Category: {top_category} (${metrics['top_category_total']:.2f})",
+        f"🎯 {metrics['count']} transactions"
+    ]
+    if metrics['budget'] is not None:
+        lines.append(f"📊 {metrics['budget_period'].capitalize()}ly budget: ${metrics['budget_spent']:.2f} "
+                     f"of ${metrics['budget']:.2f} ({metrics['budget_used']:.0%})")
+
+    lines += ["", "💡 Tips:"]
+    stretched = [c for c in metrics['category_budgets'] if c['used'] >= ALERT_THRESHOLDS[0]]
+    for c in stretched:
+        state = "over budget" if c['used'] >= 1 else f"at {c['used']:.0%} of budget"
+        lines.append(f"• {c['category']} is {state} (${c['spent']:.2f} of ${c['limit']:.2f})")
+    if not stretched:
+        lines.append(f"• You're doing great with {top_category.split()[0]} spending!")
+    if not metrics['category_budgets']:
+        lines.append("• Consider setting budgets for larger categories")
+    return "\n".join(lines)
+
+
+def open_storage(path, fsync=False):
+    # Backend by file extension, importing only that one; reports only read,
+    # so journal writes skip fsync unless the caller is a writer
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage(path)
+    if extension == '.bin':
+        from binary_storage import BinaryStorage
+        return BinaryStorage(path, fsync=fsync)
+    if extension == '.parts':
+        from partitioned_storage import PartitionedStorage
+        return PartitionedStorage(path, fsync=fsync, lazy=False)
+    from storage import JournalStorage
+    return JournalStorage(path, fsync=fsync)
+
+
+def load_dataset(path):
+    # (store, saved budgets or None)
+    storage = open_storage(path)
+    try:
+        if not storage.exists():
+            return ExpenseStore(), None
+        store, data = storage.load_store(RecordNormalizer(CATEGORY_NAMES))
+    finally:
+        storage.close()
+    return store, data.get('budgets')
+
+
+def monthly_totals(aggregates):
+    keys, totals = aggregates.series('month')
+    return {key_label(key): round(total, 2) for key, total in zip(keys, totals)}
+
+
+def report(path, periods, today=None, budget=None, trend=False, workers=None):
+    # Reuses the GUI's saved rollups when they still match the data
+    store, saved_budgets = load_dataset(path)
+    aggregates = AggregateEngine.load(store, rollup_path(path), workers)
+    budgets = BudgetEngine(aggregates, saved_budgets)
+    if budget is not None:
+        budgets.set_limit('month', None, budget)
+    results = []
+    for time_filter in periods:
+        metrics = period_metrics(aggregates, time_filter, today, budgets)
+        metrics['insights'] = insights_text(metrics)
+        results.append(metrics)
+    result = {'source': path, 'expenses': aggregates.store.live_count, 'periods': results}
+    if trend:
+        result['monthly_totals'] = monthly_totals(aggregates)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute expense metrics and insights as JSON")
+    parser.add_argument("data", nargs="?", default="premium_expenses.json")
+    parser.add_argument("--period", action="append", choices=PERIODS,
+                        help="period to report (repeatable; default: all periods)")
+    parser.add_argument("--today", type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help="evaluate periods relative to this date (YYYY-MM-DD)")
+    parser.add_argument("--budget", type=float, help="overall monthly budget (default: the one saved with the data)")
+    parser.add_argument("--trend", action="store_true", help="include spending per month over the whole history")
+    parser.add_argument("--workers", type=int,
+                        help="processes for building aggregates (default: all cores for very large files)")
+    args = parser.parse_args()
+    result = report(args.data, args.period or PERIODS, args.today, args.budget, args.trend, args.workers)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,341 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+from aggregates import AggregateEngine
+from binary_storage import BinaryStorage
+from analytics import CATEGORY_NAMES, PERIODS, period_metrics
+from expense_store import DATE_FORMAT, ExpenseStore, period_bounds
+from importer import import_file
+from legacy_loader import RecordNormalizer
+from query_cache import QueryCache
+from sample_data import SAMPLE_DESCRIPTIONS
+from search_index import VIEW_PAGE, SearchIndex
+from storage import JournalStorage
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+SEARCH_TERMS = ("coffee", "bill", "uber", "book", "cafe #1", "zzz")
+WRITE_CHUNK = 50_000
+
+
+def generate_records(count, years=3, seed=0, end=None):
+    # Same shape as create_sample_data, spread over several years in time order,
+    # with numbered descriptions so the search index sees many distinct texts
+    rng = random.Random(seed)
+    end = (end or datetime.now()).timestamp()
+    start = end - years * 365 * 86400
+    mean_gap = (end - start) / max(count, 1)
+    categories = list(CATEGORY_NAMES)
+    ts = start
+    for i in range(count):
+        ts = min(end, ts + rng.expovariate(1 / mean_gap))
+        category = rng.choice(categories)
+        description = rng.choice(SAMPLE_DESCRIPTIONS.get(category, ["General expense"]))
+        yield {
+            "id": i + 1,
+            "category": category,
+            "amount": round(rng.uniform(5, 150), 2),
+            "date": datetime.fromtimestamp(ts).strftime(DATE_FORMAT),
+            "description": f"{description} #{rng.randrange(1000)}"
+        }
+
+
+def write_dataset(path, count, years=3, seed=0):
+    # Streams a premium_expenses.json-style snapshot without building the list in memory
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"theme": "Dark Professional", "expenses": [')
+        chunk, separator = [], ''
+        for record in generate_records(count, years, seed):
+            chunk.append(json.dumps(record, ensure_ascii=False))
+            if len(chunk) >= WRITE_CHUNK:
+                f.write(separator + ',\n'.join(chunk))
+                chunk, separator = [], ',\n'
+        if chunk:
+            f.write(separator + ',\n'.join(chunk))
+        f.write(']}')
+    os.replace(tmp_path, path)
+
+
+def write_statement(path, records):
+    # The same expenses as a bank CSV export: US dates, debits negative
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Description", "Amount"])
+        for record in records:
+            date = datetime.strptime(record['date'], DATE_FORMAT)
+            writer.writerow([date.strftime("%m/%d/%Y"), record['description'], f"-{record['amount']:.2f}"])
+    os.replace(tmp_path, path)
+
+
+def percentile(samples, fraction):
+    return samples[int(fraction * (len(samples) - 1))]
+
+
+def measure(fn, repeat, rows=None, memory=True):
+    # Timed runs first; peak memory comes from one extra run under tracemalloc,
+    # which would otherwise inflate the timings
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - began)
+    samples.sort()
+    result = {
+        'runs': repeat,
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'max_ms': samples[-1] * 1000
+    }
+    if rows is not None:
+        median = percentile(samples, 0.50)
+        result['rows_per_second'] = rows / median if median else None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def cycle(values):
+    state = {'i': -1}
+
+    def next_value():
+        state['i'] += 1
+        return values[state['i'] % len(values)]
+    return next_value
+
+
+def load_store(storage):
+    # The read_data + background index path the GUI runs at startup
+    return storage.load_store(RecordNormalizer(CATEGORY_NAMES))[0]
+
+
+def core_benchmarks(path, size, repeat, load_repeat, memory):
+    results = {}
+    storage = JournalStorage(path, fsync=False)
+    results['load_data'] = measure(lambda: load_store(storage), load_repeat, size, memory)
+    store = load_store(storage)
+    binary = BinaryStorage(os.path.splitext(path)[0] + '.bin', fsync=False)
+    binary.save(store.records(), None)
+    results['load_data_binary'] = measure(lambda: load_store(binary), load_repeat, size, memory)
+    results['build_aggregates'] = measure(lambda: AggregateEngine(store, workers=1), load_repeat, size, memory)
+    cores = os.cpu_count() or 1
+    if cores > 1:
+        results['build_aggregates_parallel'] = measure(
+            lambda: AggregateEngine(store, workers=cores), load_repeat, size, memory)
+    results['build_search_index'] = measure(lambda: SearchIndex(store), load_repeat, size, memory)
+    aggregates = AggregateEngine(store)
+    search_index = SearchIndex(store)
+
+    next_period = cycle(PERIODS)
+    results['get_filtered_expenses'] = measure(
+        lambda: store.rows_between(*period_bounds(next_period())), repeat, memory=memory)
+    results['update_metrics'] = measure(
+        lambda: period_metrics(aggregates, next_period()), repeat, memory=memory)
+
+    codes = [None] + [store.category_code(name) for name in CATEGORY_NAMES[:3]]
+    query_mix = [(term, code) for term in SEARCH_TERMS + ("",) for code in codes]
+    queries = cycle(query_mix)
+
+    def search():
+        term, code = queries()
+        return search_index.search_view(term, code).page(0, VIEW_PAGE)
+    results['filter_expenses'] = measure(search, repeat, memory=memory)
+
+    # The same query sequence, from its start, through the GUI's result
+    # cache; repeats are hits
+    cache = QueryCache()
+    cached_queries = cycle(query_mix)
+
+    def cached_search():
+        term, code = cached_queries()
+        view = cache.get((None, code, term, store.version), lambda: search_index.search_view(term, code))
+        return view.page(0, VIEW_PAGE)
+    results['filter_expenses_cached'] = measure(cached_search, repeat, memory=memory)
+    results['filter_expenses_cached']['cache'] = cache.stats()
+    results['chart_agg'] = chart_benchmark(aggregates, repeat, memory)
+    results['import_statement'] = import_benchmark(path, store, size, load_repeat, memory)
+    return results
+
+
+def import_benchmark(path, store, size, repeat, memory):
+    # A CSV statement of the dataset through the GUI's importer pipeline into
+    # an empty store and journal, without fsync
+    statement = os.path.splitext(path)[0] + '.csv'
+    if not os.path.exists(statement):
+        write_statement(statement, store.records())
+    target = os.path.splitext(path)[0] + '.import.json'
+
+    def run():
+        storage = JournalStorage(target, fsync=False)
+        import_file(statement, ExpenseStore(), storage, CATEGORY_NAMES)
+        storage.close()
+        os.remove(storage.journal_path)
+    return measure(run, repeat, size, memory)
+
+
+def chart_benchmark(aggregates, repeat, memory):
+    # Offscreen pie render with the Agg canvas, the same drawing work as the chart panel
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+    except ImportError:
+        return {'skipped': 'matplotlib not installed'}
+    # The emoji category labels have no glyphs in matplotlib's default font
+    warnings.filterwarnings('ignore', 'Glyph', UserWarning)
+    figure = Figure(figsize=(5, 4))
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    next_period = cycle(PERIODS)
+
+    def render():
+        totals = aggregates.category_totals(aggregates.period(next_period()))
+        ax.clear()
+        if totals:
+            ax.pie(list(totals.values()), labels=list(totals), autopct='%1.1f%%', startangle=90)
+        canvas.draw()
+    return measure(render, repeat, memory=memory)
+
+
+def gui_benchmarks(path, repeat, memory):
+    # Needs a display; run under xvfb-run on headless machines
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {'gui': {'skipped': f'no display: {e}'}}
+
+    from expense_tracker import UltimateExpenseTracker
+    storage = JournalStorage(path, fsync=False)
+    app = UltimateExpenseTracker(root, staged=False, storage=storage)
+    root.update()
+    next_period = cycle(PERIODS)
+
+    def run(update):
+        def fn():
+            app.time_filter.set(next_period())
+            update()
+            root.update_idletasks()
+        return fn
+
+    def chart():
+        app.update_chart()
+        if app.pie_chart is not None:
+            app.pie_chart.canvas.draw()
+
+    def search_list():
+        app.show_search_results(app.search_index.search_view("coffee"))
+
+    def refresh_period():
+        # What a period click costs end to end; the list should be skipped
+        app.update_dashboard('period')
+        app.refresh.flush()
+
+    results = {
+        'gui_update_metrics': measure(run(app.update_metrics), repeat, memory=memory),
+        'gui_update_expenses_list': measure(run(app.update_expenses_list), repeat, memory=memory),
+        'gui_update_chart': measure(run(chart), repeat, memory=memory),
+        'gui_filter_expenses': measure(run(search_list), repeat, memory=memory)
+    }
+    app.instruments.reset()
+    results['gui_refresh_period'] = measure(run(refresh_period), repeat, memory=memory)
+    results['gui_refresh_period']['views'] = app.refresh.view_costs()
+    storage.close()
+    root.destroy()
+    return results
+
+
+def run_suite(sizes, workdir, years=3, seed=0, repeat=50, load_repeat=3, gui=True, memory=True):
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'years': years,
+        'seed': seed,
+        'sizes': {}
+    }
+    for size in sizes:
+        path = os.path.join(workdir, f'bench_{size}_{years}y_{seed}.json')
+        if not os.path.exists(path):
+            began = time.perf_counter()
+            write_dataset(path, size, years, seed)
+            print(f"Generated {size:,} expenses in {time.perf_counter() - began:.1f}s", file=sys.stderr)
+        results = core_benchmarks(path, size, repeat, load_repeat, memory)
+        if gui:
+            results.update(gui_benchmarks(path, repeat, memory) if size <= 1_000_000 else
+                           {'gui': {'skipped': 'GUI paths are only run up to 1M expenses'}})
+        report['sizes'][str(size)] = results
+        print_summary(size, results)
+    return report
+
+
+def print_summary(size, results, stream=None):
+    stream = stream or sys.stderr
+    print(f"{size:,} expenses", file=stream)
+    for name, result in results.items():
+        if 'skipped' in result:
+            print(f"  {name:<26}skipped ({result['skipped']})", file=stream)
+            continue
+        line = f"  {name:<26}p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms"
+        if 'peak_mb' in result:
+            line += f"  peak {result['peak_mb']:8.1f} MB"
+        print(line, file=stream)
+
+
+def compare(baseline, current, stream=None):
+    # p50 ratio per (size, path); above 1.0 means the current run is slower
+    stream = stream or sys.stdout
+    for size, results in current['sizes'].items():
+        before = baseline.get('sizes', {}).get(size, {})
+        for name, result in results.items():
+            old = before.get(name, {})
+            if 'p50_ms' in result and old.get('p50_ms'):
+                ratio = result['p50_ms'] / old['p50_ms']
+                flag = "  REGRESSION" if ratio > 1.2 else ""
+                print(f"{size:>10} {name:<26}{old['p50_ms']:9.2f} -> {result['p50_ms']:9.2f} ms"
+                      f"  x{ratio:.2f}{flag}", file=stream)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the expense tracker's hot paths")
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(',')], default=list(DEFAULT_SIZES),
+                        help="comma-separated expense counts (default: 10000,100000,1000000)")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query path")
+    parser.add_argument("--load-repeat", type=int, default=3, help="runs per load/index path")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "expense_bench"),
+                        help="where generated datasets are cached")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Tk paths")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory runs")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare p50 latencies against")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = run_suite(args.sizes, args.workdir, args.years, args.seed, args.repeat,
+                       args.load_repeat, not args.no_gui, not args.no_memory)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
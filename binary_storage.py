@@ -0,0 +1,351 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate, islice
+
+from expense_store import ExpenseStore, StoreRecords
+from legacy_loader import RecordNormalizer, rejected_path, write_document
+from storage import JournalStorage
+
+# Layout: a fixed header, a table of named sections, then the sections, each
+# starting on an 8-byte boundary. Numbers are little-endian. Readers refuse a
+# newer major version and skip sections they do not know, so a minor version
+# can add columns without breaking older builds.
+MAGIC = b'EXPSNAP\0'
+FORMAT_VERSION = (1, 0)
+HEADER = struct.Struct('<8sHHIQ')
+SECTION = struct.Struct('<8sQQ')
+
+# Fixed file widths; 'l' columns in memory are 4 bytes on some platforms
+COLUMNS = (
+    ('ids', 'ids', 'q'),
+    ('ts', 'timestamps', 'd'),
+    ('days', 'days', 'q'),
+    ('amounts', 'amounts', 'd'),
+    ('catcodes', 'category_codes', 'H'),
+)
+SECTIONS = {name for name, _, _ in COLUMNS} | {'tkeys', 'trows', 'descoff', 'deschp', 'meta'}
+SWAP_BYTES = sys.byteorder != 'little'
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class MappedHeap:
+    # A snapshot's description bytes and their offsets, read straight from the
+    # mapped file until detach() copies them into memory and unmaps it.
+    # Windows cannot replace a file that is still mapped.
+    def __init__(self, mapped, data, offsets):
+        self.mapped = mapped
+        self.data = data
+        self.offsets = offsets
+
+    def detach(self):
+        if self.mapped is None:
+            return
+        data, offsets = self.data, self.offsets
+        self.data = bytes(data)
+        if isinstance(offsets, memoryview):
+            self.offsets = array('Q', offsets.tobytes())
+            offsets.release()
+        data.release()
+        self.mapped.close()
+        self.mapped = None
+
+
+class HeapStrings:
+    # List-like description column. Snapshot rows are decoded from the
+    # string heap when first read, so opening a file touches no text; rows
+    # added since the snapshot live in a plain list, and edited snapshot rows
+    # in a dict over the heap. Copies share the heap.
+    def __init__(self, heap, base, tail=None, edits=None):
+        self.heap = heap
+        self.base = base
+        self.tail = tail if tail is not None else []
+        self.edits = edits if edits is not None else {}
+
+    def __len__(self):
+        return self.base + len(self.tail)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if row < self.base:
+            text = self.edits.get(row)
+            if text is None:
+                offsets = self.heap.offsets
+                text = str(self.heap.data[offsets[row]:offsets[row + 1]], 'utf-8')
+            return text
+        return self.tail[row - self.base]
+
+    def __setitem__(self, row, text):
+        if row < 0:
+            row += len(self)
+        if row < self.base:
+            self.edits[row] = text
+        else:
+            self.tail[row - self.base] = text
+
+    def __iter__(self):
+        for row in range(self.base):
+            yield self[row]
+        yield from self.tail
+
+    def append(self, text):
+        self.tail.append(text)
+
+    def extend(self, texts):
+        self.tail.extend(texts)
+
+    def copy(self):
+        # Shares the read-only heap; only the tail is copied
+        return HeapStrings(self.heap, self.base, list(self.tail), dict(self.edits))
+
+
+def _file_column(column, file_type):
+    # Same-width columns ('l' and 'q' on 64-bit Unix) are written as they are
+    if column.itemsize != array(file_type).itemsize or SWAP_BYTES:
+        column = array(file_type, column)
+    if SWAP_BYTES:
+        column.byteswap()
+    return column
+
+
+def _memory_column(raw, file_type, typecode):
+    # One copy out of the mapping: the store's numeric columns are arrays the
+    # app appends to and edits in place, so they cannot stay read-only views
+    column = array(typecode if array(typecode).itemsize == array(file_type).itemsize else file_type)
+    column.frombytes(raw)
+    if SWAP_BYTES:
+        column.byteswap()
+    if column.typecode != typecode:
+        column = array(typecode, column)
+    return column
+
+
+def _description_sections(descriptions):
+    # (offsets, heap chunks); a mapped heap is copied through without decoding
+    chunks = []
+    tail = descriptions
+    if isinstance(descriptions, HeapStrings) and not descriptions.edits:
+        heap = descriptions.heap
+        chunks.append(heap.data[:heap.offsets[descriptions.base]])
+        offsets = array('Q', heap.offsets[:descriptions.base + 1])
+        tail = descriptions.tail
+    else:
+        offsets = array('Q', [0])
+    encoded = [text.encode('utf-8') for text in tail]
+    offsets.extend(islice(accumulate((len(b) for b in encoded), initial=offsets[-1]), 1, None))
+    chunks.extend(encoded)
+    return offsets, chunks
+
+
+def write_snapshot(path, store, theme=None, budgets=None):
+    if store.deleted:
+        # Tombstones never reach the file
+        store = store.copy()
+        store.compact()
+    rows = len(store)
+    offsets, heap = _description_sections(store.descriptions)
+    meta = json.dumps({'categories': store.category_names, 'theme': theme, 'budgets': budgets},
+                      ensure_ascii=False).encode('utf-8')
+    sections = [(name, _file_column(getattr(store, attr), file_type)) for name, attr, file_type in COLUMNS]
+    sections += [
+        ('tkeys', _file_column(store.time_index.keys, 'd')),
+        ('trows', _file_column(store.time_index.rows, 'q')),
+        ('descoff', _file_column(offsets, 'Q')),
+        ('deschp', heap),
+        ('meta', [meta]),
+    ]
+
+    def size(data):
+        return len(data) * data.itemsize if isinstance(data, array) else sum(len(c) for c in data)
+
+    table = []
+    position = HEADER.size + SECTION.size * len(sections)
+    for name, data in sections:
+        position = -(-position // 8) * 8
+        table.append((name, position, size(data)))
+        position += size(data)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, *FORMAT_VERSION, len(sections), rows))
+        for name, offset, nbytes in table:
+            f.write(SECTION.pack(name.encode('ascii'), offset, nbytes))
+        for (_, data), (_, offset, _) in zip(sections, table):
+            f.write(b'\0' * (offset - f.tell()))
+            if isinstance(data, array):
+                data.tofile(f)
+            else:
+                for chunk in data:
+                    f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    # (store, meta). The file stays mapped for the store's descriptions until
+    # store.descriptions.heap.detach().
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise SnapshotError(f"{path} is not an expense snapshot")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, major, _minor, count, rows = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not an expense snapshot")
+    if major > FORMAT_VERSION[0]:
+        raise SnapshotError(f"{path} uses snapshot format {major}, newer than this version supports")
+    sections = {}
+    for i in range(count):
+        name, offset, nbytes = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+        if offset + nbytes > len(view):
+            raise SnapshotError(f"{path} is truncated")
+        sections[name.rstrip(b'\0').decode('ascii')] = view[offset:offset + nbytes]
+    if SECTIONS - sections.keys():
+        raise SnapshotError(f"{path} is missing {', '.join(sorted(SECTIONS - sections.keys()))}")
+
+    meta = json.loads(str(sections['meta'], 'utf-8'))
+    store = ExpenseStore()
+    for name, attr, file_type in COLUMNS:
+        setattr(store, attr, _memory_column(sections[name], file_type, getattr(store, attr).typecode))
+    store.time_index.keys = _memory_column(sections['tkeys'], 'd', 'd')
+    store.time_index.rows = _memory_column(sections['trows'], 'q', 'l')
+    for name in meta['categories']:
+        store.intern_category(name)
+
+    offsets = sections['descoff']
+    offsets = _memory_column(offsets, 'Q', 'Q') if SWAP_BYTES else offsets.cast('Q')
+    store.descriptions = HeapStrings(MappedHeap(mapped, sections['deschp'], offsets), rows)
+    if any(len(getattr(store, attr)) != rows for _, attr, _ in COLUMNS) or len(offsets) != rows + 1:
+        raise SnapshotError(f"{path} has columns of different lengths")
+    return store, meta
+
+
+class BinaryStorage(JournalStorage):
+    # JournalStorage with the snapshot kept as mapped binary columns instead of
+    # JSON. Changes still go to the JSON-lines journal and are folded into the
+    # next snapshot by compaction.
+    def __init__(self, path='premium_expenses.bin', compact_every=1000, fsync=True):
+        super().__init__(path, compact_every, fsync)
+        # Heaps still mapped from self.path
+        self._heaps = []
+
+    def load(self):
+        store, data = self.load_store()
+        data['expenses'] = list(store.records())
+        return data
+
+    def load_store(self, normalizer=None):
+        data = {'theme': None, 'budgets': None}
+        if os.path.exists(self.path):
+            store, meta = read_snapshot(self.path)
+            self._heaps.append(store.descriptions.heap)
+            data['theme'] = meta.get('theme')
+            data['budgets'] = meta.get('budgets')
+        else:
+            store = ExpenseStore()
+
+        # Same replay rules as the JSON snapshot: records are keyed by id, so
+        # an add already in the snapshot (left by an interrupted compaction) or
+        # an update rewrites its row, and a delete tombstones it
+        for path in (self.rotated_path, self.journal_path):
+            for record in self._read_journal(path):
+                op = record.get('op')
+                if op in ('add', 'add_many', 'update'):
+                    records = record['expenses'] if op == 'add_many' else [record['expense']]
+                    if normalizer is not None:
+                        records = list(normalizer.normalize_all(records))
+                    new = []
+                    for expense in records:
+                        row = store.row_of(expense.get('id'))
+                        if row is None:
+                            new.append(expense)
+                        else:
+                            store.update(row, expense)
+                    store.extend(new)
+                elif op == 'delete':
+                    row = store.row_of(record['id'])
+                    if row is not None:
+                        store.delete(row)
+                elif op == 'theme':
+                    data['theme'] = record['theme']
+                elif op == 'budgets':
+                    data['budgets'] = record['budgets']
+        store.compact()
+        self._pending = self._count_lines(self.journal_path)
+        self._budgets = data['budgets']
+        return store, data
+
+    def _unmap(self):
+        # Runs on the caller's thread, the one using the stores these heaps
+        # belong to, before a new snapshot replaces the file
+        for heap in self._heaps:
+            heap.detach()
+        self._heaps = []
+
+    def compact(self, expenses, theme, background=True):
+        if not self.compacting():
+            self._unmap()
+        return super().compact(expenses, theme, background)
+
+    def save(self, expenses, theme):
+        self.wait()
+        self._unmap()
+        super().save(expenses, theme)
+
+    def _write_snapshot(self, data):
+        expenses = data['expenses']
+        if isinstance(expenses, StoreRecords):
+            store = expenses.store
+        else:
+            store = ExpenseStore.from_records(list(expenses))
+        write_snapshot(self.path, store, data['theme'], self._budgets)
+
+
+def convert(source, target):
+    # Copies a snapshot and its journal between formats, picked by extension;
+    # JSON stays the export and interchange format. Records are normalized the
+    # way the app loads them, so a legacy expenses.json converts too; unreadable
+    # ones go to a .rejected.json next to the target. Returns (expenses
+    # converted, expenses set aside).
+    def open_path(path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.bin':
+            return BinaryStorage(path)
+        if extension == '.parts':
+            from partitioned_storage import PartitionedStorage
+            return PartitionedStorage(path, lazy=False)
+        return JournalStorage(path)
+
+    from analytics import CATEGORY_NAMES
+
+    normalizer = RecordNormalizer(CATEGORY_NAMES, quarantine=True)
+    reader, writer = open_path(source), open_path(target)
+    store, data = reader.load_store(normalizer)
+    reader.close()
+    writer.set_budgets(data['budgets'])
+    writer.save(store.records(), data['theme'])
+    writer.close()
+    if normalizer.rejected:
+        write_document(rejected_path(target), normalizer.rejected)
+    return len(store), len(normalizer.rejected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert expense data between the JSON and binary snapshot formats")
+    parser.add_argument("source", nargs="?", default="premium_expenses.json")
+    parser.add_argument("target", nargs="?", default="premium_expenses.bin")
+    args = parser.parse_args()
+    converted, rejected = convert(args.source, args.target)
+    print(f"Converted {converted} expenses to {args.target}")
+    if rejected:
+        print(f"Set aside {rejected} that could not be read in {rejected_path(args.target)}")
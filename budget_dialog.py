@@ -0,0 +1,80 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from budgets import BUDGET_PERIODS
+
+ALL_CATEGORIES = "All spending"
+
+
+class BudgetDialog:
+    # Lists the budget limits and lets the user set or remove one per
+    # (period, category); on_change runs after every edit
+    def __init__(self, root, budgets, categories, colors, on_change):
+        self.budgets = budgets
+        self.on_change = on_change
+
+        self.window = tk.Toplevel(root)
+        self.window.title("🎯 Budgets")
+        self.window.geometry("520x380")
+        self.window.configure(bg=colors['dark'])
+
+        self.tree = ttk.Treeview(self.window, columns=("Period", "Category", "Limit"), show="headings", height=10)
+        for col, width in (("Period", 90), ("Category", 250), ("Limit", 110)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor=tk.E if col == "Limit" else tk.W)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+
+        form = tk.Frame(self.window, bg=colors['dark'])
+        form.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.period_var = tk.StringVar(value='month')
+        ttk.Combobox(form, textvariable=self.period_var, values=BUDGET_PERIODS, state="readonly",
+                     width=8).pack(side=tk.LEFT)
+        self.category_var = tk.StringVar(value=ALL_CATEGORIES)
+        ttk.Combobox(form, textvariable=self.category_var, values=[ALL_CATEGORIES] + list(categories),
+                     state="readonly", width=22).pack(side=tk.LEFT, padx=5)
+        self.limit_var = tk.StringVar()
+        tk.Entry(form, textvariable=self.limit_var, width=10).pack(side=tk.LEFT)
+        tk.Button(form, text="Set", command=self.set_limit, bg=colors['primary'], fg='white').pack(side=tk.LEFT, padx=5)
+        tk.Button(form, text="Remove", command=self.remove_limit, bg=colors['secondary'],
+                  fg=colors['text_light']).pack(side=tk.LEFT)
+
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for budget in self.budgets.to_list():
+            self.tree.insert("", "end", values=(budget['period'], budget['category'] or ALL_CATEGORIES,
+                                                f"${budget['limit']:.2f}"))
+
+    def _selected_scope(self):
+        category = self.category_var.get()
+        return self.period_var.get(), None if category == ALL_CATEGORIES else category
+
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        period, category, limit = self.tree.item(selection[0], 'values')
+        self.period_var.set(period)
+        self.category_var.set(category)
+        self.limit_var.set(limit.lstrip('$'))
+
+    def set_limit(self):
+        try:
+            limit = float(self.limit_var.get())
+            if limit <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid positive limit", parent=self.window)
+            return
+        period, category = self._selected_scope()
+        self.budgets.set_limit(period, category, limit)
+        self.refresh()
+        self.on_change()
+
+    def remove_limit(self):
+        period, category = self._selected_scope()
+        self.budgets.set_limit(period, category, None)
+        self.refresh()
+        self.on_change()
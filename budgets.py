@@ -0,0 +1,123 @@
+from aggregates import EMPTY_BUCKET, period_key
+
+BUDGET_PERIODS = ('week', 'month', 'year')
+
+# Spend fractions that raise an alert the first time an expense crosses them
+ALERT_THRESHOLDS = (0.8, 1.0)
+
+# Used when the data file has no budgets yet; the old fixed $2000 a month
+DEFAULT_BUDGETS = [{'period': 'month', 'category': None, 'limit': 2000.0}]
+
+# To derive a limit for a period that has none from one that does
+MONTHS_PER_PERIOD = {'week': 12 / 52, 'month': 1, 'year': 12}
+
+
+class BudgetAlert:
+    def __init__(self, period, category, limit, spent, threshold):
+        self.period = period
+        self.category = category
+        self.limit = limit
+        self.spent = spent
+        self.threshold = threshold
+
+    @property
+    def message(self):
+        scope = self.category or "Overall"
+        if self.threshold >= 1.0:
+            return f"🚨 {scope} is over its {self.period}ly budget: ${self.spent:.2f} of ${self.limit:.2f}"
+        return f"⚠️ {scope} has used {self.spent / self.limit:.0%} of its {self.period}ly budget (${self.limit:.2f})"
+
+
+class BudgetEngine:
+    # Limits per (period, category), category None meaning all spending. Spend
+    # is read from the aggregate buckets the dashboard already keeps current,
+    # so checking a new expense looks at a handful of buckets whatever the
+    # size of the history.
+    def __init__(self, aggregates, budgets=None):
+        self.aggregates = aggregates
+        self.limits = {}
+        for budget in DEFAULT_BUDGETS if budgets is None else budgets:
+            self.limits[(budget['period'], budget.get('category'))] = float(budget['limit'])
+
+    def set_limit(self, period, category, limit):
+        if period not in BUDGET_PERIODS:
+            raise ValueError(f"Unknown budget period {period!r}")
+        if limit is None or limit <= 0:
+            self.limits.pop((period, category), None)
+        else:
+            self.limits[(period, category)] = float(limit)
+
+    def to_list(self):
+        # Serializable form stored in the data file
+        return [{'period': period, 'category': category, 'limit': limit}
+                for (period, category), limit in sorted(self.limits.items(), key=lambda item: (
+                    BUDGET_PERIODS.index(item[0][0]), item[0][1] or ""))]
+
+    def spent(self, bucket, category):
+        if category is None:
+            return bucket.total
+        code = self.aggregates.store.category_code(category)
+        return bucket.category_totals.get(code, 0.0) if code is not None else 0.0
+
+    def check(self, row):
+        # Alerts for thresholds the expense at this row just crossed; call after
+        # the row has been added to the aggregates
+        store = self.aggregates.store
+        day = store.days[row]
+        amount = store.amounts[row]
+        category = store.category(row)
+        alerts = []
+        for scope in (None, category):
+            for period in BUDGET_PERIODS:
+                limit = self.limits.get((period, scope))
+                if limit is None:
+                    continue
+                after = self.spent(self.aggregates.bucket_for(period, day), scope)
+                before = after - amount
+                crossed = [t for t in ALERT_THRESHOLDS if before < t * limit <= after]
+                if crossed:
+                    alerts.append(BudgetAlert(period, scope, limit, after, crossed[-1]))
+        return alerts
+
+    def limit_for(self, period, category=None):
+        # Set limit, else (overall) the sum of the period's category limits,
+        # else one scaled from another period's limit
+        limit = self.limits.get((period, category))
+        if limit is not None:
+            return limit
+        if category is None:
+            limits = [limit for (p, c), limit in self.limits.items() if p == period and c is not None]
+            if limits:
+                return sum(limits)
+        for other in BUDGET_PERIODS:
+            limit = self.limits.get((other, category))
+            if limit is not None:
+                return limit * MONTHS_PER_PERIOD[period] / MONTHS_PER_PERIOD[other]
+        return None
+
+    def status(self, time_filter, today=None):
+        # Overall and per-category budget use for a dashboard period; "All Time"
+        # is judged against the current month
+        key = period_key(time_filter, today)
+        if key[0] == 'all':
+            key = period_key("This Month", today)
+        period = key[0]
+        bucket = self.aggregates.buckets.get(key, EMPTY_BUCKET)
+
+        limit = self.limit_for(period)
+        spent = bucket.total
+        categories = []
+        for (p, category), category_limit in self.limits.items():
+            if p == period and category is not None:
+                category_spent = self.spent(bucket, category)
+                categories.append({'category': category, 'limit': category_limit, 'spent': category_spent,
+                                   'used': category_spent / category_limit})
+        categories.sort(key=lambda c: -c['used'])
+        return {
+            'period': period,
+            'limit': limit,
+            'spent': spent,
+            'left': max(0.0, limit - spent) if limit is not None else None,
+            'used': spent / limit if limit else None,
+            'categories': categories
+        }
@@ -0,0 +1,204 @@
+import math
+import tkinter as tk
+
+START_ANGLE = 90
+LABEL_DISTANCE = 1.1
+PCT_DISTANCE = 0.6
+
+
+class CategoryPieChart:
+    # One Figure and canvas for the lifetime of the chart panel. Refreshes move
+    # the existing wedges and labels when the set of categories is unchanged and
+    # only redraw (via draw_idle) when the data or colors actually changed.
+    def __init__(self, parent, colors):
+        # matplotlib is imported when the chart first renders, off the startup path
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.parent = parent
+        self.colors = colors
+        # A bare Figure is not registered with pyplot, so nothing leaks when it is dropped
+        self.figure = Figure(figsize=(5, 4))
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+        self.message = tk.Label(parent, font=('Arial', 12))
+        self._state = None
+        self._labels = None
+        self._artists = None
+        self._showing = None
+
+    def set_colors(self, colors):
+        # The next update() sees the new colors in its state and recolors in place
+        self.colors = colors
+        self.message.config(bg=colors['card'], fg=colors['text_light'])
+
+    def show_message(self, text):
+        if self._showing != 'message':
+            self.widget.pack_forget()
+            self.message.pack(expand=True)
+            self._showing = 'message'
+        self.message.config(text=text, bg=self.colors['card'], fg=self.colors['text_light'])
+        self._state = None
+
+    def update(self, category_totals, category_colors):
+        if self._showing != 'chart':
+            self.message.pack_forget()
+            self.widget.pack(fill=tk.BOTH, expand=True)
+            self._showing = 'chart'
+
+        labels = tuple(category_totals)
+        amounts = tuple(round(v, 2) for v in category_totals.values())
+        wedge_colors = tuple(category_colors[label] for label in labels)
+        state = (labels, amounts, wedge_colors, self.colors['card'], self.colors['text_light'])
+        if state == self._state:
+            return False
+
+        if labels == self._labels:
+            self._move_wedges(amounts, wedge_colors)
+        else:
+            self._draw_pie(labels, amounts, wedge_colors)
+        self.figure.patch.set_facecolor(self.colors['card'])
+        self.ax.title.set_color(self.colors['text_light'])
+        for text in self._artists[1] + self._artists[2]:
+            text.set_color(self.colors['text_light'])
+
+        self._state = state
+        self.canvas.draw_idle()
+        return True
+
+    def _draw_pie(self, labels, amounts, wedge_colors):
+        self.ax.clear()
+        wedges, texts, autotexts = self.ax.pie(amounts, labels=labels, autopct='%1.1f%%',
+                                               colors=wedge_colors, startangle=START_ANGLE)
+        for autotext in autotexts:
+            autotext.set_fontweight('bold')
+        self.ax.set_title('Spending by Category', pad=20)
+        self._labels = labels
+        self._artists = (wedges, texts, autotexts)
+
+    def _move_wedges(self, amounts, wedge_colors):
+        wedges, texts, autotexts = self._artists
+        total = sum(amounts)
+        theta = START_ANGLE
+        for wedge, text, autotext, amount, color in zip(wedges, texts, autotexts, amounts, wedge_colors):
+            fraction = amount / total if total else 0
+            start, theta = theta, theta + 360 * fraction
+            wedge.set_theta1(start)
+            wedge.set_theta2(theta)
+            wedge.set_facecolor(color)
+
+            middle = math.radians((start + theta) / 2)
+            x, y = math.cos(middle), math.sin(middle)
+            text.set_position((LABEL_DISTANCE * x, LABEL_DISTANCE * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            autotext.set_position((PCT_DISTANCE * x, PCT_DISTANCE * y))
+            autotext.set_text('%1.1f%%' % (fraction * 100))
+
+    def hide(self):
+        self.widget.pack_forget()
+        self.message.pack_forget()
+        self._showing = None
+
+    def destroy(self):
+        self.widget.destroy()
+        self.message.destroy()
+        self.figure.clear()
+
+
+class TrendChart:
+    # Time-series view over the rollup cube: a monthly total line or stacked
+    # category areas. Same single Figure, lazy import and redraw-on-change
+    # rules as CategoryPieChart; inputs are a few hundred points at most.
+    def __init__(self, parent, colors):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.parent = parent
+        self.colors = colors
+        self.figure = Figure(figsize=(5, 4))
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+        self.message = tk.Label(parent, font=('Arial', 12))
+        self._state = None
+        self._showing = None
+
+    def set_colors(self, colors):
+        self.colors = colors
+        self.message.config(bg=colors['card'], fg=colors['text_light'])
+
+    def show_message(self, text):
+        if self._showing != 'message':
+            self.widget.pack_forget()
+            self.message.pack(expand=True)
+            self._showing = 'message'
+        self.message.config(text=text, bg=self.colors['card'], fg=self.colors['text_light'])
+        self._state = None
+
+    def hide(self):
+        self.widget.pack_forget()
+        self.message.pack_forget()
+        self._showing = None
+
+    def _show_chart(self):
+        if self._showing != 'chart':
+            self.message.pack_forget()
+            self.widget.pack(fill=tk.BOTH, expand=True)
+            self._showing = 'chart'
+
+    def update_totals(self, title, labels, totals):
+        self._show_chart()
+        state = ('totals', title, tuple(labels), tuple(round(v, 2) for v in totals),
+                 self.colors['card'], self.colors['text_light'], self.colors['primary'])
+        if state == self._state:
+            return False
+        self.ax.clear()
+        x = range(len(labels))
+        self.ax.fill_between(x, totals, color=self.colors['primary'], alpha=0.25)
+        self.ax.plot(x, totals, color=self.colors['primary'], marker='o' if len(labels) <= 36 else None)
+        self._finish(title, labels)
+        self._state = state
+        return True
+
+    def update_stacked(self, title, labels, series, series_colors):
+        self._show_chart()
+        names = tuple(series)
+        state = ('stacked', title, tuple(labels), names,
+                 tuple(tuple(round(v, 2) for v in values) for values in series.values()),
+                 tuple(series_colors[name] for name in names), self.colors['card'], self.colors['text_light'])
+        if state == self._state:
+            return False
+        self.ax.clear()
+        self.ax.stackplot(range(len(labels)), *series.values(), labels=names,
+                          colors=[series_colors[name] for name in names], alpha=0.85)
+        legend = self.ax.legend(loc='upper left', fontsize=7, frameon=False)
+        for text in legend.get_texts():
+            text.set_color(self.colors['text_light'])
+        self._finish(title, labels)
+        self._state = state
+        return True
+
+    def _finish(self, title, labels):
+        # At most ~12 tick labels whatever the span
+        step = max(1, len(labels) // 12)
+        ticks = list(range(0, len(labels), step))
+        self.ax.set_xticks(ticks)
+        self.ax.set_xticklabels([labels[i] for i in ticks], rotation=45, ha='right', fontsize=7)
+        self.ax.set_title(title, pad=10)
+        self.ax.margins(x=0)
+
+        text_color = self.colors['text_light']
+        self.figure.patch.set_facecolor(self.colors['card'])
+        self.ax.set_facecolor(self.colors['card'])
+        self.ax.title.set_color(text_color)
+        self.ax.tick_params(colors=text_color, labelsize=7)
+        for spine in self.ax.spines.values():
+            spine.set_color(text_color)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def destroy(self):
+        self.widget.destroy()
+        self.message.destroy()
+        self.figure.clear()
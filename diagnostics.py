@@ -0,0 +1,102 @@
+import time
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+REFRESH_MS = 1000
+COLUMNS = ("Path", "Calls", "Last", "p50", "p99", "Max", "Total")
+
+
+class DiagnosticsPanel:
+    # A Toplevel showing the instrumentation timers, refreshed while it is open,
+    # with toggles for cProfile and tracemalloc capture and a trace export
+    def __init__(self, root, instruments, extra_stats=None):
+        self.root = root
+        self.instruments = instruments
+        # Callable returning {name: value} for stats kept elsewhere, e.g. search latency
+        self.extra_stats = extra_stats
+        self._after_id = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("🩺 Diagnostics")
+        self.window.geometry("760x420")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.tree = ttk.Treeview(self.window, columns=COLUMNS, show="headings", height=14)
+        for col in COLUMNS:
+            self.tree.heading(col, text=col if col in ("Path", "Calls") else f"{col} (ms)")
+            self.tree.column(col, width=220 if col == "Path" else 80, anchor=tk.W if col == "Path" else tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+
+        self.counters_label = tk.Label(self.window, anchor=tk.W, justify=tk.LEFT, font=('Arial', 9))
+        self.counters_label.pack(fill=tk.X, padx=10)
+
+        buttons = tk.Frame(self.window)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        self.profile_button = tk.Button(buttons, command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT)
+        self.memory_button = tk.Button(buttons, command=self.toggle_memory)
+        self.memory_button.pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Export Trace…", command=self.export_trace).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Reset", command=self.reset).pack(side=tk.RIGHT)
+
+        self.refresh()
+
+    def refresh(self):
+        snapshot = self.instruments.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, stat in sorted(snapshot['stats'].items(), key=lambda item: -item[1]['total_ms']):
+            self.tree.insert("", "end", values=(
+                name, stat['calls'], f"{stat['last_ms']:.2f}", f"{stat['p50_ms']:.2f}",
+                f"{stat['p99_ms']:.2f}", f"{stat['max_ms']:.2f}", f"{stat['total_ms']:.1f}"))
+
+        counters = dict(snapshot['counters'])
+        if self.extra_stats is not None:
+            counters.update(self.extra_stats())
+        self.counters_label.config(text="   ".join(
+            f"{name}: {value:.1f}" if isinstance(value, float) else f"{name}: {value}"
+            for name, value in counters.items()))
+
+        self._update_buttons()
+        self._after_id = self.root.after(REFRESH_MS, self.refresh)
+
+    def _update_buttons(self):
+        self.profile_button.config(
+            text="⏹ Stop cProfile" if self.instruments.profiling else "▶ Start cProfile")
+        self.memory_button.config(
+            text="⏹ Stop tracemalloc" if self.instruments.tracing_memory else "▶ Start tracemalloc")
+
+    def _stamp(self):
+        return time.strftime("%Y%m%d-%H%M%S")
+
+    def toggle_profile(self):
+        if self.instruments.profiling:
+            path = self.instruments.stop_profile(f"expense-profile-{self._stamp()}.prof")
+            messagebox.showinfo("Profile saved", f"cProfile data written to {path}")
+        else:
+            self.instruments.start_profile()
+        self._update_buttons()
+
+    def toggle_memory(self):
+        if self.instruments.tracing_memory:
+            path = self.instruments.stop_memory(f"expense-memory-{self._stamp()}.txt")
+            messagebox.showinfo("Memory snapshot saved", f"tracemalloc report written to {path}")
+        else:
+            self.instruments.start_memory()
+        self._update_buttons()
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(
+            title="Export trace", defaultextension=".json", initialfile=f"expense-trace-{self._stamp()}.json",
+            filetypes=[("Trace event JSON", "*.json")])
+        if path:
+            count = self.instruments.export_trace(path)
+            messagebox.showinfo("Trace exported", f"{count} events written to {path}")
+
+    def reset(self):
+        self.instruments.reset()
+
+    def close(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
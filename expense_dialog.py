@@ -0,0 +1,81 @@
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk, messagebox
+
+from expense_store import DATE_FORMAT
+
+
+class ExpenseDialog:
+    # Edit form for one expense. on_save gets the edited record (same id);
+    # on_delete gets the id. Both run after the dialog has closed.
+    def __init__(self, root, record, categories, colors, on_save, on_delete):
+        self.record = record
+        self.categories = categories
+        self.on_save = on_save
+        self.on_delete = on_delete
+
+        self.window = tk.Toplevel(root)
+        self.window.title("✏️ Edit Expense")
+        self.window.geometry("420x230")
+        self.window.configure(bg=colors['dark'])
+        self.window.transient(root)
+
+        form = tk.Frame(self.window, bg=colors['dark'])
+        form.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        self.category_var = tk.StringVar(value=record['category'])
+        self.amount_var = tk.StringVar(value=f"{record['amount']:.2f}")
+        self.date_var = tk.StringVar(value=record['date'])
+        self.desc_var = tk.StringVar(value=record['description'])
+
+        fields = (("Category", ttk.Combobox(form, textvariable=self.category_var, values=list(categories),
+                                           state="readonly", width=22)),
+                  ("Amount", tk.Entry(form, textvariable=self.amount_var, width=12)),
+                  ("Date", tk.Entry(form, textvariable=self.date_var, width=22)),
+                  ("Description", tk.Entry(form, textvariable=self.desc_var, width=32)))
+        for row, (label, widget) in enumerate(fields):
+            tk.Label(form, text=label, bg=colors['dark'], fg=colors['text_light']).grid(
+                row=row, column=0, sticky=tk.W, pady=4)
+            widget.grid(row=row, column=1, sticky=tk.W, padx=10, pady=4)
+
+        buttons = tk.Frame(self.window, bg=colors['dark'])
+        buttons.pack(fill=tk.X, padx=15, pady=(0, 15))
+        tk.Button(buttons, text="💾 Save", command=self.save, bg=colors['primary'], fg='white').pack(side=tk.LEFT)
+        tk.Button(buttons, text="🗑️ Delete", command=self.delete, bg=colors['danger'],
+                  fg='white').pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Cancel", command=self.window.destroy, bg=colors['secondary'],
+                  fg=colors['text_light']).pack(side=tk.RIGHT)
+
+    def save(self):
+        category = self.category_var.get()
+        if category not in self.categories:
+            messagebox.showerror("Error", "Please select a valid category", parent=self.window)
+            return
+        try:
+            amount = float(self.amount_var.get())
+            if amount <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid positive amount", parent=self.window)
+            return
+        date = self.date_var.get().strip()
+        try:
+            datetime.strptime(date, DATE_FORMAT)
+        except ValueError:
+            messagebox.showerror("Error", "Please enter the date as YYYY-MM-DD HH:MM:SS", parent=self.window)
+            return
+        expense = {
+            "id": self.record['id'],
+            "category": category,
+            "amount": amount,
+            "date": date,
+            "description": self.desc_var.get() or f"{category} expense"
+        }
+        self.window.destroy()
+        self.on_save(expense)
+
+    def delete(self):
+        if not messagebox.askyesno("Delete expense", f"Delete \"{self.record['description']}\" "
+                                   f"(${self.record['amount']:.2f})?", parent=self.window):
+            return
+        self.window.destroy()
+        self.on_delete(self.record['id'])
@@ -0,0 +1,476 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from aggregates import AggregateEngine
+from analytics import CATEGORY_NAMES, PERIODS, open_storage, period_metrics
+from budgets import BudgetEngine
+from expense_store import DATE_FORMAT, period_bounds
+from instrumentation import Instrumentation
+from legacy_loader import RecordNormalizer
+from query_cache import QueryCache
+from search_index import SearchIndex
+from service_errors import ServiceError
+from theme import THEMES
+
+DEFAULT_PORT = 8765
+POOL_SIZE = 4
+MAX_BATCH = 512
+MAX_BODY = 16 * 1024 * 1024
+PAGE_SIZE = 100
+# Same compaction trigger as the GUI's
+TOMBSTONE_RATIO = 0.1
+TOMBSTONE_MIN = 500
+
+
+class StoragePool:
+    # Storage calls and row reads run on a fixed set of worker threads. At most
+    # size are in flight; requests beyond that wait on the event loop, not in
+    # the storage layer, and the wait is counted so a saturated pool shows up
+    # in /stats.
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='storage')
+        self.waiting = 0
+        self._slots = None
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        self.waiting += 1
+        async with self._slots:
+            self.waiting -= 1
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class ExpenseService:
+    # HTTP/JSON front end over one storage backend, for several writers at
+    # once. The store, search index and aggregates are the GUI's, kept in
+    # memory and changed only on the event loop; writes are queued and
+    # committed in groups, each group with one storage call per run of adds,
+    # and a request is answered once its group is durable.
+    def __init__(self, storage, pool_size=POOL_SIZE, batch_window=0.0, max_batch=MAX_BATCH):
+        self.storage = storage
+        self.pool = StoragePool(pool_size)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.normalizer = RecordNormalizer(CATEGORY_NAMES)
+        self.instruments = Instrumentation()
+        self.query_cache = QueryCache()
+        # Held for store changes and for reading rows out of the store; the
+        # search index keeps its own lock for searches
+        self.lock = threading.Lock()
+        self.commits = 0
+        self.committed = 0
+        self._queue = None
+        self._committer = None
+        self._reserved = set()
+
+        store, data = storage.load_store(self.normalizer)
+        store.extend(storage.read_partitions(None, self.normalizer))
+        self.store = store
+        self.theme = data.get('theme')
+        self.aggregates = AggregateEngine(store)
+        self.budgets = BudgetEngine(self.aggregates, data.get('budgets'))
+        self.search_index = SearchIndex(store)
+        self.next_id = store.next_id
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self._queue = asyncio.Queue()
+        self._committer = asyncio.create_task(self._commit_loop())
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def stop(self):
+        # Lets queued writes finish before the storage closes
+        await self._queue.join()
+        self._committer.cancel()
+        await self.pool.run(self.storage.close)
+        self.pool.close()
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, version = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                began = time.perf_counter()
+                try:
+                    status, payload, route = await self.dispatch(method, target, body)
+                except ServiceError as e:
+                    status, payload, route = e.status, {'error': e.message}, 'error'
+                except Exception as e:
+                    status, payload, route = 500, {'error': str(e)}, 'error'
+                self.instruments.record(f"{method} {route}", began)
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n")
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode('latin-1') + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Client went away or sent something that is not HTTP
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        # (status, JSON payload, route name for the timing stats)
+        parts = urlsplit(target)
+        path = unquote(parts.path).rstrip('/')
+        params = dict(parse_qsl(parts.query))
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            raise ServiceError(400, "Body is not JSON")
+
+        if path == '/expenses':
+            if method == 'GET':
+                return 200, await self.query(params), 'expenses'
+            if method == 'POST':
+                expenses = payload if isinstance(payload, list) else [payload]
+                return 201, {'expenses': await self.add(expenses)}, 'expenses'
+        elif path.startswith('/expenses/'):
+            try:
+                expense_id = int(path.rsplit('/', 1)[1])
+            except ValueError:
+                raise ServiceError(404, "No such expense")
+            if method == 'PUT':
+                return 200, {'expense': await self.update(expense_id, payload)}, 'expense'
+            if method == 'DELETE':
+                await self.delete(expense_id)
+                return 200, {'deleted': expense_id}, 'expense'
+        elif path == '/aggregate' and method == 'GET':
+            period = self._period(params)
+            return 200, period_metrics(self.aggregates, period, budgets=self.budgets), 'aggregate'
+        elif path == '/ids' and method == 'POST':
+            return 200, self.reserve_ids((payload or {}).get('count', 1)), 'ids'
+        elif path == '/settings':
+            if method == 'GET':
+                return 200, {'theme': self.theme, 'budgets': self.budgets.to_list()}, 'settings'
+            if method == 'PUT':
+                return 200, await self.change_settings(payload or {}), 'settings'
+        elif path == '/health' and method == 'GET':
+            return 200, {'status': 'ok', 'expenses': self.store.live_count}, 'health'
+        elif path == '/stats' and method == 'GET':
+            return 200, self.stats(), 'stats'
+        else:
+            raise ServiceError(404, f"No route for {path}")
+        raise ServiceError(405, f"{method} not allowed on {path}")
+
+    # Reads
+
+    def _period(self, params):
+        period = params.get('period', "All Time")
+        if period not in PERIODS:
+            raise ServiceError(400, f"period must be one of {', '.join(PERIODS)}")
+        return period
+
+    async def query(self, params):
+        start, end = period_bounds(self._period(params))
+        term = params.get('q', '').lower()
+        code = None
+        if params.get('category'):
+            code = self.store.category_code(self.normalizer.category(params['category']))
+            if code is None:
+                return {'count': 0, 'expenses': []}
+        try:
+            offset = max(0, int(params.get('offset', 0)))
+            limit = int(params.get('limit', PAGE_SIZE))
+        except ValueError:
+            raise ServiceError(400, "offset and limit must be integers")
+        return await self.pool.run(self._query, start, end, code, term, offset, limit)
+
+    def _query(self, start, end, code, term, offset, limit):
+        # On a pool thread. Rows are cached per data version; if the version
+        # moves while a page is read the row numbers may be stale, so retry.
+        store = self.store
+        while True:
+            version = store.version
+            key = ((start, end), code, term, version)
+            rows = self.query_cache.get(key, lambda: self._matching_rows(start, end, code, term))
+            with self.lock:
+                if store.version != version:
+                    continue
+                page = rows[offset:offset + limit] if limit > 0 else rows[offset:]
+                return {'count': len(rows), 'expenses': [store.record(row) for row in page]}
+
+    def _matching_rows(self, start, end, code, term):
+        # Newest first
+        store = self.store
+        if term or code is not None:
+            rows = self.search_index.search(term, code)
+            if start != float('-inf'):
+                with self.lock:
+                    timestamps = store.timestamps
+                    rows = [row for row in rows if start <= timestamps[row] < end]
+            return rows
+        with self.lock:
+            return store.rows_between(start, end)[::-1]
+
+    def stats(self):
+        snapshot = self.instruments.snapshot()
+        snapshot['commits'] = self.commits
+        snapshot['committed'] = self.committed
+        snapshot['mean_batch'] = self.committed / self.commits if self.commits else 0.0
+        snapshot['pool'] = {'size': self.pool.size, 'waiting': self.pool.waiting}
+        snapshot['cache'] = self.query_cache.stats()
+        return snapshot
+
+    # Writes
+
+    def reserve_ids(self, count):
+        # A block of ids for one client to assign itself, so clients that
+        # build records before sending them never collide
+        if not isinstance(count, int) or count < 1:
+            raise ServiceError(400, "count must be a positive integer")
+        first = self.next_id
+        self.next_id += count
+        return {'first': first, 'count': count}
+
+    def _expense(self, payload, expense_id):
+        if not isinstance(payload, dict):
+            raise ServiceError(400, "An expense must be a JSON object")
+        try:
+            amount = float(payload['amount'])
+            category = self.normalizer.category(str(payload['category']))
+            date = self.normalizer.date(payload.get('date') or datetime.now().strftime(DATE_FORMAT))
+            datetime.strptime(date, DATE_FORMAT)
+        except KeyError as e:
+            raise ServiceError(400, f"Missing {e.args[0]}")
+        except (TypeError, ValueError) as e:
+            raise ServiceError(400, str(e) or "Invalid expense")
+        if not amount > 0:
+            raise ServiceError(400, "amount must be positive")
+        return {
+            "id": expense_id,
+            "category": category,
+            "amount": amount,
+            "date": date,
+            "description": str(payload.get('description') or f"{category} expense")
+        }
+
+    async def add(self, payloads):
+        expenses = []
+        for payload in payloads:
+            expense_id = payload.get('id') if isinstance(payload, dict) else None
+            if expense_id is None:
+                expense_id = self.next_id
+                self.next_id += 1
+            elif not isinstance(expense_id, int):
+                raise ServiceError(400, "id must be an integer")
+            elif self.store.row_of(expense_id) is not None or expense_id in self._reserved:
+                raise ServiceError(409, f"Expense {expense_id} already exists")
+            expenses.append(self._expense(payload, expense_id))
+        # Checked and claimed in one step on the loop, so two requests can
+        # never both pass the check for the same id
+        ids = [expense['id'] for expense in expenses]
+        if len(set(ids)) < len(ids):
+            raise ServiceError(409, "Duplicate ids in one request")
+        self._reserved.update(ids)
+        self.next_id = max([self.next_id] + [i + 1 for i in ids])
+        try:
+            return await self._submit('add', expenses)
+        finally:
+            self._reserved.difference_update(ids)
+
+    async def update(self, expense_id, payload):
+        if self.store.row_of(expense_id) is None:
+            raise ServiceError(404, f"No expense {expense_id}")
+        return await self._submit('update', self._expense(payload, expense_id))
+
+    async def delete(self, expense_id):
+        if self.store.row_of(expense_id) is None:
+            raise ServiceError(404, f"No expense {expense_id}")
+        await self._submit('delete', expense_id)
+
+    async def change_settings(self, payload):
+        if 'theme' in payload and payload['theme'] not in THEMES:
+            raise ServiceError(400, f"theme must be one of {', '.join(THEMES)}")
+        if 'budgets' in payload:
+            try:
+                budgets = BudgetEngine(self.aggregates, payload['budgets'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ServiceError(400, f"Invalid budgets: {e}")
+            await self.pool.run(self.storage.set_budgets, budgets.to_list())
+            self.budgets = budgets
+        if 'theme' in payload:
+            await self.pool.run(self.storage.set_theme, payload['theme'])
+            self.theme = payload['theme']
+        return {'theme': self.theme, 'budgets': self.budgets.to_list()}
+
+    async def _submit(self, op, value):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, value, future))
+        return await future
+
+    async def _commit_loop(self):
+        # Group commit: whatever queued up while the last group was being
+        # written goes out together, optionally after waiting batch_window
+        # seconds for more
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _validate(self, batch):
+        # Edits and deletes are checked again, in order, against the store as
+        # this group will leave it: an edit or delete of a row deleted earlier
+        # in the group is refused here, before it reaches the journal, where
+        # a replayed edit would bring the row back
+        gone = set()
+        valid = []
+        for op, value, future in batch:
+            if op != 'add':
+                expense_id = value['id'] if op == 'update' else value
+                if expense_id in gone or self.store.row_of(expense_id) is None:
+                    if not future.done():
+                        future.set_exception(ServiceError(404, f"No expense {expense_id}"))
+                    continue
+                if op == 'delete':
+                    gone.add(expense_id)
+            valid.append((op, value, future))
+        return valid
+
+    async def _commit(self, batch):
+        batch = self._validate(batch)
+        if not batch:
+            return
+        try:
+            await self.pool.run(self._write, batch)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(ServiceError(500, f"Could not save: {e}"))
+            return
+        self.commits += 1
+        self.committed += len(batch)
+        self.instruments.count('group commits')
+        for op, value, future in batch:
+            result = self._apply(op, value)
+            if not future.done():
+                future.set_result(result)
+        if len(self.store.deleted) > max(TOMBSTONE_MIN, TOMBSTONE_RATIO * len(self.store)):
+            with self.lock, self.search_index.lock:
+                self.store.compact()
+                self.search_index = SearchIndex(self.store)
+        if self.storage.needs_compaction():
+            self.storage.compact(self.store.copy().records(), self.theme)
+
+    def _write(self, batch):
+        # On a pool thread: consecutive adds become one append_many, so one
+        # journal line and one fsync for all of them
+        adds = []
+        for op, value, _ in batch:
+            if op == 'add':
+                adds.extend(value)
+                continue
+            if adds:
+                self.storage.append_many(adds)
+                adds = []
+            if op == 'update':
+                self.storage.update(value)
+            else:
+                self.storage.delete(value)
+        if adds:
+            self.storage.append_many(adds)
+
+    def _apply(self, op, value):
+        # On the loop, once the group is durable
+        store = self.store
+        if op == 'add':
+            with self.lock, self.search_index.lock:
+                first = len(store)
+                store.extend(value)
+                for row in range(first, len(store)):
+                    self.search_index.add_row(row)
+            self.aggregates.add_rows(first, len(store))
+            return value
+        # _validate made sure the row is still there
+        row = store.row_of(value['id'] if op == 'update' else value)
+        self.aggregates.remove_row(row)
+        with self.lock, self.search_index.lock:
+            self.search_index.unlink_row(row)
+            if op == 'update':
+                store.update(row, value)
+                self.search_index.link_row(row)
+            else:
+                store.delete(row)
+        if op == 'update':
+            self.aggregates.add_row(row)
+            return value
+        return None
+
+
+async def serve(service, host, port):
+    server = await service.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving {service.store.live_count:,} expenses on http://{address[0]}:{address[1]}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve expense data over HTTP/JSON on this machine")
+    parser.add_argument("data", nargs="?", default="premium_expenses.json",
+                        help="data file; .db, .bin and .parts pick the other backends")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pool", type=int, default=POOL_SIZE, help="storage worker threads")
+    parser.add_argument("--batch-window-ms", type=float, default=0.0,
+                        help="extra wait for more writes before a group commit")
+    args = parser.parse_args()
+
+    service = ExpenseService(open_storage(args.data, fsync=True), pool_size=args.pool,
+                             batch_window=args.batch_window_ms / 1000)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
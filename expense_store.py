@@ -0,0 +1,411 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate, compress, count
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Data versions are unique across every store in the process, so a cache key
+# taken from one store can never match a different store's data
+_versions = count(1)
+
+
+class TimestampParser:
+    # Caches the epoch value of each (date, hour) so bulk loads pay for
+    # datetime construction once per distinct hour instead of once per row
+    def __init__(self):
+        self._hours = {}
+
+    def parse(self, text):
+        key = text[:13]
+        base = self._hours.get(key)
+        if base is None or len(text) != 19:
+            dt = datetime.strptime(text, DATE_FORMAT)
+            if len(text) != 19:
+                return dt.timestamp()
+            base = self._hours[key] = dt.replace(minute=0, second=0).timestamp()
+        return base + int(text[14:16]) * 60 + int(text[17:19])
+
+
+def format_timestamp(timestamp, fmt=DATE_FORMAT):
+    return datetime.fromtimestamp(timestamp).strftime(fmt)
+
+
+def day_number(timestamp):
+    return datetime.fromtimestamp(timestamp).toordinal()
+
+
+class TimeIndex:
+    # Row numbers kept in timestamp order, with a parallel array of keys for bisect.
+    # Appending a newer expense is an O(1) append; back-dated rows shift the tail.
+    def __init__(self):
+        self.keys = array('d')
+        self.rows = array('l')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def insert(self, timestamp, row):
+        if not self.keys or timestamp >= self.keys[-1]:
+            self.keys.append(timestamp)
+            self.rows.append(row)
+        else:
+            pos = bisect_right(self.keys, timestamp)
+            self.keys.insert(pos, timestamp)
+            self.rows.insert(pos, row)
+
+    def remove(self, timestamp, row):
+        lo = bisect_left(self.keys, timestamp)
+        hi = bisect_right(self.keys, timestamp)
+        for pos in range(lo, hi):
+            if self.rows[pos] == row:
+                del self.keys[pos]
+                del self.rows[pos]
+                return
+
+    def rebuild(self, timestamps, deleted=()):
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        if deleted:
+            order = [row for row in order if row not in deleted]
+        self.rows = array('l', order)
+        self.keys = array('d', (timestamps[row] for row in order))
+
+    def between(self, start, end):
+        lo = bisect_left(self.keys, start)
+        hi = bisect_left(self.keys, end)
+        return self.rows[lo:hi]
+
+    def latest(self, count=None):
+        # Newest first
+        if count is None:
+            return self.rows[::-1]
+        return self.rows[:-count - 1:-1] if count < len(self.rows) else self.rows[::-1]
+
+    def newest_first(self):
+        rows = self.rows
+        for pos in range(len(rows) - 1, -1, -1):
+            yield rows[pos]
+
+
+class StoreRecords:
+    # Lazy record dicts for every row; keeps the store so columnar storage
+    # backends can write its columns directly
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return self.store.live_count
+
+    def __iter__(self):
+        deleted = self.store.deleted
+        for row in range(len(self.store)):
+            if row not in deleted:
+                yield self.store.record(row)
+
+
+class ExpenseStore:
+    # Batches larger than this rebuild the time index with one sort instead of
+    # inserting row by row
+    REBUILD_THRESHOLD = 256
+
+
+    def __init__(self):
+        self.ids = array('q')
+        self.timestamps = array('d')
+        self.days = array('l')
+        self.amounts = array('d')
+        self.category_codes = array('H')
+        self.descriptions = []
+        self.category_names = []
+        self._category_codes = {}
+        self.time_index = TimeIndex()
+        self._parser = TimestampParser()
+        self._day_cache = {}
+        # Bumped by every mutation; query caches key results on it
+        self.version = next(_versions)
+        # Tombstoned rows: out of the time index and every record listing, but
+        # still in the columns until compact() drops them
+        self.deleted = set()
+        # Built on first lookup, then kept current
+        self._rows_by_id = None
+        self._next_id = None
+
+    def __len__(self):
+        # Row numbers in use, tombstones included
+        return len(self.timestamps)
+
+    @property
+    def live_count(self):
+        return len(self.timestamps) - len(self.deleted)
+
+    @property
+    def next_id(self):
+        # Above every id this session has seen, so a delete never frees an id
+        # for reuse
+        if self._next_id is None:
+            self._next_id = max(self.ids, default=0) + 1
+        return self._next_id
+
+    def reserve_ids(self, highest):
+        # Ids up to highest belong to rows kept elsewhere (months left on
+        # disk), so next_id must not hand them out
+        self._next_id = max(self.next_id, highest + 1)
+
+    def row_of(self, expense_id):
+        # Live row holding an id, or None
+        if self._rows_by_id is None:
+            rows = dict(zip(self.ids, range(len(self.ids))))
+            for row in self.deleted:
+                if rows.get(self.ids[row]) == row:
+                    del rows[self.ids[row]]
+            self._rows_by_id = rows
+        return self._rows_by_id.get(expense_id)
+
+    def _track_ids(self, first):
+        new_ids = self.ids[first:]
+        if self._rows_by_id is not None:
+            self._rows_by_id.update(zip(new_ids, range(first, len(self.ids))))
+        if self._next_id is not None and new_ids:
+            self._next_id = max(self._next_id, max(new_ids) + 1)
+
+    @classmethod
+    def from_records(cls, records):
+        store = cls()
+        store.extend(records)
+        return store
+
+    def intern_category(self, name):
+        code = self._category_codes.get(name)
+        if code is None:
+            code = self._category_codes[name] = len(self.category_names)
+            self.category_names.append(name)
+        return code
+
+    def category_code(self, name):
+        return self._category_codes.get(name)
+
+    def _day(self, text, timestamp):
+        day = self._day_cache.get(text[:10])
+        if day is None:
+            day = self._day_cache[text[:10]] = day_number(timestamp)
+        return day
+
+    def append(self, expense):
+        row = self._append_columns(expense)
+        self.time_index.insert(self.timestamps[row], row)
+        self.version = next(_versions)
+        return row
+
+    def _append_columns(self, expense):
+        row = len(self.timestamps)
+        timestamp = self._parser.parse(expense['date'])
+        self.ids.append(int(expense.get('id', row + 1)))
+        self.timestamps.append(timestamp)
+        self.days.append(self._day(expense['date'], timestamp))
+        self.amounts.append(float(expense['amount']))
+        self.category_codes.append(self.intern_category(expense['category']))
+        self.descriptions.append(expense.get('description', ''))
+        self._track_ids(row)
+        return row
+
+    def extend(self, records, index=True):
+        # index=False leaves the new rows out of the time index; bulk importers
+        # call reindex() once at the end instead of merging every batch
+        first = len(self)
+        records = records if isinstance(records, list) else list(records)
+        # Column at a time: list comprehensions plus array.extend beat per-row appends
+        dates = [e['date'] for e in records]
+        parse = self._parser.parse
+        # Imported statements repeat the same date strings heavily
+        parsed = {d: parse(d) for d in set(dates)}
+        timestamps = [parsed[d] for d in dates]
+        day_cache = self._day_cache
+        for date, timestamp in zip(dates, timestamps):
+            if date[:10] not in day_cache:
+                day_cache[date[:10]] = day_number(timestamp)
+        intern = self.intern_category
+        self.ids.extend([int(e.get('id', first + i + 1)) for i, e in enumerate(records)])
+        self.timestamps.extend(timestamps)
+        self.days.extend([day_cache[d[:10]] for d in dates])
+        self.amounts.extend([float(e['amount']) for e in records])
+        self.category_codes.extend([intern(e['category']) for e in records])
+        self.descriptions.extend([e.get('description', '') for e in records])
+        self._track_ids(first)
+        self.version = next(_versions)
+        if not index:
+            return
+        if len(self) - first > self.REBUILD_THRESHOLD:
+            self.time_index.rebuild(self.timestamps, self.deleted)
+        else:
+            for row in range(first, len(self)):
+                self.time_index.insert(self.timestamps[row], row)
+
+    def reindex(self):
+        self.time_index.rebuild(self.timestamps, self.deleted)
+        self.version = next(_versions)
+
+    def update(self, row, expense):
+        # Rewrites a live row in place, keeping its id. Row-keyed indexes such
+        # as SearchIndex and AggregateEngine take the row out before and put
+        # it back after.
+        timestamp = self._parser.parse(expense['date'])
+        if timestamp != self.timestamps[row]:
+            self.time_index.remove(self.timestamps[row], row)
+            self.timestamps[row] = timestamp
+            self.time_index.insert(timestamp, row)
+        self.days[row] = self._day(expense['date'], timestamp)
+        self.amounts[row] = float(expense['amount'])
+        self.category_codes[row] = self.intern_category(expense['category'])
+        self.descriptions[row] = expense.get('description', '')
+        self.version = next(_versions)
+
+    def delete(self, row):
+        if row in self.deleted:
+            return
+        self.time_index.remove(self.timestamps[row], row)
+        self.deleted.add(row)
+        if self._rows_by_id is not None and self._rows_by_id.get(self.ids[row]) == row:
+            del self._rows_by_id[self.ids[row]]
+        self.version = next(_versions)
+
+    def compact(self):
+        # Drops tombstoned rows from the columns. Live rows keep their order but
+        # get new numbers, so row-keyed indexes must be rebuilt afterwards.
+        if not self.deleted:
+            return
+        live = bytearray(b'\1') * len(self)
+        for row in self.deleted:
+            live[row] = 0
+        for name in ('ids', 'timestamps', 'days', 'amounts', 'category_codes'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, compress(column, live)))
+        self.descriptions = list(compress(self.descriptions, live))
+        # New number of an old row is the count of live rows up to and including it
+        renumber = array('l', accumulate(live))
+        self.time_index.rows = array('l', (renumber[row] - 1 for row in self.time_index.rows))
+        self.deleted = set()
+        self._rows_by_id = None
+        self.version = next(_versions)
+
+    def category(self, row):
+        return self.category_names[self.category_codes[row]]
+
+    def record(self, row):
+        return {
+            "id": self.ids[row],
+            "category": self.category(row),
+            "amount": self.amounts[row],
+            "date": format_timestamp(self.timestamps[row]),
+            "description": self.descriptions[row]
+        }
+
+    def records(self):
+        return StoreRecords(self)
+
+    def copy(self):
+        store = ExpenseStore()
+        store.ids = array('q', self.ids)
+        store.timestamps = array('d', self.timestamps)
+        store.days = array('l', self.days)
+        store.amounts = array('d', self.amounts)
+        store.category_codes = array('H', self.category_codes)
+        store.descriptions = self.descriptions.copy()
+        store.deleted = set(self.deleted)
+        store._next_id = self._next_id
+        store.category_names = list(self.category_names)
+        store._category_codes = dict(self._category_codes)
+        store.time_index.keys = array('d', self.time_index.keys)
+        store.time_index.rows = array('l', self.time_index.rows)
+        return store
+
+    def rows_between(self, start, end):
+        return self.time_index.between(start, end)
+
+    def latest(self, count=None):
+        return self.time_index.latest(count)
+
+
+def period_bounds(time_filter, today=None):
+    today = today or datetime.now()
+    midnight = today.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if time_filter == "This Week":
+        start = midnight - timedelta(days=today.weekday())
+        end = start + timedelta(days=7)
+    elif time_filter == "This Month":
+        start = midnight.replace(day=1)
+        end = _next_month(start)
+    elif time_filter == "Last Month":
+        end = midnight.replace(day=1)
+        start = (end - timedelta(days=1)).replace(day=1)
+    elif time_filter == "This Year":
+        start = midnight.replace(month=1, day=1)
+        end = start.replace(year=start.year + 1)
+    else:  # All Time
+        return float('-inf'), float('inf')
+
+    return start.timestamp(), end.timestamp()
+
+
+def _next_month(first_day):
+    if first_day.month == 12:
+        return first_day.replace(year=first_day.year + 1, month=1)
+    return first_day.replace(month=first_day.month + 1)
+
+
+class NewestFirstView:
+    # Live, zero-copy view of every row, newest first
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store.time_index)
+
+    def page(self, offset, limit):
+        rows = self.store.time_index.rows
+        end = len(rows) - offset
+        start = max(0, end - limit)
+        return rows[start:end][::-1] if end > 0 else []
+
+
+class RowListView:
+    # Rows already in display order
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def page(self, offset, limit):
+        return self.rows[offset:offset + limit]
+
+
+class FilteredNewestView:
+    # Walks the time index newest first and keeps only the matches it needed so
+    # far; paging deeper extends the walk. len() is the estimate until the walk
+    # reaches the oldest row.
+    def __init__(self, store, accept, estimate):
+        self.store = store
+        self.accept = accept
+        self.estimate = estimate
+        self.rows = []
+        self._position = len(store.time_index) - 1
+        self._done = False
+
+    def __len__(self):
+        if self._done:
+            return len(self.rows)
+        return max(self.estimate, len(self.rows))
+
+    def page(self, offset, limit):
+        wanted = offset + limit
+        index_rows = self.store.time_index.rows
+        accept = self.accept
+        while len(self.rows) < wanted and self._position >= 0:
+            row = index_rows[self._position]
+            self._position -= 1
+            if accept(row):
+                self.rows.append(row)
+        if self._position < 0:
+            self._done = True
+        return self.rows[offset:wanted]
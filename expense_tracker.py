@@ -1,87 +1,89 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import json
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import argparse
 import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, timedelta
 import random
-from collections import defaultdict
+from storage import JournalStorage
+from expense_store import ExpenseStore, NewestFirstView, format_timestamp
+from aggregates import AggregateEngine, key_label, rollup_path, trend_span
+from analytics import PERIODS, insights_text, period_metrics
+from budgets import BudgetEngine
+from budget_dialog import BudgetDialog
+from expense_dialog import ExpenseDialog
+from search_index import SearchIndex
+from search_scheduler import SearchScheduler
+from virtual_list import VirtualTreeview
+from charts import CategoryPieChart, TrendChart
+from startup_timing import StartupTimer
+from theme import THEMES, ThemeRegistry
+from instrumentation import Instrumentation
+from diagnostics import DiagnosticsPanel
+from refresh_scheduler import RefreshScheduler
+from query_cache import QueryCache
+from importer import ImportResult, commit_batch, expense_batches
+from legacy_loader import OTHER_CATEGORY, RecordNormalizer, load_document, rejected_path, write_document
+from sample_data import SAMPLE_DESCRIPTIONS
+from service_errors import ServiceError
+
+_IMPORT_FINISHED = time.perf_counter()
+
+CHART_VIEWS = ("Category Split", "Spending Trend", "Category Over Time")
+TREND_CATEGORIES = 6
+
+# Methods timed by the instrumentation layer
+HOT_PATHS = ('update_metrics', 'update_expenses_list', 'update_chart', 'update_insights',
+             'save_data', 'load_data', 'read_data', 'filter_expenses', 'show_search_results', 'add_expense',
+             'update_expense', 'delete_expense')
+
+# Dashboard views, the method that draws each and the inputs it is drawn from;
+# a change to one input re-renders only the views that read it
+DASHBOARD_VIEWS = (
+    ('metrics', 'update_metrics', ('data', 'period', 'budgets')),
+    ('expenses', 'update_expenses_list', ('data',)),
+    ('insights', 'update_insights', ('data', 'period', 'budgets')),
+    ('chart', 'update_chart', ('data', 'period', 'chart_view', 'theme')),
+)
+
+# Deleted rows stay as tombstones until they pass this share of the store
+# (and TOMBSTONE_MIN); then the store is compacted and the search index rebuilt
+TOMBSTONE_RATIO = 0.1
+TOMBSTONE_MIN = 500
+
+# What a storage write can fail with: the disk, the network, or the service
+# refusing the change
+STORAGE_ERRORS = (OSError, ServiceError)
+
 
 class UltimateExpenseTracker:
-    def __init__(self, root):
+    def __init__(self, root, staged=True, startup_report=False, storage=None, diagnostics=False, workers=None):
+        self.startup = StartupTimer(_IMPORT_STARTED)
+        self.startup.phase("import", _IMPORT_STARTED, _IMPORT_FINISHED)
+        self.startup_report = startup_report
+        shell_started = time.perf_counter()
         self.root = root
         self.root.title("💰 Ultimate Expense Tracker")
         self.root.geometry("1200x800")
         
-        # Define multiple themes
-        self.themes = {
-            "Dark Professional": {
-                'primary': '#3b82f6',
-                'secondary': '#1e293b',
-                'accent': '#f59e0b',
-                'success': '#10b981',
-                'danger': '#ef4444',
-                'dark': '#0f172a',
-                'light': '#f8fafc',
-                'card': '#1e293b',
-                'text_light': '#f8fafc',
-                'text_dark': '#0f172a'
-            },
-            "Light Modern": {
-                'primary': '#2563eb',
-                'secondary': '#e2e8f0',
-                'accent': '#d97706',
-                'success': '#059669',
-                'danger': '#dc2626',
-                'dark': '#ffffff',
-                'light': '#1e293b',
-                'card': '#f1f5f9',
-                'text_light': '#1e293b',
-                'text_dark': '#ffffff'
-            },
-            "Pink Cute": {
-                'primary': '#ec4899',
-                'secondary': '#fbcfe8',
-                'accent': '#f59e0b',
-                'success': '#10b981',
-                'danger': '#ef4444',
-                'dark': '#fdf2f8',
-                'light': '#831843',
-                'card': '#fce7f3',
-                'text_light': '#831843',
-                'text_dark': '#fdf2f8'
-            },
-            "Ocean Blue": {
-                'primary': '#06b6d4',
-                'secondary': '#cffafe',
-                'accent': '#8b5cf6',
-                'success': '#10b981',
-                'danger': '#ef4444',
-                'dark': '#ecfeff',
-                'light': '#164e63',
-                'card': '#cffafe',
-                'text_light': '#164e63',
-                'text_dark': '#ecfeff'
-            },
-            "Forest Green": {
-                'primary': '#16a34a',
-                'secondary': '#dcfce7',
-                'accent': '#ca8a04',
-                'success': '#16a34a',
-                'danger': '#dc2626',
-                'dark': '#f0fdf4',
-                'light': '#166534',
-                'card': '#dcfce7',
-                'text_light': '#166534',
-                'text_dark': '#f0fdf4'
-            }
-        }
+        self.themes = THEMES
         
         # Default theme
         self.current_theme = "Dark Professional"
         self.colors = self.themes[self.current_theme]
         
+        # Categories whose color follows the theme
+        self.category_color_tokens = {
+            "🍔 Food": 'danger',
+            "🚗 Transportation": 'primary',
+            "🏠 Bills": 'success',
+            "🛒 Shopping": 'accent'
+        }
+        
         # Enhanced categories with icons
         self.categories = {
             "🍔 Food": {"color": self.colors['danger'], "icon": "🍔"},
@@ -95,36 +97,240 @@ class UltimateExpenseTracker:
             "🎓 Education": {"color": "#f97316", "icon": "🎓"},
             "🏋️ Fitness": {"color": "#22c55e", "icon": "🏋️"},
             "🎁 Gifts": {"color": "#eab308", "icon": "🎁"},
-            "💼 Business": {"color": "#64748b", "icon": "💼"}
+            "💼 Business": {"color": "#64748b", "icon": "💼"},
+            OTHER_CATEGORY: {"color": "#94a3b8", "icon": "📦"}
         }
         
-        self.expenses = []
-        self.budget_limits = {}
+        self.store = ExpenseStore()
         self.metric_widgets = {}
+        self.pie_chart = None
+        self.trend_chart = None
+        self.storage = storage or JournalStorage('premium_expenses.json')
+        # None when the data lives elsewhere: no rollup cache, aggregates are rebuilt
+        self.rollup_path = rollup_path(self.storage.path) if self.storage.path else None
+        # Worker processes for full aggregate builds; None decides by data size
+        self.aggregate_workers = workers
+        self.loading = False
+        self.importing = False
+        # Shown once the window is up, e.g. rows the loader had to skip
+        self.load_warning = None
+        # Older months of a partitioned store being read in, and whether a view
+        # asked for more while that was under way
+        self.fetching = False
+        self.fetch_pending = False
+        self.load_status = ("", 0)
+        self.diagnostics = None
+        
+        # Time the hot paths; wrapped before any callback binds to them
+        self.instruments = Instrumentation()
+        self.instruments.wrap(self, HOT_PATHS)
+        self.refresh = RefreshScheduler(self.root, ready=lambda: not (self.loading or self.importing),
+                                        instruments=self.instruments)
+        for name, method, inputs in DASHBOARD_VIEWS:
+            self.refresh.register(name, getattr(self, method), inputs)
+        
+        self.aggregates = AggregateEngine(self.store)
+        self.budgets = BudgetEngine(self.aggregates)
+        self.search_index = SearchIndex(self.store)
+        # Search views, keyed by (category, search term, data version)
+        self.query_cache = QueryCache()
+        self.search_scheduler = SearchScheduler(self.root, self.cached_search_view, self.show_search_results)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        if staged:
+            # Show the window shell right away and load data in the background
+            self.loading = True
+            self.load_status = ("Loading expenses…", 10)
+            self.create_gui()
+            self.startup.phase("gui shell", shell_started)
+            self.root.after_idle(self.startup.milestone, "first paint")
+            self.start_background_load()
+        else:
+            load_started = time.perf_counter()
+            budgets = self.load_data()
+            self.install_data(self.store, None, AggregateEngine.load(self.store, self.rollup_path, self.aggregate_workers),
+                              SearchIndex(self.store), budgets)
+            self.startup.phase("load + index", load_started)
+            self.create_gui()
+            self.update_dashboard()
+            self.refresh.flush()
+            self.startup.milestone("ready")
+            self.ensure_partitions(self.partitions_wanted())
+            self.show_load_warning()
+        
+        if diagnostics:
+            self.open_diagnostics()
+        
+    def start_background_load(self):
+        result = {}
+        
+        def work():
+            try:
+                began = time.perf_counter()
+                store, theme, budgets = self.read_data()
+                self.startup.phase("read data", began)
+                self.load_status = (f"Indexing {len(store):,} expenses…", 60)
+                began = time.perf_counter()
+                aggregates = AggregateEngine.load(store, self.rollup_path, self.aggregate_workers)
+                search_index = SearchIndex(store)
+                self.startup.phase("build indexes", began)
+                result['data'] = (store, theme, aggregates, search_index, budgets)
+            except Exception as e:
+                result['error'] = e
+        
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        self.root.after(50, self.poll_background_load, worker, result)
+        
+    def poll_background_load(self, worker, result):
+        self.show_load_status()
+        if worker.is_alive():
+            self.root.after(50, self.poll_background_load, worker, result)
+            return
+        if 'error' in result:
+            self.load_failed(result['error'])
+            return
         
-        # Load data
-        self.load_data()
-        self.create_gui()
-        self.update_dashboard()
+        self.install_data(*result['data'])
+        self.loading = False
+        self.show_load_status()
+        if self.theme_var.get() != self.current_theme:
+            # Saved theme differs from the shell's
+            self.theme_var.set(self.current_theme)
+            self.change_theme()
+        
+        # Fill the dashboard in stages, cheapest first; the chart pulls in matplotlib
+        began = time.perf_counter()
+        self.update_metrics()
+        self.startup.phase("metrics", began)
+        self.root.after_idle(self.finish_dashboard)
+        
+    def finish_dashboard(self):
+        began = time.perf_counter()
+        self.update_expenses_list()
+        self.update_insights()
+        self.startup.phase("list + insights", began)
+        self.root.after_idle(self.finish_chart)
+        
+    def finish_chart(self):
+        began = time.perf_counter()
+        self.update_chart()
+        self.startup.phase("chart", began)
+        self.finish_startup()
+        
+    def finish_startup(self):
+        self.startup.milestone("ready")
+        # Anything changed while the staged render was under way
+        self.refresh.flush()
+        self.ensure_partitions(self.partitions_wanted())
+        self.show_load_warning()
+        if self.startup_report:
+            self.startup.print_report()
+        
+    def load_failed(self, error):
+        # Nothing is written by an app that could not read the data, so the
+        # files stay exactly as they were for the user to fix or restore
+        messagebox.showerror("Error", f"Could not load your expenses: {error}\n\n"
+                                      "Your data files were not changed.")
+        self.storage.close()
+        self.root.destroy()
+        
+    def show_load_warning(self):
+        if self.load_warning:
+            messagebox.showwarning("Some expenses were skipped", self.load_warning)
+            self.load_warning = None
+        
+    def install_data(self, store, theme, aggregates, search_index, budgets=None):
+        with self.search_index.lock:
+            self.store = store
+            self.aggregates = aggregates
+            self.budgets = BudgetEngine(aggregates, budgets)
+            self.search_index = search_index
+        self.instruments.count('rows loaded', len(store))
+        if theme in self.themes:
+            self.current_theme = theme
+            self.colors = self.themes[self.current_theme]
+        
+    def show_load_status(self):
+        text, progress = self.load_status
+        if self.loading or self.importing or self.fetching:
+            if not self.load_label.winfo_ismapped():
+                self.load_progress.pack(side=tk.RIGHT, padx=(0, 10))
+                self.load_label.pack(side=tk.RIGHT, padx=10)
+            self.load_label.config(text=text)
+            self.load_progress['value'] = progress
+        else:
+            self.load_label.pack_forget()
+            self.load_progress.pack_forget()
+        
+    def open_diagnostics(self):
+        if self.diagnostics is not None and self.diagnostics.window.winfo_exists():
+            self.diagnostics.window.lift()
+            return
+        self.diagnostics = DiagnosticsPanel(self.root, self.instruments, self.search_latency_stats)
+        
+    def search_latency_stats(self):
+        stats = self.search_scheduler.latency_stats()
+        cache = self.query_cache.stats()
+        return {'search p50 ms': stats['p50_ms'], 'search p99 ms': stats['p99_ms'],
+                'searches cancelled': stats['cancelled'], 'query cache hits': cache['hits'],
+                'query cache misses': cache['misses'], 'query cache hit %': cache['hit_rate'] * 100}
+        
+    def save_rollups(self):
+        if self.rollup_path is None:
+            return
+        if self.store.deleted:
+            # Row numbers change once the tombstones are gone; let the next
+            # start rebuild instead
+            self.invalidate_rollups()
+            return
+        try:
+            self.aggregates.save(self.rollup_path)
+        except OSError:
+            # Only a cache; the next start rebuilds it from the data
+            pass
+        
+    def invalidate_rollups(self):
+        # After an edit or delete the saved cube no longer matches the data;
+        # the fingerprint would catch that at the next start, but dropping it
+        # now saves hashing the columns only to throw the cube away
+        if self.rollup_path is None:
+            return
+        try:
+            os.remove(self.rollup_path)
+        except OSError:
+            pass
+        
+    def on_close(self):
+        if not self.loading:
+            self.save_rollups()
+        # Let a running background compaction finish before the process exits
+        self.storage.close()
+        self.root.destroy()
         
     def create_gui(self):
+        self.update_category_colors()
+        self.theme = ThemeRegistry(self.colors)
+        self.theme.subscribe(self.apply_ttk_theme)
+        self.theme.subscribe(self.apply_chart_theme)
+        
         # Main container
-        self.main_container = tk.Frame(self.root, bg=self.colors['dark'])
+        self.main_container = self.themed(tk.Frame(self.root), bg='dark')
         self.main_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
         # Header
         self.create_header(self.main_container)
         
         # Content area
-        content_frame = tk.Frame(self.main_container, bg=self.colors['dark'])
+        content_frame = self.themed(tk.Frame(self.main_container), bg='dark')
         content_frame.pack(fill=tk.BOTH, expand=True, pady=20)
         
         # Left panel
-        left_panel = tk.Frame(content_frame, bg=self.colors['dark'])
+        left_panel = self.themed(tk.Frame(content_frame), bg='dark')
         left_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # Right panel
-        right_panel = tk.Frame(content_frame, bg=self.colors['dark'], width=400)
+        right_panel = self.themed(tk.Frame(content_frame, width=400), bg='dark')
         right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, padx=(20, 0))
         
         # Create sections
@@ -135,25 +341,22 @@ class UltimateExpenseTracker:
         self.create_analytics_section(right_panel)
         
     def create_header(self, parent):
-        header_frame = tk.Frame(parent, bg=self.colors['secondary'], height=80)
+        header_frame = self.themed(tk.Frame(parent, height=80), bg='secondary')
         header_frame.pack(fill=tk.X, pady=(0, 20))
         header_frame.pack_propagate(False)
         
         # App title
-        title_frame = tk.Frame(header_frame, bg=self.colors['secondary'])
+        title_frame = self.themed(tk.Frame(header_frame), bg='secondary')
         title_frame.pack(side=tk.LEFT, padx=30, pady=20)
         
-        tk.Label(title_frame, text="💰", font=('Arial', 24), 
-                bg=self.colors['secondary'], fg=self.colors['accent']).pack(side=tk.LEFT)
-        tk.Label(title_frame, text="Ultimate Expense Tracker", font=('Arial', 20, 'bold'), 
-                bg=self.colors['secondary'], fg=self.colors['text_light']).pack(side=tk.LEFT, padx=10)
+        self.themed(tk.Label(title_frame, text="💰", font=('Arial', 24)), bg='secondary', fg='accent').pack(side=tk.LEFT)
+        self.themed(tk.Label(title_frame, text="Ultimate Expense Tracker", font=('Arial', 20, 'bold')), bg='secondary', fg='text_light').pack(side=tk.LEFT, padx=10)
         
         # Theme selector
-        theme_frame = tk.Frame(header_frame, bg=self.colors['secondary'])
+        theme_frame = self.themed(tk.Frame(header_frame), bg='secondary')
         theme_frame.pack(side=tk.RIGHT, padx=30, pady=20)
         
-        tk.Label(theme_frame, text="Theme:", font=('Arial', 10), 
-                bg=self.colors['secondary'], fg=self.colors['text_light']).pack(side=tk.LEFT)
+        self.themed(tk.Label(theme_frame, text="Theme:", font=('Arial', 10)), bg='secondary', fg='text_light').pack(side=tk.LEFT)
         
         self.theme_var = tk.StringVar(value=self.current_theme)
         theme_combo = ttk.Combobox(theme_frame, textvariable=self.theme_var, 
@@ -162,66 +365,95 @@ class UltimateExpenseTracker:
         theme_combo.pack(side=tk.LEFT, padx=10)
         theme_combo.bind('<<ComboboxSelected>>', self.change_theme)
         
+        # Diagnostics overlay
+        self.themed(tk.Button(header_frame, text="🩺", font=('Arial', 12), relief='flat', cursor='hand2',
+                              command=self.open_diagnostics),
+                    bg='secondary', fg='text_light', activebackground='primary').pack(side=tk.RIGHT, pady=20)
+        
         # Current date
-        date_frame = tk.Frame(header_frame, bg=self.colors['secondary'])
+        date_frame = self.themed(tk.Frame(header_frame), bg='secondary')
         date_frame.pack(side=tk.RIGHT, padx=30, pady=20)
         
-        self.date_label = tk.Label(date_frame, text=datetime.now().strftime("%A, %B %d, %Y"), 
-                                  font=('Arial', 12), bg=self.colors['secondary'], fg=self.colors['text_light'])
+        self.date_label = self.themed(tk.Label(date_frame, text=datetime.now().strftime("%A, %B %d, %Y"), 
+                                               font=('Arial', 12)), bg='secondary', fg='text_light')
         self.date_label.pack()
         
+        # Background load progress
+        self.load_progress = ttk.Progressbar(header_frame, mode='determinate', length=120)
+        self.load_label = self.themed(tk.Label(header_frame, text=self.load_status[0], font=('Arial', 10)),
+                                      bg='secondary', fg='text_light')
+        if self.loading:
+            self.load_progress.pack(side=tk.RIGHT, padx=(0, 10))
+            self.load_label.pack(side=tk.RIGHT, padx=10)
+            self.load_progress['value'] = self.load_status[1]
+        
     def change_theme(self, event=None):
         self.current_theme = self.theme_var.get()
         self.colors = self.themes[self.current_theme]
         
-        # Update categories colors
-        self.categories["🍔 Food"]["color"] = self.colors['danger']
-        self.categories["🚗 Transportation"]["color"] = self.colors['primary']
-        self.categories["🎬 Entertainment"]["color"] = "#8b5cf6"
-        self.categories["🏠 Bills"]["color"] = self.colors['success']
-        self.categories["🛒 Shopping"]["color"] = self.colors['accent']
-        self.categories["🏥 Health"]["color"] = "#ec4899"
+        self.update_category_colors()
+        
+        # Recolor the existing widgets in place; data and aggregates stay as they are
+        self.theme.apply(self.colors)
+        if event is not None:
+            # Picked by the user rather than restored from the data file
+            self.storage.set_theme(self.current_theme)
         
-        # Recreate the entire GUI with new theme
-        self.main_container.destroy()
-        self.create_gui()
-        self.update_dashboard()
+    def update_category_colors(self):
+        for category, token in self.category_color_tokens.items():
+            self.categories[category]["color"] = self.colors[token]
+        
+    def themed(self, widget, **tokens):
+        return self.theme.bind(widget, **tokens)
+        
+    def apply_ttk_theme(self, colors):
+        style = ttk.Style(self.root)
+        style.configure("Treeview", background=colors['card'], fieldbackground=colors['card'],
+                        foreground=colors['text_light'])
+        style.map("Treeview", background=[('selected', colors['primary'])],
+                  foreground=[('selected', 'white')])
+        
+    def apply_chart_theme(self, colors):
+        if self.trend_chart is not None:
+            self.trend_chart.set_colors(colors)
+        if self.pie_chart is not None:
+            self.pie_chart.set_colors(colors)
+        if self.pie_chart is not None or self.trend_chart is not None:
+            self.update_dashboard('theme')
         
     def create_metrics_section(self, parent):
-        metrics_frame = tk.Frame(parent, bg=self.colors['dark'])
+        metrics_frame = self.themed(tk.Frame(parent), bg='dark')
         metrics_frame.pack(fill=tk.X, pady=(0, 20))
         
         # Create metric cards
         metric_configs = [
-            ("Total Spent", "total_spent", "$0.00", "This Month", self.colors['primary']),
-            ("Daily Average", "daily_avg", "$0.00", "Per Day", self.colors['success']),
-            ("Budget Left", "budget_left", "$0.00", "Remaining", self.colors['accent']),
-            ("Top Category", "top_category", "Food", "Spending", self.colors['danger'])
+            ("Total Spent", "total_spent", "$0.00", "This Month", 'primary'),
+            ("Daily Average", "daily_avg", "$0.00", "Per Day", 'success'),
+            ("Budget Left", "budget_left", "$0.00", "Remaining", 'accent'),
+            ("Top Category", "top_category", "Food", "Spending", 'danger')
         ]
         
         for i, (title, key, value, subtitle, color) in enumerate(metric_configs):
-            card_frame = tk.Frame(metrics_frame, bg=self.colors['card'], relief='raised', bd=2,
-                                highlightbackground=color, highlightthickness=2)
+            card_frame = self.themed(tk.Frame(metrics_frame, relief='raised', bd=2, highlightthickness=2),
+                                     bg='card', highlightbackground=color)
             card_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, 
                           padx=(0, 15) if i < 3 else (0, 0))
             card_frame.configure(height=120)
             
             # Content
-            content_frame = tk.Frame(card_frame, bg=self.colors['card'])
+            content_frame = self.themed(tk.Frame(card_frame), bg='card')
             content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
             
             # Title
-            tk.Label(content_frame, text=title, font=('Arial', 12, 'bold'),
-                    bg=self.colors['card'], fg=self.colors['text_light']).pack(anchor=tk.W)
+            self.themed(tk.Label(content_frame, text=title, font=('Arial', 12, 'bold')), bg='card', fg='text_light').pack(anchor=tk.W)
             
             # Value
-            value_label = tk.Label(content_frame, text=value, font=('Arial', 24, 'bold'),
-                                  bg=self.colors['card'], fg=color)
+            value_label = self.themed(tk.Label(content_frame, text=value, font=('Arial', 24, 'bold')),
+                                      bg='card', fg=color)
             value_label.pack(anchor=tk.W, pady=(5, 0))
             
             # Subtitle
-            subtitle_label = tk.Label(content_frame, text=subtitle, font=('Arial', 10),
-                                     bg=self.colors['card'], fg=self.colors['text_light'])
+            subtitle_label = self.themed(tk.Label(content_frame, text=subtitle, font=('Arial', 10)), bg='card', fg='text_light')
             subtitle_label.pack(anchor=tk.W)
             
             # Store widgets for updating
@@ -231,18 +463,17 @@ class UltimateExpenseTracker:
             }
             
     def create_quick_add_section(self, parent):
-        quick_frame = tk.LabelFrame(parent, text="⚡ Quick Add Expense", 
-                                   font=('Arial', 12, 'bold'), bg=self.colors['dark'],
-                                   fg=self.colors['text_light'], padx=20, pady=15)
+        quick_frame = self.themed(tk.LabelFrame(parent, text="⚡ Quick Add Expense", 
+                                                font=('Arial', 12, 'bold'), padx=20, pady=15),
+                                  bg='dark', fg='text_light')
         quick_frame.pack(fill=tk.X, pady=(0, 20))
         
         # Form grid
-        form_frame = tk.Frame(quick_frame, bg=self.colors['dark'])
+        form_frame = self.themed(tk.Frame(quick_frame), bg='dark')
         form_frame.pack(fill=tk.X)
         
         # Category
-        tk.Label(form_frame, text="Category", font=('Arial', 10), 
-                bg=self.colors['dark'], fg=self.colors['text_light']).grid(row=0, column=0, sticky=tk.W, pady=5)
+        self.themed(tk.Label(form_frame, text="Category", font=('Arial', 10)), bg='dark', fg='text_light').grid(row=0, column=0, sticky=tk.W, pady=5)
         self.category_var = tk.StringVar()
         category_combo = ttk.Combobox(form_frame, textvariable=self.category_var, 
                                      values=list(self.categories.keys()), state="readonly",
@@ -251,56 +482,64 @@ class UltimateExpenseTracker:
         category_combo.set("🍔 Food")
         
         # Amount
-        tk.Label(form_frame, text="Amount", font=('Arial', 10), 
-                bg=self.colors['dark'], fg=self.colors['text_light']).grid(row=0, column=2, sticky=tk.W, pady=5, padx=(20,0))
+        self.themed(tk.Label(form_frame, text="Amount", font=('Arial', 10)), bg='dark', fg='text_light').grid(row=0, column=2, sticky=tk.W, pady=5, padx=(20,0))
         self.amount_var = tk.StringVar()
         amount_entry = tk.Entry(form_frame, textvariable=self.amount_var, font=('Arial', 12),
                                bg='white', fg='black', relief='solid', bd=1, width=15)
         amount_entry.grid(row=0, column=3, padx=10, pady=5, sticky=tk.W)
         
         # Description
-        tk.Label(form_frame, text="Description", font=('Arial', 10), 
-                bg=self.colors['dark'], fg=self.colors['text_light']).grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.themed(tk.Label(form_frame, text="Description", font=('Arial', 10)), bg='dark', fg='text_light').grid(row=1, column=0, sticky=tk.W, pady=5)
         self.desc_var = tk.StringVar()
         desc_entry = tk.Entry(form_frame, textvariable=self.desc_var, font=('Arial', 10),
                              bg='white', fg='black', relief='solid', bd=1, width=30)
         desc_entry.grid(row=1, column=1, columnspan=3, padx=10, pady=5, sticky=tk.W+tk.E)
         
         # Buttons
-        button_frame = tk.Frame(quick_frame, bg=self.colors['dark'])
+        button_frame = self.themed(tk.Frame(quick_frame), bg='dark')
         button_frame.pack(fill=tk.X, pady=(10, 0))
         
-        add_btn = tk.Button(button_frame, text="💾 Add Expense", font=('Arial', 11, 'bold'),
-                           bg=self.colors['primary'], fg='white', relief='raised', bd=2,
-                           command=self.add_expense, padx=20, pady=8)
+        add_btn = self.themed(tk.Button(button_frame, text="💾 Add Expense", font=('Arial', 11, 'bold'),
+                                        fg='white', relief='raised', bd=2,
+                                        command=self.add_expense, padx=20, pady=8), bg='primary')
         add_btn.pack(side=tk.LEFT)
         
-        clear_btn = tk.Button(button_frame, text="🗑️ Clear", font=('Arial', 11),
-                             bg=self.colors['secondary'], fg='white', relief='raised', bd=2,
-                             command=self.clear_form, padx=20, pady=8)
+        clear_btn = self.themed(tk.Button(button_frame, text="🗑️ Clear", font=('Arial', 11),
+                                          fg='white', relief='raised', bd=2,
+                                          command=self.clear_form, padx=20, pady=8), bg='secondary')
         clear_btn.pack(side=tk.LEFT, padx=10)
         
+        import_btn = self.themed(tk.Button(button_frame, text="📥 Import", font=('Arial', 11),
+                                           fg='white', relief='raised', bd=2,
+                                           command=self.import_statement, padx=20, pady=8), bg='secondary')
+        import_btn.pack(side=tk.LEFT)
+        
+        budget_btn = self.themed(tk.Button(button_frame, text="🎯 Budgets", font=('Arial', 11),
+                                           fg='white', relief='raised', bd=2,
+                                           command=self.open_budgets, padx=20, pady=8), bg='secondary')
+        budget_btn.pack(side=tk.LEFT, padx=10)
+        
         # Quick amount buttons
         quick_amounts = [10, 20, 50, 100]
         for amount in quick_amounts:
-            btn = tk.Button(button_frame, text=f"${amount}", font=('Arial', 9),
-                           bg=self.colors['card'], fg=self.colors['text_light'], relief='solid', bd=1,
-                           command=lambda a=amount: self.amount_var.set(str(a)))
+            btn = self.themed(tk.Button(button_frame, text=f"${amount}", font=('Arial', 9),
+                                        relief='solid', bd=1,
+                                        command=lambda a=amount: self.amount_var.set(str(a))),
+                              bg='card', fg='text_light')
             btn.pack(side=tk.LEFT, padx=5)
         
     def create_expenses_section(self, parent):
-        expenses_frame = tk.LabelFrame(parent, text="📋 Recent Expenses", 
-                                      font=('Arial', 12, 'bold'), bg=self.colors['dark'],
-                                      fg=self.colors['text_light'], padx=20, pady=15)
+        expenses_frame = self.themed(tk.LabelFrame(parent, text="📋 Recent Expenses", 
+                                                   font=('Arial', 12, 'bold'), padx=20, pady=15),
+                                     bg='dark', fg='text_light')
         expenses_frame.pack(fill=tk.BOTH, expand=True)
         
         # Toolbar
-        toolbar = tk.Frame(expenses_frame, bg=self.colors['dark'])
+        toolbar = self.themed(tk.Frame(expenses_frame), bg='dark')
         toolbar.pack(fill=tk.X, pady=(0, 10))
         
         # Search
-        tk.Label(toolbar, text="Search:", font=('Arial', 10), 
-                bg=self.colors['dark'], fg=self.colors['text_light']).pack(side=tk.LEFT)
+        self.themed(tk.Label(toolbar, text="Search:", font=('Arial', 10)), bg='dark', fg='text_light').pack(side=tk.LEFT)
         self.search_var = tk.StringVar()
         search_entry = tk.Entry(toolbar, textvariable=self.search_var, font=('Arial', 10),
                                bg='white', fg='black', relief='solid', bd=1, width=20)
@@ -308,22 +547,32 @@ class UltimateExpenseTracker:
         search_entry.bind('<KeyRelease>', self.filter_expenses)
         
         # Filter by category
-        tk.Label(toolbar, text="Category:", font=('Arial', 10), 
-                bg=self.colors['dark'], fg=self.colors['text_light']).pack(side=tk.LEFT, padx=(20,0))
+        self.themed(tk.Label(toolbar, text="Category:", font=('Arial', 10)), bg='dark', fg='text_light').pack(side=tk.LEFT, padx=(20,0))
         self.filter_var = tk.StringVar()
         filter_combo = ttk.Combobox(toolbar, textvariable=self.filter_var, 
                                    values=["All"] + list(self.categories.keys()), state="readonly",
                                    font=('Arial', 10), width=15)
         filter_combo.pack(side=tk.LEFT, padx=5)
         filter_combo.set("All")
-        filter_combo.bind('<<ComboboxSelected>>', self.filter_expenses)
+        filter_combo.bind('<<ComboboxSelected>>', lambda e: self.filter_expenses(e, delay_ms=0))
+        
+        # Edit / delete the selected row (also double-click, Return and Delete)
+        delete_btn = self.themed(tk.Button(toolbar, text="🗑️ Delete", font=('Arial', 9), fg='white',
+                                           relief='raised', bd=1, command=self.delete_selected), bg='danger')
+        delete_btn.pack(side=tk.RIGHT)
+        edit_btn = self.themed(tk.Button(toolbar, text="✏️ Edit", font=('Arial', 9), fg='white',
+                                         relief='raised', bd=1, command=self.edit_selected), bg='secondary')
+        edit_btn.pack(side=tk.RIGHT, padx=5)
         
         # Treeview
-        tree_frame = tk.Frame(expenses_frame, bg=self.colors['dark'])
+        tree_frame = self.themed(tk.Frame(expenses_frame), bg='dark')
         tree_frame.pack(fill=tk.BOTH, expand=True)
         
         columns = ("Date", "Description", "Category", "Amount")
-        self.expense_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=12)
+        # Only the visible window of rows lives in the Treeview; scrolling pages through the store
+        self.expense_list = VirtualTreeview(tree_frame, columns, self.format_expense_row, height=12)
+        self.expense_tree = self.expense_list.tree
+        self.instruments.wrap(self.expense_list, ('refresh',), prefix='treeview')
         
         # Configure columns
         self.expense_tree.heading("Date", text="📅 Date")
@@ -336,48 +585,53 @@ class UltimateExpenseTracker:
         self.expense_tree.column("Category", width=120)
         self.expense_tree.column("Amount", width=100)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.expense_tree.yview)
-        self.expense_tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.expense_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.expense_list.pack()
+        self.expense_tree.bind('<Double-1>', self.edit_selected)
+        self.expense_tree.bind('<Return>', self.edit_selected)
+        self.expense_tree.bind('<Delete>', self.delete_selected)
         
     def create_charts_section(self, parent):
-        charts_frame = tk.LabelFrame(parent, text="📊 Analytics", 
-                                    font=('Arial', 12, 'bold'), bg=self.colors['dark'],
-                                    fg=self.colors['text_light'], padx=15, pady=15)
+        charts_frame = self.themed(tk.LabelFrame(parent, text="📊 Analytics", 
+                                                 font=('Arial', 12, 'bold'), padx=15, pady=15),
+                                   bg='dark', fg='text_light')
         charts_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
         
         # Time filter
-        filter_frame = tk.Frame(charts_frame, bg=self.colors['dark'])
+        filter_frame = self.themed(tk.Frame(charts_frame), bg='dark')
         filter_frame.pack(fill=tk.X, pady=(0, 10))
         
-        tk.Label(filter_frame, text="Period:", font=('Arial', 10), 
-                bg=self.colors['dark'], fg=self.colors['text_light']).pack(side=tk.LEFT)
+        self.themed(tk.Label(filter_frame, text="Period:", font=('Arial', 10)), bg='dark', fg='text_light').pack(side=tk.LEFT)
         
         self.time_filter = tk.StringVar(value="This Month")
-        time_options = ["This Week", "This Month", "Last Month", "This Year", "All Time"]
+        time_options = list(PERIODS)
         
         for option in time_options:
-            rb = tk.Radiobutton(filter_frame, text=option, variable=self.time_filter, 
-                               value=option, bg=self.colors['dark'], fg=self.colors['text_light'],
-                               selectcolor=self.colors['primary'], command=self.update_dashboard)
+            rb = self.themed(tk.Radiobutton(filter_frame, text=option, variable=self.time_filter, 
+                                            value=option, command=self.change_period),
+                             bg='dark', fg='text_light', selectcolor='primary')
             rb.pack(side=tk.LEFT, padx=5)
         
         # Chart container
-        self.chart_container = tk.Frame(charts_frame, bg=self.colors['card'], height=250)
+        self.chart_view = tk.StringVar(value=CHART_VIEWS[0])
+        view_combo = ttk.Combobox(filter_frame, textvariable=self.chart_view, values=CHART_VIEWS,
+                                  state="readonly", font=('Arial', 10), width=18)
+        view_combo.pack(side=tk.RIGHT)
+        view_combo.bind('<<ComboboxSelected>>', lambda e: self.update_dashboard('chart_view'))
+        self.themed(tk.Label(filter_frame, text="View:", font=('Arial', 10)), bg='dark', fg='text_light').pack(side=tk.RIGHT, padx=5)
+        
+        self.chart_container = self.themed(tk.Frame(charts_frame, height=250), bg='card')
         self.chart_container.pack(fill=tk.BOTH, expand=True)
         self.chart_container.pack_propagate(False)
         
     def create_analytics_section(self, parent):
-        analytics_frame = tk.LabelFrame(parent, text="🎯 Insights", 
-                                       font=('Arial', 12, 'bold'), bg=self.colors['dark'],
-                                       fg=self.colors['text_light'], padx=15, pady=15)
+        analytics_frame = self.themed(tk.LabelFrame(parent, text="🎯 Insights", 
+                                                    font=('Arial', 12, 'bold'), padx=15, pady=15),
+                                      bg='dark', fg='text_light')
         analytics_frame.pack(fill=tk.BOTH, expand=True)
         
-        self.insights_text = tk.Text(analytics_frame, height=8, font=('Arial', 10),
-                                    bg=self.colors['card'], fg=self.colors['text_light'],
-                                    relief='solid', bd=1, wrap=tk.WORD)
+        self.insights_text = self.themed(tk.Text(analytics_frame, height=8, font=('Arial', 10),
+                                                 relief='solid', bd=1, wrap=tk.WORD),
+                                         bg='card', fg='text_light')
         self.insights_text.pack(fill=tk.BOTH, expand=True)
         self.insights_text.config(state=tk.DISABLED)
         
@@ -386,6 +640,10 @@ class UltimateExpenseTracker:
         amount_str = self.amount_var.get()
         description = self.desc_var.get()
         
+        if self.loading or self.importing:
+            messagebox.showinfo("Loading", "Your expenses are still loading, please try again in a moment")
+            return
+        
         if not category or category not in self.categories:
             messagebox.showerror("Error", "Please select a valid category")
             return
@@ -398,63 +656,301 @@ class UltimateExpenseTracker:
             messagebox.showerror("Error", "Please enter a valid positive amount")
             return
         
-        expense = {
-            "id": len(self.expenses) + 1,
-            "category": category,
-            "amount": amount,
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "description": description or f"{category} expense"
-        }
+        try:
+            expense = {
+                "id": self.storage.allocate_ids(self.store),
+                "category": category,
+                "amount": amount,
+                "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "description": description or f"{category} expense"
+            }
+            self.storage.append(expense)
+        except STORAGE_ERRORS as e:
+            self.save_failed(e)
+            return
         
-        self.expenses.append(expense)
+        with self.search_index.lock:
+            row = self.store.append(expense)
+            self.search_index.add_row(row)
+        self.aggregates.add_row(row)
+        alerts = self.budgets.check(row)
         self.clear_form()
-        self.save_data()
-        self.update_dashboard()
+        self.compact_journal()
+        self.update_dashboard('data')
+        
+        if alerts:
+            messagebox.showwarning("Budget alert", f"✅ Added ${amount:.2f} for {category}\n\n" +
+                                   "\n".join(alert.message for alert in alerts))
+        else:
+            messagebox.showinfo("Success", f"✅ Added ${amount:.2f} for {category}")
+    
+    def selected_expense_id(self):
+        selection = self.expense_tree.selection()
+        row = self.expense_list.row_for_item(selection[0]) if selection else None
+        return self.store.ids[row] if row is not None else None
+    
+    def edit_selected(self, event=None):
+        expense_id = self.selected_expense_id()
+        if expense_id is None or self.loading or self.importing:
+            return
+        record = self.store.record(self.store.row_of(expense_id))
+        ExpenseDialog(self.root, record, self.categories, self.colors, self.update_expense, self.delete_expense)
+    
+    def delete_selected(self, event=None):
+        expense_id = self.selected_expense_id()
+        if expense_id is None or self.loading or self.importing:
+            return
+        record = self.store.record(self.store.row_of(expense_id))
+        if messagebox.askyesno("Delete expense", f"Delete \"{record['description']}\" (${record['amount']:.2f})?"):
+            self.delete_expense(expense_id)
+    
+    def update_expense(self, expense):
+        # In place: the row leaves the search index and aggregates with its old
+        # values and comes back with the new ones
+        row = self.store.row_of(expense['id'])
+        if row is None:
+            return
+        try:
+            self.storage.update(expense)
+        except STORAGE_ERRORS as e:
+            self.save_failed(e)
+            return
+        self.aggregates.remove_row(row)
+        with self.search_index.lock:
+            self.search_index.unlink_row(row)
+            self.store.update(row, expense)
+            self.search_index.link_row(row)
+        self.aggregates.add_row(row)
+        self.invalidate_rollups()
+        self.compact_journal()
+        self.update_dashboard('data')
+    
+    def delete_expense(self, expense_id):
+        row = self.store.row_of(expense_id)
+        if row is None:
+            return
+        try:
+            self.storage.delete(expense_id)
+        except STORAGE_ERRORS as e:
+            self.save_failed(e)
+            return
+        self.aggregates.remove_row(row)
+        with self.search_index.lock:
+            self.search_index.unlink_row(row)
+            self.store.delete(row)
+        self.invalidate_rollups()
+        if len(self.store.deleted) > max(TOMBSTONE_MIN, TOMBSTONE_RATIO * len(self.store)):
+            self.compact_tombstones()
+        self.compact_journal()
+        self.update_dashboard('data')
+    
+    def save_failed(self, error):
+        # Nothing in memory changed, so what is on screen is still what is saved
+        messagebox.showerror("Error", f"Could not save the change: {error}")
+    
+    def compact_tombstones(self):
+        # Row numbers change, so the search index is rebuilt; the aggregates
+        # are keyed by day and category and stay as they are
+        with self.search_index.lock:
+            self.store.compact()
+            search_index = SearchIndex(self.store)
+            self.search_index = search_index
+        self.instruments.count('tombstone compactions')
+    
+    def compact_journal(self):
+        if self.storage.needs_compaction():
+            self.storage.compact(self.store.copy().records(), self.current_theme)
+    
+    def open_budgets(self):
+        if self.loading or self.importing:
+            return
+        BudgetDialog(self.root, self.budgets, self.categories, self.colors, self.save_budgets)
+    
+    def save_budgets(self):
+        self.storage.set_budgets(self.budgets.to_list())
+        self.update_dashboard('budgets')
+    
+    def import_statement(self):
+        if self.loading or self.importing:
+            return
+        path = filedialog.askopenfilename(title="Import bank statement",
+                                          filetypes=[("Bank statements", "*.csv *.ofx *.qfx"),
+                                                     ("All files", "*.*")])
+        if not path:
+            return
         
-        messagebox.showinfo("Success", f"✅ Added ${amount:.2f} for {category}")
+        # Parsing and categorizing run on a worker; batches are committed on the Tk thread
+        self.importing = True
+        self.load_status = ("Importing…", 0)
+        self.show_load_status()
+        batches = queue.Queue(maxsize=4)
+        result = ImportResult()
+        started = time.perf_counter()
+        
+        def work():
+            try:
+                for batch in expense_batches(path, self.categories, result):
+                    batches.put(batch)
+                batches.put(None)
+            except Exception as e:
+                batches.put(e)
+        
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(20, self.commit_import_batches, batches, result, started)
+    
+    def commit_import_batches(self, batches, result, started):
+        while True:
+            try:
+                batch = batches.get_nowait()
+            except queue.Empty:
+                self.load_status = (f"Importing… {result.imported:,} rows", 50)
+                self.show_load_status()
+                self.root.after(20, self.commit_import_batches, batches, result, started)
+                return
+            if batch is None or isinstance(batch, Exception):
+                break
+            with self.search_index.lock:
+                rows = commit_batch(self.store, self.storage, batch)
+                for row in rows:
+                    self.search_index.add_row(row)
+            for row in rows:
+                self.aggregates.add_row(row)
+            self.instruments.count('rows imported', len(rows))
+        
+        with self.search_index.lock:
+            self.store.reindex()
+        self.importing = False
+        self.show_load_status()
+        # One dashboard refresh for the whole import
+        self.update_dashboard('data')
+        self.resume_partitions()
+        self.save_rollups()
+        if isinstance(batch, Exception):
+            messagebox.showerror("Import failed", f"Imported {result.imported} expenses before an error: {batch}")
+            return
+        result.seconds = time.perf_counter() - started
+        messagebox.showinfo("Import complete", f"✅ Imported {result.imported:,} expenses "
+                            f"({result.skipped:,} skipped, {result.rows_per_second:,.0f} rows/s)")
     
     def clear_form(self):
         self.amount_var.set("")
         self.desc_var.set("")
         self.category_var.set("🍔 Food")
     
-    def filter_expenses(self, event=None):
+    def filter_expenses(self, event=None, delay_ms=None):
         search_term = self.search_var.get().lower()
         category_filter = self.filter_var.get()
+        if search_term or category_filter not in ("", "All"):
+            self.ensure_partitions(None)
         
-        for item in self.expense_tree.get_children():
-            self.expense_tree.delete(item)
-        
-        filtered_expenses = self.expenses.copy()
-        
-        if search_term:
-            filtered_expenses = [e for e in filtered_expenses 
-                               if search_term in e['description'].lower()]
-        
-        if category_filter != "All":
-            filtered_expenses = [e for e in filtered_expenses 
-                               if e['category'] == category_filter]
+        if category_filter in ("", "All"):
+            code = None
+        else:
+            code = self.store.category_code(category_filter)
+            if code is None:
+                self.show_search_results([])
+                return
         
-        # Show recent first
-        filtered_expenses.sort(key=lambda x: x['date'], reverse=True)
+        # Debounced and run off the Tk thread; only the newest query is rendered
+        self.search_scheduler.request(search_term, code, delay_ms=delay_ms)
+    
+    def cached_search_view(self, term, code):
+        # Runs on the search worker. The list ignores the period, hence no time
+        # filter in the key; the version is read before searching so a result
+        # racing an append is filed under the older version and never served.
+        search_index = self.search_index
+        key = (code, term, search_index.store.version)
+        return self.query_cache.get(key, lambda: search_index.search_view(term, code))
+    
+    def show_search_results(self, view):
+        self.expense_list.set_source(view)
+    
+    def format_expense_row(self, row):
+        store = self.store
+        return (
+            format_timestamp(store.timestamps[row], "%m/%d/%Y"),
+            store.descriptions[row],
+            store.category(row),
+            f"${store.amounts[row]:.2f}"
+        )
+    
+    def change_period(self):
+        self.ensure_partitions(self.partitions_wanted())
+        self.update_dashboard('period')
+    
+    def partitions_wanted(self):
+        # Period the loaded months must cover, None for the whole history: the
+        # expense search spans everything and year budgets need the year
+        if self.search_var.get() or self.filter_var.get() not in ("", "All"):
+            return None
+        period = self.time_filter.get()
+        if period not in ("This Year", "All Time") and any(p == 'year' for p, _ in self.budgets.limits):
+            return "This Year"
+        return period
+    
+    def ensure_partitions(self, period):
+        # Partitioned storage starts with the recent months only; older ones
+        # are read on a worker when a view first needs them and appended like
+        # an import
+        if self.loading or self.importing or self.fetching:
+            self.fetch_pending = True
+            return
+        months = self.storage.unloaded_months(period)
+        if not months:
+            return
+        self.fetching = True
+        self.load_status = (f"Loading {len(months)} older months "
+                            f"({self.storage.partition_rows(months):,} expenses)…", 50)
+        self.show_load_status()
+        normalizer = RecordNormalizer(self.categories)
+        result = {}
+        
+        def work():
+            try:
+                result['records'] = self.storage.read_partitions(months, normalizer)
+            except Exception as e:
+                result['error'] = e
+        
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        self.root.after(50, self.poll_partitions, worker, result)
+    
+    def poll_partitions(self, worker, result):
+        if worker.is_alive():
+            self.root.after(50, self.poll_partitions, worker, result)
+            return
+        self.fetching = False
+        self.show_load_status()
+        if 'error' in result:
+            messagebox.showerror("Error", f"Could not load older expenses: {result['error']}")
+            return
         
-        for expense in filtered_expenses[:20]:  # Limit to 20 entries
-            date_obj = datetime.strptime(expense['date'], "%Y-%m-%d %H:%M:%S")
-            self.expense_tree.insert("", "end", values=(
-                date_obj.strftime("%m/%d/%Y"),
-                expense['description'],
-                expense['category'],
-                f"${expense['amount']:.2f}"
-            ))
+        # Rows already here were edited into a loaded month this session
+        store = self.store
+        records = [r for r in result['records'] if store.row_of(r.get('id')) is None]
+        first = len(store)
+        with self.search_index.lock:
+            store.extend(records)
+            for row in range(first, len(store)):
+                self.search_index.add_row(row)
+        self.aggregates.add_rows(first, len(store))
+        self.instruments.count('rows loaded', len(records))
+        self.update_dashboard('data')
+        self.resume_partitions()
     
-    def update_dashboard(self):
-        self.update_metrics()
-        self.update_expenses_list()
-        self.update_insights()
-        self.update_chart()
+    def resume_partitions(self):
+        # A view asked for older months while storage was busy
+        if self.fetch_pending:
+            self.fetch_pending = False
+            self.ensure_partitions(self.partitions_wanted())
+    
+    def update_dashboard(self, *inputs):
+        # Marks the views drawn from these inputs (all of them by default) for
+        # one coalesced redraw when Tk is next idle
+        self.refresh.invalidate(*inputs)
     
     def update_metrics(self):
-        if not self.expenses:
+        if not self.store.live_count:
             # Set default values
             self.metric_widgets['total_spent']['value'].config(text="$0.00")
             self.metric_widgets['daily_avg']['value'].config(text="$0.00")
@@ -463,190 +959,145 @@ class UltimateExpenseTracker:
             return
         
         # Calculate based on time filter
-        filtered_expenses = self.get_filtered_expenses()
+        metrics = period_metrics(self.aggregates, self.time_filter.get(), budgets=self.budgets)
         
-        if filtered_expenses:
-            total_spent = sum(e['amount'] for e in filtered_expenses)
-            
-            # Calculate daily average
-            unique_days = len(set(datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S").day 
-                                for e in filtered_expenses))
-            daily_avg = total_spent / unique_days if unique_days > 0 else 0
-            
-            # Find top category
-            category_totals = defaultdict(float)
-            for expense in filtered_expenses:
-                category_totals[expense['category']] += expense['amount']
-            
-            top_category = max(category_totals.items(), key=lambda x: x[1])[0] if category_totals else "None"
+        # Budget card follows the budget engine, not just the selected rows
+        if metrics['budget'] is None:
+            self.metric_widgets['budget_left']['value'].config(text="—")
+            self.metric_widgets['budget_left']['subtitle'].config(text="No budget set")
+        else:
+            self.metric_widgets['budget_left']['value'].config(text=f"${metrics['budget_left']:.2f}")
+            self.metric_widgets['budget_left']['subtitle'].config(
+                text=f"of ${metrics['budget']:.2f} this {metrics['budget_period']}")
+        
+        if metrics['count']:
+            top_category = metrics['top_category'] or "None"
             
             # Update metrics
-            self.metric_widgets['total_spent']['value'].config(text=f"${total_spent:.2f}")
-            self.metric_widgets['daily_avg']['value'].config(text=f"${daily_avg:.2f}")
+            self.metric_widgets['total_spent']['value'].config(text=f"${metrics['total_spent']:.2f}")
+            self.metric_widgets['daily_avg']['value'].config(text=f"${metrics['daily_average']:.2f}")
             self.metric_widgets['top_category']['value'].config(text=top_category.split()[-1])
-            
-            # Simple budget calculation (example: $2000 monthly budget)
-            budget = 2000
-            budget_left = max(0, budget - total_spent)
-            self.metric_widgets['budget_left']['value'].config(text=f"${budget_left:.2f}")
     
     def update_expenses_list(self):
-        # Clear existing items
-        for item in self.expense_tree.get_children():
-            self.expense_tree.delete(item)
-        
-        # Add expenses (most recent first)
-        recent_expenses = sorted(self.expenses, 
-                                key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"), 
-                                reverse=True)[:15]
-        
-        for expense in recent_expenses:
-            date_obj = datetime.strptime(expense['date'], "%Y-%m-%d %H:%M:%S")
-            self.expense_tree.insert("", "end", values=(
-                date_obj.strftime("%m/%d/%Y"),
-                expense['description'],
-                expense['category'],
-                f"${expense['amount']:.2f}"
-            ))
+        if self.search_var.get() or self.filter_var.get() not in ("", "All"):
+            self.filter_expenses(delay_ms=0)
+            return
+        
+        # Whole history, most recent first
+        self.expense_list.set_source(NewestFirstView(self.store), keep_position=True)
     
     def update_chart(self):
-        # Clear previous chart
-        for widget in self.chart_container.winfo_children():
-            widget.destroy()
+        if self.chart_view.get() != CHART_VIEWS[0]:
+            self.update_trend_chart()
+            return
+        if self.trend_chart is not None:
+            self.trend_chart.hide()
+        
+        # The figure and canvas are created once and updated in place
+        if self.pie_chart is None:
+            self.pie_chart = CategoryPieChart(self.chart_container, self.colors)
+            self.instruments.wrap(self.pie_chart, ('update',), prefix='chart')
+            # draw_idle defers the real redraw; time it where it happens
+            self.instruments.wrap(self.pie_chart.canvas, ('draw',), prefix='chart')
         
-        if not self.expenses:
+        if not self.store.live_count:
             # Show empty state
-            empty_label = tk.Label(self.chart_container, text="📈 Expense Chart\n\nAdd some expenses to see analytics", 
-                                  font=('Arial', 12), bg=self.colors['card'], fg=self.colors['text_light'])
-            empty_label.pack(expand=True)
+            self.pie_chart.show_message("📈 Expense Chart\n\nAdd some expenses to see analytics")
             return
         
         # Calculate category totals for filtered expenses
-        filtered_expenses = self.get_filtered_expenses()
+        period = self.aggregates.period(self.time_filter.get())
         
-        if not filtered_expenses:
-            empty_label = tk.Label(self.chart_container, text="📈 Expense Chart\n\nNo expenses for selected period", 
-                                  font=('Arial', 12), bg=self.colors['card'], fg=self.colors['text_light'])
-            empty_label.pack(expand=True)
+        if not period.count:
+            self.pie_chart.show_message("📈 Expense Chart\n\nNo expenses for selected period")
             return
         
-        category_totals = defaultdict(float)
-        for expense in filtered_expenses:
-            category_totals[expense['category']] += expense['amount']
-        
-        # Create pie chart
-        fig, ax = plt.subplots(figsize=(5, 4))
-        fig.patch.set_facecolor(self.colors['card'])
-        
-        categories = list(category_totals.keys())
-        amounts = list(category_totals.values())
-        colors = [self.categories[cat]['color'] for cat in categories]
-        
-        wedges, texts, autotexts = ax.pie(amounts, labels=categories, autopct='%1.1f%%',
-                                         colors=colors, startangle=90)
-        
-        # Style the chart
-        for text in texts:
-            text.set_color(self.colors['text_light'])
-        for autotext in autotexts:
-            autotext.set_color(self.colors['text_light'])
-            autotext.set_fontweight('bold')
-        
-        ax.set_title('Spending by Category', color=self.colors['text_light'], pad=20)
+        category_totals = self.aggregates.category_totals(period)
+        self.pie_chart.update(category_totals, self.category_colors(category_totals))
+    
+    def update_trend_chart(self):
+        # Drawn from the rollup buckets only, however many rows there are
+        if self.pie_chart is not None:
+            self.pie_chart.hide()
+        if self.trend_chart is None:
+            self.trend_chart = TrendChart(self.chart_container, self.colors)
+            self.instruments.wrap(self.trend_chart, ('update_totals', 'update_stacked'), prefix='trend')
+            self.instruments.wrap(self.trend_chart.canvas, ('draw',), prefix='trend')
+        
+        if not self.store.live_count:
+            self.trend_chart.show_message("📈 Expense Chart\n\nAdd some expenses to see trends")
+            return
         
-        # Embed in tkinter
-        canvas = FigureCanvasTkAgg(fig, self.chart_container)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        time_filter = self.time_filter.get()
+        level, first, last = trend_span(time_filter)
+        title_period = "per Day" if level == 'day' else "per Month"
+        if self.chart_view.get() == "Spending Trend":
+            keys, totals = self.aggregates.series(level, first=first, last=last)
+            if not any(totals):
+                self.trend_chart.show_message("📈 Expense Chart\n\nNo expenses for selected period")
+                return
+            self.trend_chart.update_totals(f"Spending {title_period} ({time_filter})",
+                                           [key_label(key) for key in keys], totals)
+        else:
+            keys, series = self.aggregates.category_series(level, TREND_CATEGORIES, first, last)
+            if not series:
+                self.trend_chart.show_message("📈 Expense Chart\n\nNo expenses for selected period")
+                return
+            self.trend_chart.update_stacked(f"Top Categories {title_period} ({time_filter})",
+                                            [key_label(key) for key in keys], series,
+                                            self.category_colors(series))
+    
+    def category_colors(self, names):
+        other = self.categories[OTHER_CATEGORY]['color']
+        return {name: self.categories.get(name, {}).get('color', other) for name in names}
     
     def update_insights(self):
         self.insights_text.config(state=tk.NORMAL)
         self.insights_text.delete(1.0, tk.END)
         
-        if not self.expenses:
-            insights = "💡 Add your first expense to see insights here!"
-        else:
-            filtered_expenses = self.get_filtered_expenses()
-            
-            if filtered_expenses:
-                total = sum(e['amount'] for e in filtered_expenses)
-                avg = total / len(filtered_expenses)
-                
-                category_totals = defaultdict(float)
-                for expense in filtered_expenses:
-                    category_totals[expense['category']] += expense['amount']
-                
-                top_category = max(category_totals.items(), key=lambda x: x[1])
-                
-                insights = f"""💰 Total Spent: ${total:.2f}
-📈 Average Expense: ${avg:.2f}
-🏆 Top Category: {top_category[0]} (${top_category[1]:.2f})
-🎯 {len(filtered_expenses)} transactions
-
-💡 Tips:
-• You're doing great with {top_category[0].split()[0]} spending!
-• Consider setting budgets for larger categories"""
-            else:
-                insights = "💡 No expenses for selected period. Try changing the time filter!"
+        insights = insights_text(period_metrics(self.aggregates, self.time_filter.get(), budgets=self.budgets))
         
         self.insights_text.insert(1.0, insights)
         self.insights_text.config(state=tk.DISABLED)
     
-    def get_filtered_expenses(self):
-        time_filter = self.time_filter.get()
-        today = datetime.now()
-        
-        if time_filter == "This Week":
-            start_date = today - timedelta(days=today.weekday())
-            filtered = [e for e in self.expenses 
-                       if datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S") >= start_date]
-        elif time_filter == "This Month":
-            filtered = [e for e in self.expenses 
-                       if datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S").month == today.month
-                       and datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S").year == today.year]
-        elif time_filter == "Last Month":
-            last_month = today.month - 1 if today.month > 1 else 12
-            year = today.year if today.month > 1 else today.year - 1
-            filtered = [e for e in self.expenses 
-                       if datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S").month == last_month
-                       and datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S").year == year]
-        elif time_filter == "This Year":
-            filtered = [e for e in self.expenses 
-                       if datetime.strptime(e['date'], "%Y-%m-%d %H:%M:%S").year == today.year]
-        else:  # All Time
-            filtered = self.expenses
-        
-        return filtered
-    
     def load_data(self):
-        try:
-            if os.path.exists('premium_expenses.json'):
-                with open('premium_expenses.json', 'r') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and 'expenses' in data:
-                        self.expenses = data['expenses']
-                        if 'theme' in data:
-                            self.current_theme = data['theme']
-                            self.colors = self.themes[self.current_theme]
-                    else:
-                        self.expenses = data
-            else:
-                self.create_sample_data()
-        except:
-            self.create_sample_data()
+        self.store, theme, budgets = self.read_data()
+        if theme in self.themes:
+            self.current_theme = theme
+            self.colors = self.themes[self.current_theme]
+        return budgets
+    
+    def read_data(self):
+        # Only touches files and new objects, so it can run off the Tk thread
+        # Older files may use DD/MM/YYYY dates and plain category names
+        # Errors reach the caller: sample data is only for a first run, since
+        # seeding saves over whatever is on disk
+        normalizer = RecordNormalizer(self.categories, quarantine=True)
+        if self.storage.exists():
+            store, data = self.storage.load_store(normalizer)
+            self.set_aside(normalizer.rejected)
+            return store, data['theme'], data.get('budgets')
+        if os.path.exists('expenses.json'):
+            # Migrate the original tracker's data file
+            records = list(normalizer.normalize_all(load_document('expenses.json')['expenses']))
+            self.set_aside(normalizer.rejected)
+            self.storage.save(records, self.current_theme)
+            return ExpenseStore.from_records(records), self.current_theme, None
+        return self.create_sample_data(), self.current_theme, None
+    
+    def set_aside(self, rejected):
+        # Unreadable rows stay out of the store; a copy next to the data keeps
+        # them from being lost when the next compaction rewrites the snapshot
+        if not rejected:
+            return
+        path = rejected_path(self.storage.path or 'premium_expenses.json')
+        write_document(path, rejected)
+        count = f"{len(rejected):,} expense" + ("s" if len(rejected) != 1 else "")
+        self.load_warning = f"Left out {count} that could not be read; a copy is in {path}."
     
     def create_sample_data(self):
         # Create realistic sample data
-        sample_descriptions = {
-            "🍔 Food": ["Lunch at Cafe", "Grocery shopping", "Coffee break", "Dinner with friends"],
-            "🚗 Transportation": ["Gas refill", "Uber ride", "Bus ticket", "Car maintenance"],
-            "🎬 Entertainment": ["Movie tickets", "Netflix subscription", "Concert", "Bowling night"],
-            "🏠 Bills": ["Electricity bill", "Internet bill", "Water bill", "Phone bill"],
-            "🛒 Shopping": ["Clothes shopping", "Electronics", "Home decor", "Books"],
-            "🏥 Health": ["Doctor visit", "Medicine", "Gym membership", "Vitamins"]
-        }
-        
-        self.expenses = []
+        records = []
         current_date = datetime.now()
         
         for i in range(20):
@@ -660,21 +1111,52 @@ class UltimateExpenseTracker:
                 "category": category,
                 "amount": amount,
                 "date": expense_date.strftime("%Y-%m-%d %H:%M:%S"),
-                "description": random.choice(sample_descriptions.get(category, ["General expense"]))
+                "description": random.choice(SAMPLE_DESCRIPTIONS.get(category, ["General expense"]))
             }
-            self.expenses.append(expense)
+            records.append(expense)
         
-        self.save_data()
+        store = ExpenseStore.from_records(records)
+        self.storage.save(store.records(), self.current_theme)
+        return store
     
     def save_data(self):
-        data = {
-            'expenses': self.expenses,
-            'theme': self.current_theme
-        }
-        with open('premium_expenses.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        self.storage.save(self.store.records(), self.current_theme)
+
+def open_backend(kind, server=None):
+    # Only the chosen backend is imported, so startup never pays for sqlite3,
+    # mmap or the HTTP client it does not use. None means the default JSON file.
+    if server:
+        from service_client import ServiceStorage
+        return ServiceStorage(server)
+    if kind == "sqlite":
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage('premium_expenses.db')
+    if kind == "binary":
+        from binary_storage import BinaryStorage
+        return BinaryStorage('premium_expenses.bin')
+    if kind == "partitioned":
+        from partitioned_storage import PartitionedStorage
+        return PartitionedStorage('premium_expenses.parts')
+    return None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ultimate Expense Tracker")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print import, load and first-paint timings to stderr")
+    parser.add_argument("--storage", choices=["json", "sqlite", "binary", "partitioned"], default="json",
+                        help="journaled premium_expenses.json (default), premium_expenses.db, "
+                             "the memory-mapped premium_expenses.bin or the monthly "
+                             "premium_expenses.parts directory")
+    parser.add_argument("--server", metavar="URL",
+                        help="use a running expense_service.py instead of local files, e.g. http://127.0.0.1:8765")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="open the timing and profiling panel on startup")
+    parser.add_argument("--workers", type=int,
+                        help="processes for building aggregates (default: all cores for very large files)")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = UltimateExpenseTracker(root)
+    storage = open_backend(args.storage, args.server)
+    app = UltimateExpenseTracker(root, startup_report=args.startup_report, storage=storage,
+                                 diagnostics=args.diagnostics, workers=args.workers)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,296 @@
+import argparse
+import csv
+import math
+import os
+import re
+import time
+from datetime import datetime
+from itertools import islice
+
+from expense_store import DATE_FORMAT
+
+CHUNK_SIZE = 20000
+
+DATE_COLUMNS = ("date", "transaction date", "posted date", "posting date", "booking date", "value date")
+AMOUNT_COLUMNS = ("amount", "debit", "withdrawal", "value", "transaction amount")
+DESCRIPTION_COLUMNS = ("description", "merchant", "payee", "name", "details", "memo", "narrative")
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y/%m/%d", "%d-%m-%Y")
+
+# Merchant keywords per category; longer keywords win so "uber eats" beats "uber"
+MERCHANT_KEYWORDS = {
+    "🍔 Food": ["restaurant", "cafe", "coffee", "starbucks", "mcdonald", "burger", "pizza", "grocery",
+               "supermarket", "market", "bakery", "uber eats", "doordash", "deliveroo", "kfc", "subway"],
+    "🚗 Transportation": ["uber", "lyft", "taxi", "fuel", "gas station", "shell", "chevron", "parking",
+                          "transit", "metro", "railway", "toll", "bus"],
+    "🎬 Entertainment": ["netflix", "spotify", "cinema", "movie", "theatre", "concert", "steam",
+                         "playstation", "xbox", "disney"],
+    "🏠 Bills": ["electric", "utility", "water", "internet", "broadband", "phone", "mobile", "verizon",
+                "comcast", "rent", "insurance"],
+    "🛒 Shopping": ["amazon", "walmart", "target", "ebay", "ikea", "store", "shop", "mall"],
+    "🏥 Health": ["pharmacy", "cvs", "walgreens", "doctor", "clinic", "hospital", "dental", "medical"],
+    "✈️ Travel": ["airline", "airways", "hotel", "airbnb", "booking.com", "expedia", "hostel"],
+    "💻 Tech": ["apple", "google", "microsoft", "adobe", "software", "github", "aws", "digitalocean"],
+    "🎓 Education": ["udemy", "coursera", "tuition", "school", "university", "bookstore"],
+    "🏋️ Fitness": ["gym", "fitness", "yoga", "peloton"],
+    "🎁 Gifts": ["gift", "florist", "flowers"],
+    "💼 Business": ["office", "fedex", "ups", "dhl", "staples", "coworking"]
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.imported + self.skipped) / self.seconds if self.seconds else 0.0
+
+
+class CategoryMapper:
+    def __init__(self, categories, default="🛒 Shopping"):
+        rules = [(keyword, category) for category, keywords in MERCHANT_KEYWORDS.items()
+                 if category in categories for keyword in keywords]
+        rules.sort(key=lambda rule: -len(rule[0]))
+        self.rules = rules
+        self.default = default if default in categories else next(iter(categories))
+        self._cache = {}
+
+    def category_for(self, merchant):
+        category = self._cache.get(merchant)
+        if category is None:
+            text = merchant.lower()
+            category = next((c for keyword, c in self.rules if keyword in text), self.default)
+            self._cache[merchant] = category
+        return category
+
+
+class BatchParser:
+    # Dates and amounts repeat across a statement, so each distinct raw value is
+    # parsed once. The date format is detected from the first batch and again
+    # whenever a later date does not fit it.
+    def __init__(self):
+        self.date_format = None
+        self.debits_negative = None
+        self._dates = {}
+        self._costs = {}
+
+    def detect(self, raw_dates, raw_amounts):
+        sample = [d for d in raw_dates[:500] if d]
+        for fmt in DATE_FORMATS:
+            try:
+                for value in sample:
+                    datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            self.date_format = fmt
+            break
+        amounts = [a for a in (self.amount(v) for v in raw_amounts[:500]) if a]
+        # Bank exports usually sign spending negative; if most rows are negative, those are the expenses
+        self.debits_negative = sum(1 for a in amounts if a < 0) > len(amounts) / 2
+
+    def date(self, raw):
+        parsed = self._dates.get(raw)
+        if parsed is None:
+            try:
+                if self.date_format is None:
+                    parsed = parse_ofx_date(raw)
+                else:
+                    parsed = datetime.strptime(raw, self.date_format).strftime(DATE_FORMAT)
+            except ValueError:
+                parsed = self._redetect(raw)
+            self._dates[raw] = parsed
+        return parsed
+
+    def _redetect(self, raw):
+        # A date the detected format cannot read, e.g. 24/10 after a first batch
+        # of days up to 12: switch to the first format that reads it
+        if self.date_format is None or not raw:
+            return ""
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(raw, fmt).strftime(DATE_FORMAT)
+            except ValueError:
+                continue
+            self.date_format = fmt
+            self._dates = {}
+            return parsed
+        return ""
+
+    def amount(self, raw):
+        try:
+            value = float(raw)
+        except ValueError:
+            text = raw.strip().replace(",", "").replace("$", "")
+            negative = text.startswith("(") and text.endswith(")")
+            try:
+                value = float(text.strip("()"))
+            except ValueError:
+                return None
+            if negative:
+                value = -value
+        # float() also reads "nan" and "inf"
+        return value if math.isfinite(value) else None
+
+    def cost(self, raw):
+        # The expense amount of a raw value, or None if the row is not an expense
+        amount = self.amount(raw)
+        sign = -1 if self.debits_negative else 1
+        cost = None if amount is None or amount * sign <= 0 else round(amount * sign, 2)
+        self._costs[raw] = cost
+        return cost
+
+    def parse(self, chunk):
+        # chunk: list of (raw_date, raw_amount, description); returns (date, amount, description)
+        if self.debits_negative is None:
+            self.detect([c[0] for c in chunk], [c[1] for c in chunk])
+        costs = self._costs
+        parsed = []
+        append = parsed.append
+        for raw_date, raw_amount, description in chunk:
+            # _dates is replaced when the format is re-detected
+            date = self._dates.get(raw_date)
+            if date is None:
+                date = self.date(raw_date)
+            cost = costs[raw_amount] if raw_amount in costs else self.cost(raw_amount)
+            if not date or cost is None:
+                append(None)
+            else:
+                append((date, cost, description.strip()))
+        return parsed
+
+
+def parse_ofx_date(raw):
+    # YYYYMMDD[HHMMSS[.XXX][TZ]]
+    digits = raw[:14]
+    if len(digits) >= 14:
+        return datetime.strptime(digits, "%Y%m%d%H%M%S").strftime(DATE_FORMAT)
+    return datetime.strptime(raw[:8], "%Y%m%d").strftime(DATE_FORMAT)
+
+
+def _column(header, names):
+    lowered = [h.strip().lower() for h in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    raise ValueError(f"No column named any of {', '.join(names)}")
+
+
+def read_csv_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        date_col = _column(header, DATE_COLUMNS)
+        amount_col = _column(header, AMOUNT_COLUMNS)
+        desc_col = _column(header, DESCRIPTION_COLUMNS)
+        width = max(date_col, amount_col, desc_col) + 1
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield [(r[date_col], r[amount_col], r[desc_col]) if len(r) >= width else ("", "", "")
+                   for r in rows]
+
+
+OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def read_ofx_chunks(path, chunk_size=CHUNK_SIZE):
+    # OFX 1.x is SGML with optional closing tags; read one <STMTTRN> block at a time
+    chunk, fields, in_transaction = [], {}, False
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            for tag, value in OFX_FIELD.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    in_transaction, fields = True, {}
+                elif in_transaction:
+                    fields[tag] = value.strip()
+            if in_transaction and "</STMTTRN>" in line.upper():
+                in_transaction = False
+                description = fields.get("NAME") or fields.get("MEMO", "")
+                chunk.append((fields.get("DTPOSTED", ""), fields.get("TRNAMT", ""), description))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    if os.path.splitext(path)[1].lower() in (".ofx", ".qfx"):
+        return read_ofx_chunks(path, chunk_size)
+    return read_csv_chunks(path, chunk_size)
+
+
+def expense_batches(path, categories, result, chunk_size=CHUNK_SIZE):
+    # Generator pipeline: read chunk -> parse dates/amounts -> map merchants -> records.
+    # Ids are left for commit_batch to fill in.
+    parser = BatchParser()
+    if os.path.splitext(path)[1].lower() in (".ofx", ".qfx"):
+        parser.debits_negative = True
+    category_for = CategoryMapper(categories).category_for
+    for chunk in read_chunks(path, chunk_size):
+        batch = []
+        append = batch.append
+        for parsed in parser.parse(chunk):
+            if parsed is None:
+                continue
+            date, amount, description = parsed
+            category = category_for(description)
+            append({
+                "id": None,
+                "category": category,
+                "amount": amount,
+                "date": date,
+                "description": description or f"{category} expense"
+            })
+        result.imported += len(batch)
+        result.skipped += len(chunk) - len(batch)
+        if batch:
+            yield batch
+
+
+def commit_batch(store, storage, batch):
+    # Returns the new store rows; the caller reindexes the store once at the end.
+    # Ids are reserved per batch, so skipped lines never use any up.
+    first_id = storage.allocate_ids(store, len(batch))
+    for offset, expense in enumerate(batch):
+        expense["id"] = first_id + offset
+    first = len(store)
+    store.extend(batch, index=False)
+    storage.append_many(batch)
+    return range(first, len(store))
+
+
+def import_file(path, store, storage, categories, chunk_size=CHUNK_SIZE):
+    result = ImportResult()
+    started = time.perf_counter()
+    for batch in expense_batches(path, categories, result, chunk_size):
+        commit_batch(store, storage, batch)
+    store.reindex()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+if __name__ == "__main__":
+    from expense_store import ExpenseStore
+    from legacy_loader import RecordNormalizer
+    from storage import JournalStorage
+
+    arg_parser = argparse.ArgumentParser(description="Import a CSV or OFX bank statement")
+    arg_parser.add_argument("statement")
+    arg_parser.add_argument("--data", default="premium_expenses.json")
+    args = arg_parser.parse_args()
+
+    storage = JournalStorage(args.data, fsync=False)
+    if storage.exists():
+        store, _ = storage.load_store(RecordNormalizer(MERCHANT_KEYWORDS))
+    else:
+        store = ExpenseStore()
+    result = import_file(args.statement, store, storage, MERCHANT_KEYWORDS)
+    storage.close()
+    print(f"Imported {result.imported} expenses, skipped {result.skipped}, "
+          f"{result.rows_per_second:,.0f} rows/s")
@@ -0,0 +1,160 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+SAMPLE_WINDOW = 512
+TRACE_EVENTS = 20000
+
+
+class Stat:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.samples.append(seconds)
+
+    def summary(self):
+        samples = sorted(self.samples)
+        pick = lambda fraction: samples[int(fraction * (len(samples) - 1))] * 1000 if samples else 0.0
+        return {
+            'calls': self.calls,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.calls * 1000 if self.calls else 0.0,
+            'last_ms': self.last * 1000,
+            'p50_ms': pick(0.50),
+            'p99_ms': pick(0.99),
+            'max_ms': self.max * 1000
+        }
+
+
+class Instrumentation:
+    # Wall-clock timers and counters for named hot paths, a ring buffer of
+    # recent calls for trace export, and on-demand cProfile/tracemalloc capture.
+    # Timers are cheap enough to stay on; the profilers only run when toggled.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stats = {}
+        self.counters = {}
+        self.events = deque(maxlen=TRACE_EVENTS)
+        self._lock = threading.Lock()
+        self._profile = None
+
+    def record(self, name, began, ended=None):
+        ended = ended if ended is not None else time.perf_counter()
+        with self._lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = Stat()
+            stat.add(ended - began)
+            self.events.append((name, began, ended, threading.get_ident()))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, began)
+        return wrapper
+
+    def wrap(self, obj, names, prefix=None):
+        # Replaces bound methods on this instance, so calls through self.<name>
+        # are timed without touching the methods themselves
+        for name in names:
+            label = f"{prefix}.{name}" if prefix else name
+            setattr(obj, name, self.timed(label, getattr(obj, name)))
+        return obj
+
+    def snapshot(self):
+        with self._lock:
+            stats = {name: stat.summary() for name, stat in self.stats.items()}
+            counters = dict(self.counters)
+        return {'stats': stats, 'counters': counters}
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.counters = {}
+            self.events.clear()
+
+    def export_trace(self, path):
+        # Chrome trace-event format; opens in chrome://tracing or Perfetto
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace = {
+            'traceEvents': [{
+                'name': name,
+                'ph': 'X',
+                'ts': (began - self.started) * 1e6,
+                'dur': (ended - began) * 1e6,
+                'pid': pid,
+                'tid': tid
+            } for name, began, ended, tid in events],
+            'otherData': self.snapshot()
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        return len(events)
+
+    # cProfile capture
+
+    @property
+    def profiling(self):
+        return self._profile is not None
+
+    def start_profile(self):
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop_profile(self, path):
+        # Writes pstats data; inspect with `python -m pstats <path>` or snakeviz
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return None
+        profile.disable()
+        profile.dump_stats(path)
+        return path
+
+    # tracemalloc capture
+
+    @property
+    def tracing_memory(self):
+        return tracemalloc.is_tracing()
+
+    def start_memory(self, frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_memory(self, path, limit=50):
+        # Writes the peak and the top allocation sites by line
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"current {current / 2 ** 20:.1f} MB, peak {peak / 2 ** 20:.1f} MB\n\n")
+            for stat in snapshot.statistics('lineno')[:limit]:
+                f.write(f"{stat}\n")
+        return path
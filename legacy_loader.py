@@ -0,0 +1,195 @@
+import json
+import os
+from datetime import datetime
+
+from expense_store import DATE_FORMAT
+
+CHUNK_SIZE = 1 << 16
+
+# Date layouts seen in older data files; the canonical DATE_FORMAT is tried first
+LEGACY_DATE_FORMATS = (DATE_FORMAT, "%d/%m/%Y", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%Y-%m-%dT%H:%M:%S",
+                       "%Y-%m-%d %H:%M")
+
+OTHER_CATEGORY = "📦 Other"
+
+
+class JsonStream:
+    # Incremental reader over a JSON text: values are decoded one at a time from
+    # a sliding buffer, so a large array never has to be held as one string
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        more = self.f.read(self.chunk_size)
+        if not more:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def consume(self, expected):
+        if self.peek() != expected:
+            raise ValueError(f"Expected {expected!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut off at the buffer edge still decodes; read on to be sure
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        self.consume('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' at offset {self.pos}")
+
+
+def iter_document(path):
+    # Yields ('expense', record) for each expense and (key, value) for every
+    # other top-level key, for both the bare-list and {'expenses': [...]} layouts
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        if stream.peek() == '[':
+            for record in stream.iter_array():
+                yield 'expense', record
+            return
+
+        stream.consume('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.consume(':')
+            if key == 'expenses' and stream.peek() == '[':
+                for record in stream.iter_array():
+                    yield 'expense', record
+            else:
+                yield key, stream.value()
+            separator = stream.peek()
+            stream.pos += 1
+            if separator == '}':
+                return
+
+
+def load_document(path):
+    data = {'expenses': [], 'theme': None}
+    expenses = data['expenses']
+    for key, value in iter_document(path):
+        if key == 'expense':
+            expenses.append(value)
+        else:
+            data[key] = value
+    return data
+
+
+def rejected_path(data_path):
+    # Where records that could not be read from a data file are set aside
+    return os.path.splitext(data_path)[0] + '.rejected.json'
+
+
+def write_document(path, expenses):
+    # The {'expenses': [...]} layout load_document reads
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'expenses': expenses}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class RecordNormalizer:
+    # Maps legacy records ("DD/MM/YYYY" dates, "Food"-style categories) onto the
+    # canonical date format and emoji category keys. Each distinct date string
+    # and category name is resolved once. With quarantine on, records that
+    # cannot be read are set aside in rejected instead of failing the load.
+    def __init__(self, categories, quarantine=False):
+        self.categories = categories
+        self.quarantine = quarantine
+        self.rejected = []
+        self._category_map = {}
+        for key in categories:
+            self._category_map[key] = key
+            self._category_map[key.split(' ', 1)[-1].lower()] = key
+        self._dates = {}
+
+    def category(self, name):
+        key = self._category_map.get(name)
+        if key is None:
+            key = self._category_map.get(name.split(' ', 1)[-1].strip().lower(), OTHER_CATEGORY)
+            self._category_map[name] = key
+        return key
+
+    def date(self, value):
+        # Already "YYYY-MM-DD HH:MM:SS": the store validates it when it parses the timestamp
+        if len(value) == 19 and value[4] == '-' and value[10] == ' ':
+            return value
+        canonical = self._dates.get(value)
+        if canonical is None:
+            for fmt in LEGACY_DATE_FORMATS:
+                try:
+                    canonical = datetime.strptime(value, fmt).strftime(DATE_FORMAT)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"Unrecognized expense date {value!r}")
+            self._dates[value] = canonical
+        return canonical
+
+    def normalize(self, record):
+        category = self.category(record['category'])
+        date = self.date(record['date'])
+        amount = record['amount']
+        if not isinstance(amount, (int, float)):
+            # Hand-edited files sometimes quote numbers
+            amount = float(amount)
+        if category == record['category'] and date == record['date'] and amount is record['amount']:
+            return record
+        normalized = dict(record)
+        normalized['category'] = category
+        normalized['date'] = date
+        normalized['amount'] = amount
+        return normalized
+
+    def normalize_all(self, records):
+        for record in records:
+            if not self.quarantine:
+                yield self.normalize(record)
+                continue
+            try:
+                normalized = self.normalize(record)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                self.rejected.append(record)
+                continue
+            yield normalized
@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode, urlsplit
+
+from analytics import CATEGORY_NAMES, PERIODS
+from benchmarks import SEARCH_TERMS, generate_records
+
+DATA_FILES = {'json': 'expenses.json', 'binary': 'expenses.bin', 'sqlite': 'expenses.db',
+              'partitioned': 'expenses.parts'}
+READ_OPS = ('query', 'search', 'aggregate')
+
+
+class Connection:
+    # Minimal keep-alive HTTP/1.1 client; the service always sends Content-Length
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def next_request(rng, writes):
+    # (kind, method, path, payload)
+    if rng.random() < writes:
+        category = rng.choice(CATEGORY_NAMES)
+        return 'add', 'POST', '/expenses', {'category': category, 'amount': round(rng.uniform(1, 200), 2),
+                                            'description': f"load test {rng.randrange(10_000)}"}
+    kind = rng.choice(READ_OPS)
+    if kind == 'query':
+        params = {'period': rng.choice(PERIODS), 'limit': 50}
+    elif kind == 'search':
+        params = {'q': rng.choice(SEARCH_TERMS), 'limit': 50}
+    else:
+        return kind, 'GET', '/aggregate?' + urlencode({'period': rng.choice(PERIODS)}), None
+    return kind, 'GET', '/expenses?' + urlencode(params), None
+
+
+async def run_load(url, clients, requests, writes, seed=0):
+    parts = urlsplit(url)
+    latencies = {}
+    errors = []
+    remaining = [requests]
+
+    async def client(number):
+        rng = random.Random(seed * 1000 + number)
+        connection = Connection(parts.hostname, parts.port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                kind, method, path, payload = next_request(rng, writes)
+                began = time.perf_counter()
+                status, result = await connection.request(method, path, payload)
+                latencies.setdefault(kind, []).append(time.perf_counter() - began)
+                if status >= 400:
+                    errors.append(f"{kind}: {status} {result.get('error')}")
+        finally:
+            connection.close()
+
+    began = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    seconds = time.perf_counter() - began
+
+    stats_connection = Connection(parts.hostname, parts.port)
+    _, server = await stats_connection.request('GET', '/stats')
+    stats_connection.close()
+
+    def percentile(values, fraction):
+        return round(values[min(len(values) - 1, int(fraction * len(values)))] * 1000, 3)
+
+    report = {'clients': clients, 'requests': requests, 'writes': writes, 'seconds': round(seconds, 3),
+              'requests_per_second': round(requests / seconds, 1), 'errors': len(errors), 'by_kind': {},
+              'group_commits': server['commits'], 'mean_batch': round(server['mean_batch'], 2),
+              'cache_hit_rate': round(server['cache']['hit_rate'], 3)}
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        report['by_kind'][kind] = {'count': len(values), 'p50_ms': percentile(values, 0.5),
+                                   'p95_ms': percentile(values, 0.95), 'p99_ms': percentile(values, 0.99)}
+    if errors:
+        report['first_error'] = errors[0]
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_service(data_path, pool, batch_window_ms):
+    # The service in its own process, so the load generator does not share its GIL
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'expense_service.py'),
+                                data_path, '--port', str(port), '--pool', str(pool),
+                                '--batch-window-ms', str(batch_window_ms)],
+                               stdout=subprocess.PIPE, text=True)
+    # The first line is printed once the data is loaded and the port is open
+    if not process.stdout.readline():
+        raise RuntimeError("expense service did not start")
+    return process, f"http://127.0.0.1:{port}"
+
+
+def seed_data(storage_kind, records, directory):
+    from analytics import open_storage
+
+    path = os.path.join(directory, DATA_FILES[storage_kind])
+    storage = open_storage(path)
+    storage.save(list(generate_records(records)), None)
+    storage.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure expense_service.py throughput on localhost")
+    parser.add_argument("--url", help="load an already running service instead of starting one")
+    parser.add_argument("--storage", choices=sorted(DATA_FILES), default="json",
+                        help="backend for the scratch data set (ignored with --url)")
+    parser.add_argument("--records", type=int, default=50_000, help="size of the scratch data set")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--writes", type=float, default=0.2, help="fraction of requests that add an expense")
+    parser.add_argument("--pool", type=int, default=4)
+    parser.add_argument("--batch-window-ms", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url
+        if url is None:
+            process, url = start_service(seed_data(args.storage, args.records, directory),
+                                         args.pool, args.batch_window_ms)
+        try:
+            report = asyncio.run(run_load(url, args.clients, args.requests, args.writes))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['requests']:,} requests from {report['clients']} clients in {report['seconds']}s: "
+              f"{report['requests_per_second']:,.0f} requests/s, {report['errors']} errors")
+        print(f"{report['group_commits']:,} group commits, {report['mean_batch']} writes each on average; "
+              f"query cache hit rate {report['cache_hit_rate']:.0%}")
+        for kind, stat in report['by_kind'].items():
+            print(f"  {kind:<10} {stat['count']:>7,}  p50 {stat['p50_ms']:>8.2f} ms  "
+                  f"p95 {stat['p95_ms']:>8.2f} ms  p99 {stat['p99_ms']:>8.2f} ms")
+        if 'first_error' in report:
+            print(f"first error: {report['first_error']}")
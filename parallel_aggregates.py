@@ -0,0 +1,82 @@
+import os
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+# Below this many rows a process pool costs more than it saves
+PARALLEL_MIN_ROWS = 2_000_000
+CHUNKS_PER_WORKER = 2
+
+# Group keys pack (day, category code) into one int; codes are array('H')
+CODE_RANGE = 1 << 16
+
+
+def group_rows(days, amounts, codes):
+    # Partial aggregate for a run of rows: (day, code) key -> total and count
+    totals = {}
+    counts = {}
+    for day, code, amount in zip(days, codes, amounts):
+        key = day * CODE_RANGE + code
+        totals[key] = totals.get(key, 0.0) + amount
+        counts[key] = counts.get(key, 0) + 1
+    return totals, counts
+
+
+def merge_groups(partials):
+    totals, counts = {}, {}
+    for part_totals, part_counts in partials:
+        for key, total in part_totals.items():
+            totals[key] = totals.get(key, 0.0) + total
+            counts[key] = counts.get(key, 0) + part_counts[key]
+    return totals, counts
+
+
+def _group_shared(columns, start, stop):
+    # Worker side: attach to the parent's column buffers and group one slice
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in columns]
+    try:
+        # Every view must be released before the blocks can be closed
+        with ExitStack() as views:
+            parts = []
+            for block, (_, typecode, nbytes) in zip(blocks, columns):
+                raw = views.enter_context(block.buf[:nbytes])
+                column = views.enter_context(raw.cast(typecode))
+                parts.append(views.enter_context(column[start:stop]))
+            return group_rows(*parts)
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def default_workers(rows):
+    cores = os.cpu_count() or 1
+    return cores if rows >= PARALLEL_MIN_ROWS and cores > 1 else 1
+
+
+def parallel_groups(days, amounts, codes, start, stop, workers):
+    # Copies the three columns into shared memory once, has each worker group
+    # a slice of it, and merges the partial aggregates
+    columns = (days, amounts, codes)
+    blocks = []
+    try:
+        spec = []
+        for column in columns:
+            nbytes = len(column) * column.itemsize
+            block = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            blocks.append(block)
+            with memoryview(column) as source:
+                block.buf[:nbytes] = source.cast('B')
+            spec.append((block.name, column.typecode, nbytes))
+
+        chunks = workers * CHUNKS_PER_WORKER
+        step = -(-(stop - start) // chunks)
+        bounds = [(lo, min(lo + step, stop)) for lo in range(start, stop, step)]
+        # spawn rather than fork: the parent may be running Tk and loader threads
+        with ProcessPoolExecutor(workers, mp_context=get_context('spawn')) as pool:
+            partials = pool.map(_group_shared, [spec] * len(bounds),
+                                [lo for lo, _ in bounds], [hi for _, hi in bounds])
+            return merge_groups(partials)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
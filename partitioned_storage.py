@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+from binary_storage import read_snapshot, write_snapshot
+from expense_store import ExpenseStore
+from storage import JournalStorage
+
+MANIFEST_VERSION = 1
+
+
+def month_key(date_text):
+    # 'YYYY-MM' of a canonical 'YYYY-MM-DD HH:MM:SS' date
+    return date_text[:7]
+
+
+def _month_before(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year - 1}-12" if number == 1 else f"{year}-{number - 1:02d}"
+
+
+def recent_months(today=None):
+    # Read at startup: enough for This Week, This Month and Last Month
+    this_month = (today or datetime.now()).strftime("%Y-%m")
+    return {this_month, _month_before(this_month)}
+
+
+def months_for(time_filter, today=None):
+    # Months a period view reads, or None for the whole history
+    today = today or datetime.now()
+    if time_filter == "All Time":
+        return None
+    if time_filter == "This Year":
+        return {f"{today.year}-{month:02d}" for month in range(1, 13)}
+    return recent_months(today)
+
+
+class PartitionedStorage(JournalStorage):
+    # A directory with one binary snapshot per calendar month and a manifest of
+    # each month's file, row count and highest id. Startup reads only the
+    # recent months; older ones are read when a view asks for them. Changes go to the journal
+    # tagged with the months they touch, and compaction rewrites only those
+    # months, under a new file name: a partition file never changes once
+    # written, so closed months can be cached and copied as they are.
+    def __init__(self, path='premium_expenses.parts', compact_every=1000, fsync=True, lazy=True):
+        super().__init__(path, compact_every, fsync)
+        os.makedirs(path, exist_ok=True)
+        self.journal_path = os.path.join(path, 'journal')
+        self.rotated_path = self.journal_path + '.old'
+        self.manifest_path = os.path.join(path, 'manifest.json')
+        self.lazy = lazy
+        self.manifest = {'version': MANIFEST_VERSION, 'generation': 0, 'theme': None, 'budgets': None,
+                         'partitions': {}}
+        self.loaded = set()
+        self.loaded_all = not lazy
+        self._months_by_id = {}
+        # Journal changes to months not read yet: records to add or replace,
+        # and ids to leave out of the month's file
+        self._overlay = {}
+        self._dropped = {}
+
+    def exists(self):
+        return any(os.path.exists(p) for p in (self.manifest_path, self.journal_path, self.rotated_path))
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version', 0) > MANIFEST_VERSION:
+            raise ValueError(f"{self.manifest_path} is newer than this version supports")
+        self.manifest = manifest
+        # Files a finished compaction superseded; nothing reads them any more
+        current = {entry['file'] for entry in manifest['partitions'].values()}
+        for name in os.listdir(self.path):
+            if name.endswith('.bin') and name not in current:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def _read_partition(self, month):
+        entry = self.manifest['partitions'].get(month)
+        if entry is None:
+            return []
+        store, _ = read_snapshot(os.path.join(self.path, entry['file']))
+        return list(store.records())
+
+    def _is_loaded(self, month):
+        return self.loaded_all or month in self.loaded
+
+    def load(self):
+        store, data = self.load_store()
+        store.extend(self.read_partitions(None))
+        data['expenses'] = list(store.records())
+        return data
+
+    def load_store(self, normalizer=None):
+        self._read_manifest()
+        data = {'theme': self.manifest.get('theme'), 'budgets': self.manifest.get('budgets')}
+        partitions = self.manifest['partitions']
+        if self.lazy:
+            self.loaded = recent_months()
+        records = {}
+        for month in sorted(partitions):
+            if self._is_loaded(month):
+                for record in self._read_partition(month):
+                    records[record.get('id')] = record
+                    self._months_by_id[record.get('id')] = month
+
+        for path in (self.rotated_path, self.journal_path):
+            for op in self._read_journal(path):
+                kind = op.get('op')
+                if kind in ('add', 'add_many', 'update'):
+                    for expense in op['expenses'] if kind == 'add_many' else [op['expense']]:
+                        self._place(expense, op.get('from'), records)
+                elif kind == 'delete':
+                    self._remove(op['id'], op.get('month'), records)
+                elif kind == 'theme':
+                    data['theme'] = op['theme']
+                elif kind == 'budgets':
+                    data['budgets'] = op['budgets']
+        self._pending = self._count_lines(self.journal_path)
+        self._budgets = data['budgets']
+
+        records = list(records.values())
+        if normalizer is not None:
+            records = normalizer.normalize_all(records)
+        store = ExpenseStore.from_records(records)
+        # New ids must stay clear of rows in months not read yet
+        store.reserve_ids(max([p.get('max_id', 0) for p in partitions.values()] +
+                              [i for i in self._months_by_id if isinstance(i, int)], default=0))
+        return store, data
+
+    def _place(self, expense, previous, records):
+        expense_id = expense.get('id')
+        month = month_key(expense['date'])
+        if previous and previous != month:
+            self._remove(expense_id, previous, records)
+        if self._is_loaded(month):
+            records[expense_id] = expense
+        else:
+            self._overlay.setdefault(month, {})[expense_id] = expense
+        self._months_by_id[expense_id] = month
+
+    def _remove(self, expense_id, month, records):
+        month = month or self._months_by_id.get(expense_id)
+        if month is None or self._is_loaded(month):
+            records.pop(expense_id, None)
+        else:
+            self._dropped.setdefault(month, set()).add(expense_id)
+            self._overlay.get(month, {}).pop(expense_id, None)
+        self._months_by_id.pop(expense_id, None)
+
+    def unloaded_months(self, time_filter=None):
+        # Months a period view needs that are still on disk; None asks for the
+        # whole history
+        if self.loaded_all:
+            return set()
+        available = set(self.manifest['partitions']) | set(self._overlay)
+        wanted = months_for(time_filter) if time_filter is not None else None
+        return {m for m in available if m not in self.loaded and (wanted is None or m in wanted)}
+
+    def partition_rows(self, months):
+        partitions = self.manifest['partitions']
+        return sum(partitions[m]['rows'] for m in months if m in partitions)
+
+    def read_partitions(self, months, normalizer=None):
+        # Records of the given months (None: every month not read yet) with the
+        # journal's changes applied; safe to call off the Tk thread
+        if months is None:
+            months = self.unloaded_months()
+        records = []
+        for month in sorted(months):
+            if self._is_loaded(month):
+                continue
+            dropped = self._dropped.pop(month, set())
+            overlay = self._overlay.pop(month, {})
+            for record in self._read_partition(month):
+                expense_id = record.get('id')
+                if expense_id not in dropped and expense_id not in overlay:
+                    records.append(record)
+                    self._months_by_id[expense_id] = month
+            records.extend(overlay.values())
+            self.loaded.add(month)
+        if not self.unloaded_months():
+            self.loaded_all = True
+        if normalizer is not None:
+            records = list(normalizer.normalize_all(records))
+        return records
+
+    # Journal records carry the month they change so compaction never needs
+    # the rows in memory
+
+    def append(self, expense):
+        self._months_by_id[expense.get('id')] = month_key(expense['date'])
+        super().append(expense)
+
+    def append_many(self, expenses):
+        expenses = list(expenses)
+        for expense in expenses:
+            self._months_by_id[expense.get('id')] = month_key(expense['date'])
+        super().append_many(expenses)
+
+    def update(self, expense):
+        previous = self._months_by_id.get(expense['id'])
+        self._months_by_id[expense['id']] = month_key(expense['date'])
+        self._write({'op': 'update', 'expense': expense, 'from': previous})
+
+    def delete(self, expense_id):
+        self._write({'op': 'delete', 'id': expense_id, 'month': self._months_by_id.pop(expense_id, None)})
+
+    def _fold(self, ops, theme):
+        # Applies journal records to the partitions they name, reading each
+        # touched month from disk once
+        months = {}
+
+        def partition(month):
+            if month not in months:
+                months[month] = {r.get('id'): r for r in self._read_partition(month)}
+            return months[month]
+
+        for op in ops:
+            kind = op.get('op')
+            if kind in ('add', 'add_many', 'update'):
+                for expense in op['expenses'] if kind == 'add_many' else [op['expense']]:
+                    month = month_key(expense['date'])
+                    previous = op.get('from')
+                    if previous and previous != month:
+                        partition(previous).pop(expense.get('id'), None)
+                    partition(month)[expense.get('id')] = expense
+            elif kind == 'delete' and op.get('month'):
+                partition(op['month']).pop(op['id'], None)
+        self._write_partitions(months, theme)
+
+    def _write_partitions(self, months, theme, replace_all=False):
+        manifest = dict(self.manifest, partitions=dict(self.manifest['partitions']))
+        manifest['generation'] += 1
+        if replace_all:
+            manifest['partitions'] = {}
+        for month, records in months.items():
+            manifest['partitions'].pop(month, None)
+            if not records:
+                continue
+            store = ExpenseStore.from_records(sorted(records.values(), key=lambda r: r['date']))
+            name = f"{month}.{manifest['generation']}.bin"
+            write_snapshot(os.path.join(self.path, name), store)
+            manifest['partitions'][month] = {
+                'file': name,
+                'rows': len(store),
+                'max_id': max(store.ids, default=0)
+            }
+        manifest['partitions'] = dict(sorted(manifest['partitions'].items()))
+        manifest['theme'] = theme
+        manifest['budgets'] = self._budgets
+
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        # Superseded files stay until the next start, in case a reader is
+        # still on the old manifest
+        self.manifest = manifest
+
+    def _write_snapshot(self, data):
+        if self.loaded_all or not self.manifest['partitions']:
+            # The caller has the whole history
+            months = {}
+            for expense in data['expenses']:
+                months.setdefault(month_key(expense['date']), {})[expense.get('id')] = expense
+            self._months_by_id = {eid: month for month, records in months.items() for eid in records}
+            self._write_partitions(months, data['theme'], replace_all=True)
+            self.loaded_all = True
+        else:
+            # Older months are not in memory, but every change the caller made
+            # since they were written is in the journal
+            ops = [op for path in (self.rotated_path, self.journal_path) for op in self._read_journal(path)]
+            self._fold(ops, data['theme'])
+
+    def _finish_compaction(self, data):
+        self._fold(list(self._read_journal(self.rotated_path)), data['theme'])
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+
+if __name__ == "__main__":
+    from binary_storage import convert
+    from legacy_loader import rejected_path
+
+    parser = argparse.ArgumentParser(description="Split expense data into monthly partitions")
+    parser.add_argument("source", nargs="?", default="premium_expenses.json")
+    parser.add_argument("target", nargs="?", default="premium_expenses.parts")
+    args = parser.parse_args()
+    converted, rejected = convert(args.source, args.target)
+    print(f"Partitioned {converted} expenses into {args.target}")
+    if rejected:
+        print(f"Set aside {rejected} that could not be read in {rejected_path(args.target)}")
@@ -0,0 +1,69 @@
+import time
+
+from instrumentation import Instrumentation
+
+
+class RefreshScheduler:
+    # Tracks which dashboard views are out of date and redraws only those, once,
+    # on the next idle callback however many changes arrive before it runs.
+    # Views name the inputs they are drawn from ('data', 'period', ...) and
+    # changes are reported by input, so callers need not know who reads what.
+    def __init__(self, root, ready=None, instruments=None):
+        self.root = root
+        # Callable; while it returns False views stay dirty and nothing renders
+        self.ready = ready
+        self.instruments = instruments or Instrumentation()
+        self.views = {}
+        self.dirty = set()
+        self._after_id = None
+
+    def register(self, name, render, inputs):
+        # Views render in registration order
+        self.views[name] = (render, frozenset(inputs))
+
+    def invalidate(self, *inputs):
+        # No inputs marks every view
+        for name, (_, view_inputs) in self.views.items():
+            if not inputs or not view_inputs.isdisjoint(inputs):
+                self.dirty.add(name)
+        if self._after_id is None:
+            self._after_id = self.root.after_idle(self._on_idle)
+        else:
+            self.instruments.count('refresh coalesced')
+
+    def _on_idle(self):
+        self._after_id = None
+        self.flush()
+
+    def flush(self):
+        # Renders pending views now; also what the idle callback runs
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if not self.dirty or (self.ready is not None and not self.ready()):
+            return
+        began = time.perf_counter()
+        dirty, self.dirty = self.dirty, set()
+        for name, (render, _) in self.views.items():
+            if name in dirty:
+                started = time.perf_counter()
+                render()
+                self.instruments.record(f"view.{name}", started)
+            else:
+                self.instruments.count(f"view.{name} skipped")
+        self.instruments.record("refresh", began)
+
+    def view_costs(self):
+        # Per view: renders, refreshes it sat out, and render times
+        snapshot = self.instruments.snapshot()
+        costs = {}
+        for name in self.views:
+            stat = snapshot['stats'].get(f"view.{name}", {})
+            costs[name] = {
+                'renders': stat.get('calls', 0),
+                'skipped': snapshot['counters'].get(f"view.{name} skipped", 0),
+                'last_ms': stat.get('last_ms', 0.0),
+                'mean_ms': stat.get('mean_ms', 0.0),
+                'total_ms': stat.get('total_ms', 0.0)
+            }
+        return costs
@@ -0,0 +1,10 @@
+# Descriptions for generated sample expenses, by category. Plain data, so
+# benchmarks and load tests can generate expenses without importing the GUI.
+SAMPLE_DESCRIPTIONS = {
+    "🍔 Food": ["Lunch at Cafe", "Grocery shopping", "Coffee break", "Dinner with friends"],
+    "🚗 Transportation": ["Gas refill", "Uber ride", "Bus ticket", "Car maintenance"],
+    "🎬 Entertainment": ["Movie tickets", "Netflix subscription", "Concert", "Bowling night"],
+    "🏠 Bills": ["Electricity bill", "Internet bill", "Water bill", "Phone bill"],
+    "🛒 Shopping": ["Clothes shopping", "Electronics", "Home decor", "Books"],
+    "🏥 Health": ["Doctor visit", "Medicine", "Gym membership", "Vitamins"]
+}
@@ -0,0 +1,182 @@
+import threading
+from array import array
+from heapq import nlargest
+
+from expense_store import FilteredNewestView, NewestFirstView, RowListView
+
+GRAM_SIZE = 3
+# Rows a virtual list page is expected to show when choosing a search strategy
+VIEW_PAGE = 50
+
+
+def grams_of(text):
+    # Every substring of up to GRAM_SIZE characters, so short queries are a
+    # single lookup and longer ones intersect their trigrams
+    grams = set()
+    for size in range(1, GRAM_SIZE + 1):
+        for i in range(len(text) - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def query_grams(term):
+    if len(term) <= GRAM_SIZE:
+        return {term}
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+def _swap_remove(rows, positions, row):
+    # Moves the last row into row's slot instead of shifting the tail
+    position = positions[row]
+    last = rows.pop()
+    if last != row:
+        rows[position] = last
+        positions[last] = position
+    positions[row] = -1
+
+
+class SearchIndex:
+    # Inverted n-gram index over distinct lower-cased descriptions. Expenses
+    # repeat descriptions heavily, so postings point at distinct texts and each
+    # text keeps the rows that use it.
+    def __init__(self, store):
+        self.store = store
+        # Held by searches running off the Tk thread and by anything that
+        # appends to the store or the index
+        self.lock = threading.RLock()
+        self.texts = []
+        self.text_ids = {}
+        self.text_rows = []
+        self.row_texts = array('l')
+        # Where each row sits in its text's and its category's row list, so
+        # unlinking swaps it out in O(1); the lists are unordered
+        self.text_positions = array('l')
+        self.category_positions = array('l')
+        self.postings = {}
+        self.category_rows = {}
+        for row in range(len(store)):
+            self.add_row(row)
+
+    def add_row(self, row):
+        # row_texts is indexed by row; tombstoned rows hold -1
+        self.row_texts.append(-1)
+        self.text_positions.append(-1)
+        self.category_positions.append(-1)
+        if row not in self.store.deleted:
+            self.link_row(row)
+
+    def link_row(self, row):
+        # (Re)indexes a row from its current description and category
+        text = self.store.descriptions[row].lower()
+        text_id = self.text_ids.get(text)
+        if text_id is None:
+            text_id = self.text_ids[text] = len(self.texts)
+            self.texts.append(text)
+            self.text_rows.append(array('l'))
+            for gram in grams_of(text):
+                self.postings.setdefault(gram, set()).add(text_id)
+        rows = self.text_rows[text_id]
+        self.text_positions[row] = len(rows)
+        rows.append(row)
+        self.row_texts[row] = text_id
+        rows = self.category_rows.setdefault(self.store.category_codes[row], array('l'))
+        self.category_positions[row] = len(rows)
+        rows.append(row)
+
+    def unlink_row(self, row):
+        # Call before the row's description or category changes, or on delete.
+        # The text stays in the postings; with no rows it just matches nothing.
+        text_id = self.row_texts[row]
+        if text_id < 0:
+            return
+        _swap_remove(self.text_rows[text_id], self.text_positions, row)
+        _swap_remove(self.category_rows[self.store.category_codes[row]], self.category_positions, row)
+        self.row_texts[row] = -1
+
+    def matching_texts(self, term):
+        postings = sorted((self.postings.get(g, ()) for g in query_grams(term)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        if len(term) > GRAM_SIZE:
+            # Trigram hits can be false positives; confirm the full substring
+            candidates = {t for t in candidates if term in self.texts[t]}
+        return candidates
+
+    def search(self, term, category_code=None, limit=None):
+        with self.lock:
+            return self._search(term.lower(), category_code, limit)
+
+    def _search(self, term, category_code, limit):
+        # Matching row numbers, newest first
+        store = self.store
+
+        if not term:
+            if category_code is None:
+                return list(store.latest(limit))
+            rows = self.category_rows.get(category_code, ())
+            if self._dense(len(rows), limit):
+                codes = store.category_codes
+                return self._walk_newest(lambda r: codes[r] == category_code, limit)
+        else:
+            texts = self.matching_texts(term)
+            matched = sum(len(self.text_rows[t]) for t in texts)
+            if self._dense(matched, limit):
+                row_texts = self.row_texts
+                codes = store.category_codes
+                return self._walk_newest(
+                    lambda r: row_texts[r] in texts and (category_code is None or codes[r] == category_code),
+                    limit)
+            if category_code is None:
+                rows = [r for t in texts for r in self.text_rows[t]]
+            else:
+                category_rows = self.category_rows.get(category_code, ())
+                # Intersect from whichever posting list is shorter
+                if len(category_rows) < matched:
+                    row_texts = self.row_texts
+                    rows = [r for r in category_rows if row_texts[r] in texts]
+                else:
+                    codes = store.category_codes
+                    rows = [r for t in texts for r in self.text_rows[t] if codes[r] == category_code]
+
+        if limit is not None and limit < len(rows):
+            return nlargest(limit, rows, key=store.timestamps.__getitem__)
+        return sorted(rows, key=store.timestamps.__getitem__, reverse=True)
+
+    def search_view(self, term, category_code=None):
+        # Every match as a pageable view, for the virtual expense list
+        term = term.lower()
+        store = self.store
+        with self.lock:
+            if not term and category_code is None:
+                return NewestFirstView(store)
+            codes = store.category_codes
+            if not term:
+                matched = len(self.category_rows.get(category_code, ()))
+                accept = lambda r: codes[r] == category_code
+            else:
+                texts = self.matching_texts(term)
+                matched = sum(len(self.text_rows[t]) for t in texts)
+                row_texts = self.row_texts
+                accept = lambda r: row_texts[r] in texts and (category_code is None or codes[r] == category_code)
+            if self._dense(matched, VIEW_PAGE):
+                return FilteredNewestView(store, accept, matched)
+            return RowListView(self._search(term, category_code, None))
+
+    def _dense(self, matched, limit):
+        # A newest-first walk needs about limit * N / matched probes to fill the
+        # page, which beats selecting from all matches once matches are common
+        return limit is not None and matched * matched > limit * len(self.store)
+
+    def _walk_newest(self, accept, limit):
+        rows = []
+        for row in self.store.time_index.newest_first():
+            if accept(row):
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+        return rows
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+
+
+class SearchScheduler:
+    # Debounces keystrokes on the Tk thread, runs only the newest query on a
+    # worker thread and renders its result back on the Tk thread
+    def __init__(self, root, search, render, delay_ms=150, poll_ms=10, history=1000):
+        self.root = root
+        self.search = search
+        self.render = render
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        self.latencies = deque(maxlen=history)
+        self.cancelled = 0
+        self._cond = threading.Condition()
+        self._job = None
+        self._results = []
+        self._generation = 0
+        self._rendered = 0
+        self._after_id = None
+        self._poll_id = None
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def request(self, *args, delay_ms=None):
+        started = time.perf_counter()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self.cancelled += 1
+        delay = self.delay_ms if delay_ms is None else delay_ms
+        self._after_id = self.root.after(delay, self._dispatch, args, started)
+
+    def _dispatch(self, args, started):
+        self._after_id = None
+        with self._cond:
+            if self._job is not None:
+                # The worker never started the previous query; drop it
+                self.cancelled += 1
+            self._generation += 1
+            self._job = (self._generation, args, started)
+            self._cond.notify()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._job is None:
+                    self._cond.wait()
+                generation, args, started = self._job
+                self._job = None
+            try:
+                result, error = self.search(*args), None
+            except Exception as e:
+                result, error = None, e
+            with self._cond:
+                self._results.append((generation, result, error, started))
+
+    def _poll(self):
+        self._poll_id = None
+        with self._cond:
+            results, self._results = self._results, []
+            latest = self._generation
+        for generation, result, error, started in results:
+            if generation != latest:
+                # Superseded while it was running
+                self.cancelled += 1
+                continue
+            self._rendered = generation
+            if error is not None:
+                raise error
+            self.render(result)
+            self.latencies.append(time.perf_counter() - started)
+        if self._rendered != latest:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def latency_stats(self):
+        # Keystroke-to-render latency in milliseconds, debounce delay included
+        samples = sorted(self.latencies)
+        if not samples:
+            return {'renders': 0, 'cancelled': self.cancelled, 'p50_ms': 0.0, 'p99_ms': 0.0}
+        return {
+            'renders': len(samples),
+            'cancelled': self.cancelled,
+            'p50_ms': samples[int(0.50 * (len(samples) - 1))] * 1000,
+            'p99_ms': samples[int(0.99 * (len(samples) - 1))] * 1000
+        }
@@ -0,0 +1,100 @@
+import http.client
+import json
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from service_errors import ServiceError
+from storage import StorageBackend
+
+
+class ServiceClient:
+    # One keep-alive connection to the expense service. Calls are serialized;
+    # a thread that wants its own throughput opens its own client.
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def request(self, method, path, payload=None, params=None):
+        if params:
+            path += '?' + urlencode(params)
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        with self._lock:
+            # An idle connection the server dropped is retried once, except
+            # for POST, which is not safe to send twice
+            for attempt in range(1 if method == 'POST' else 2):
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    self._conn.request(method, path, body, headers)
+                    response = self._conn.getresponse()
+                    data = response.read()
+                    break
+                except (ConnectionError, http.client.HTTPException):
+                    self._conn.close()
+                    self._conn = None
+                    if attempt or method == 'POST':
+                        raise
+        result = json.loads(data) if data else None
+        if response.status >= 400:
+            raise ServiceError(response.status, (result or {}).get('error', response.reason))
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ServiceStorage(StorageBackend):
+    # The GUI's storage when another process owns the data: every change is a
+    # request to the expense service. New rows take ids from blocks the
+    # service hands out, so clients adding at the same time never collide.
+    # Changes made by other clients show up on the next start.
+    def __init__(self, url):
+        self.url = url
+        # No local files, so no rollup cache either
+        self.path = None
+        self.client = ServiceClient(url)
+
+    def exists(self):
+        # The service owns the data; clients never seed or migrate it
+        return True
+
+    def load(self):
+        settings = self.client.request('GET', '/settings')
+        expenses = self.client.request('GET', '/expenses', params={'limit': 0})['expenses']
+        return {'expenses': expenses, 'theme': settings['theme'], 'budgets': settings['budgets']}
+
+    def allocate_ids(self, store, count=1):
+        return self.client.request('POST', '/ids', {'count': count})['first']
+
+    def append(self, expense):
+        self.client.request('POST', '/expenses', expense)
+
+    def append_many(self, expenses):
+        self.client.request('POST', '/expenses', list(expenses))
+
+    def update(self, expense):
+        self.client.request('PUT', f"/expenses/{expense['id']}", expense)
+
+    def delete(self, expense_id):
+        self.client.request('DELETE', f"/expenses/{expense_id}")
+
+    def set_theme(self, theme):
+        self.client.request('PUT', '/settings', {'theme': theme})
+
+    def set_budgets(self, budgets):
+        self.client.request('PUT', '/settings', {'budgets': budgets})
+
+    def save(self, expenses, theme):
+        # A full rewrite from one client would drop everyone else's changes
+        raise ServiceError(409, f"{self.url} owns the data; it cannot be replaced from a client")
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,8 @@
+class ServiceError(Exception):
+    # An HTTP status and message: raised by expense_service.py's handlers and
+    # by service_client.py for error responses. Kept apart so the client does
+    # not import the server.
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
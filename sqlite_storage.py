@@ -0,0 +1,143 @@
+import argparse
+import json
+import sqlite3
+import threading
+
+from legacy_loader import RecordNormalizer, rejected_path, write_document
+from storage import JournalStorage, StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+BATCH_SIZE = 10000
+
+# Periods, categories and search are answered from the in-memory store and
+# aggregates, so the table has no secondary indexes for writes to maintain.
+# Upserting on the id keeps re-imports idempotent.
+UPSERT = ("INSERT INTO expenses (id, category, amount, date, description) VALUES (?, ?, ?, ?, ?) "
+          "ON CONFLICT (id) DO UPDATE SET category = excluded.category, amount = excluded.amount, "
+          "date = excluded.date, description = excluded.description")
+
+
+class SQLiteStorage(StorageBackend):
+    def __init__(self, path='premium_expenses.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        # Opened on the loader thread, then used from the Tk thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def exists(self):
+        with self._lock:
+            return self.conn.execute("SELECT EXISTS (SELECT 1 FROM expenses)").fetchone()[0] == 1
+
+    def load(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, category, amount, date, description FROM expenses ORDER BY id").fetchall()
+            theme = self.conn.execute("SELECT value FROM settings WHERE key = 'theme'").fetchone()
+            budgets = self.conn.execute("SELECT value FROM settings WHERE key = 'budgets'").fetchone()
+        return {
+            'expenses': [self._record(row) for row in rows],
+            'theme': theme[0] if theme else None,
+            'budgets': json.loads(budgets[0]) if budgets else None
+        }
+
+    def _record(self, row):
+        return {"id": row[0], "category": row[1], "amount": row[2], "date": row[3], "description": row[4]}
+
+    def _row(self, expense):
+        return (expense['id'], expense['category'], float(expense['amount']), expense['date'],
+                expense.get('description', ''))
+
+    def append(self, expense):
+        self.append_many([expense])
+
+    def append_many(self, expenses):
+        # One transaction per batch; the upsert keeps re-imports idempotent
+        batch = []
+        for expense in expenses:
+            batch.append(self._row(expense))
+            if len(batch) >= BATCH_SIZE:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+
+    def _insert(self, rows):
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT, rows)
+
+    def update(self, expense):
+        row = self._row(expense)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE expenses SET category = ?, amount = ?, date = ?, description = ? WHERE id = ?",
+                row[1:] + row[:1])
+
+    def delete(self, expense_id):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+
+    def set_theme(self, theme):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('theme', ?)", (theme,))
+
+    def set_budgets(self, budgets):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('budgets', ?)",
+                              (json.dumps(budgets, ensure_ascii=False),))
+
+    def save(self, expenses, theme):
+        # Full rewrite in a single transaction
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM expenses")
+            self.conn.executemany(UPSERT, (self._row(e) for e in expenses))
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('theme', ?)", (theme,))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def migrate_json(json_path, db_path):
+    # One-shot copy of a premium_expenses.json snapshot (and its journal), or
+    # a legacy expenses.json, into SQLite. Records are normalized the way the
+    # app loads them; unreadable ones go to a .rejected.json next to the target.
+    # Returns (expenses migrated, expenses set aside).
+    from analytics import CATEGORY_NAMES
+
+    normalizer = RecordNormalizer(CATEGORY_NAMES, quarantine=True)
+    store, data = JournalStorage(json_path).load_store(normalizer)
+    target = SQLiteStorage(db_path)
+    target.save(store.records(), data['theme'])
+    if data.get('budgets') is not None:
+        target.set_budgets(data['budgets'])
+    target.close()
+    if normalizer.rejected:
+        write_document(rejected_path(db_path), normalizer.rejected)
+    return len(store), len(normalizer.rejected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate expense data into SQLite")
+    parser.add_argument("source", nargs="?", default="premium_expenses.json")
+    parser.add_argument("target", nargs="?", default="premium_expenses.db")
+    args = parser.parse_args()
+    migrated, rejected = migrate_json(args.source, args.target)
+    print(f"Migrated {migrated} expenses to {args.target}")
+    if rejected:
+        print(f"Set aside {rejected} that could not be read in {rejected_path(args.target)}")
@@ -0,0 +1,29 @@
+import sys
+import time
+
+
+class StartupTimer:
+    # Phase durations and milestones measured from the start of the process'
+    # imports, for the --startup-report breakdown
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = []
+        self.milestones = []
+
+    def phase(self, name, began, ended=None):
+        ended = ended if ended is not None else time.perf_counter()
+        self.phases.append((name, ended - began))
+
+    def milestone(self, name):
+        self.milestones.append((name, time.perf_counter() - self.started))
+
+    def report(self):
+        lines = ["Startup timing"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<22}{seconds * 1000:9.1f} ms")
+        for name, seconds in self.milestones:
+            lines.append(f"  @{name:<21}{seconds * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+    def print_report(self, stream=None):
+        print(self.report(), file=stream or sys.stderr)
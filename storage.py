@@ -0,0 +1,300 @@
+import json
+import logging
+import os
+import threading
+
+from expense_store import ExpenseStore
+from legacy_loader import load_document
+
+log = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    # What UltimateExpenseTracker needs from a storage engine. load() returns
+    # {'expenses': [record, ...], 'theme': name or None, 'budgets': [budget, ...] or None}.
+    def exists(self):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def load_store(self, normalizer=None):
+        # (ExpenseStore, the rest of load()'s dict); columnar backends override
+        # this to skip building a dict per expense
+        data = self.load()
+        records = data.pop('expenses')
+        if normalizer is not None:
+            records = normalizer.normalize_all(records)
+        return ExpenseStore.from_records(records), data
+
+    # Month-partitioned backends leave older history on disk until a view
+    # needs it; everything else has it all in memory after load_store()
+    def unloaded_months(self, time_filter=None):
+        return set()
+
+    def partition_rows(self, months):
+        return 0
+
+    def read_partitions(self, months, normalizer=None):
+        return []
+
+    def allocate_ids(self, store, count=1):
+        # First of count consecutive unused ids for new expenses; shared
+        # backends hand these out centrally
+        return store.next_id
+
+    def append(self, expense):
+        raise NotImplementedError
+
+    def append_many(self, expenses):
+        for expense in expenses:
+            self.append(expense)
+
+    def update(self, expense):
+        # Replaces the stored expense with the same id
+        raise NotImplementedError
+
+    def delete(self, expense_id):
+        raise NotImplementedError
+
+    def set_theme(self, theme):
+        raise NotImplementedError
+
+    def set_budgets(self, budgets):
+        raise NotImplementedError
+
+    def save(self, expenses, theme):
+        raise NotImplementedError
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self, expenses, theme, background=True):
+        return False
+
+    def wait(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JournalStorage(StorageBackend):
+    def __init__(self, path='premium_expenses.json', compact_every=1000, fsync=True):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + '.journal'
+        self.rotated_path = self.journal_path + '.old'
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._journal = None
+        self._pending = 0
+        self._compactor = None
+        # Settings other than the theme ride along in every snapshot
+        self._budgets = None
+
+    def exists(self):
+        return any(os.path.exists(p) for p in (self.path, self.journal_path, self.rotated_path))
+
+    def load(self):
+        data = {'expenses': [], 'theme': None}
+        if os.path.exists(self.path):
+            data = load_document(self.path)
+
+        # Replay journals left behind by a crash or an interrupted compaction.
+        # Records are keyed by id so replaying an already-compacted entry is a no-op.
+        positions = {e.get('id'): i for i, e in enumerate(data['expenses'])}
+        for path in (self.rotated_path, self.journal_path):
+            for record in self._read_journal(path):
+                self._apply(data, positions, record)
+        if len(positions) < len(data['expenses']):
+            # Deletes left holes
+            data['expenses'] = [e for e in data['expenses'] if e is not None]
+        self._pending = self._count_lines(self.journal_path)
+        data.setdefault('budgets', None)
+        self._budgets = data['budgets']
+        return data
+
+    def _read_journal(self, path):
+        # Read-only: a reader may race the writer, so an unfinished last line
+        # is skipped, never cut off. A bad line in the middle is skipped too;
+        # the records after it are still good.
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    if line.endswith(b'\n'):
+                        log.warning("Skipped unreadable line %d of %s", number, path)
+                    continue
+                yield record
+
+    def _repair_tail(self, path):
+        # Called by the writer before it appends: cuts a last line torn by a
+        # crash, so the next record starts on a line of its own
+        if not os.path.exists(path):
+            return
+        with open(path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            start = end
+            while start > 0:
+                step = min(65536, start)
+                f.seek(start - step)
+                block = f.read(step)
+                # The newline ending the last line does not count
+                cut = block.rfind(b'\n', 0, step - 1 if start == end else step)
+                start -= step
+                if cut >= 0:
+                    start += cut + 1
+                    break
+            f.seek(start)
+            last = f.read()
+            if not last:
+                return
+            try:
+                json.loads(last.decode('utf-8'))
+            except ValueError:
+                log.warning("Dropped a torn record at the end of %s", path)
+                f.truncate(start)
+                return
+            if not last.endswith(b'\n'):
+                # Whole record, only the newline missing
+                f.write(b'\n')
+
+    def _count_lines(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _apply(self, data, positions, record):
+        op = record.get('op')
+        if op in ('add', 'update'):
+            expense = record['expense']
+            if expense.get('id') in positions:
+                data['expenses'][positions[expense['id']]] = expense
+            else:
+                positions[expense.get('id')] = len(data['expenses'])
+                data['expenses'].append(expense)
+        elif op == 'add_many':
+            for expense in record['expenses']:
+                self._apply(data, positions, {'op': 'add', 'expense': expense})
+        elif op == 'delete':
+            position = positions.pop(record['id'], None)
+            if position is not None:
+                data['expenses'][position] = None
+        elif op == 'theme':
+            data['theme'] = record['theme']
+        elif op == 'budgets':
+            data['budgets'] = record['budgets']
+
+    def append(self, expense):
+        self._write({'op': 'add', 'expense': expense})
+
+    def update(self, expense):
+        self._write({'op': 'update', 'expense': expense})
+
+    def delete(self, expense_id):
+        self._write({'op': 'delete', 'id': expense_id})
+
+    def append_many(self, expenses):
+        # A whole batch is one journal line, so it replays all-or-nothing
+        self._write_many([{'op': 'add_many', 'expenses': list(expenses)}], count=len(expenses))
+
+    def set_theme(self, theme):
+        self._write({'op': 'theme', 'theme': theme})
+
+    def set_budgets(self, budgets):
+        self._budgets = budgets
+        self._write({'op': 'budgets', 'budgets': budgets})
+
+    def _write(self, record):
+        self._write_many([record])
+
+    def _write_many(self, records, count=None):
+        # One write and one fsync for the whole batch
+        lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records)
+        with self._lock:
+            if self._journal is None:
+                self._repair_tail(self.journal_path)
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(lines)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending += len(records) if count is None else count
+
+    def needs_compaction(self):
+        return self._pending >= self.compact_every and not self.compacting()
+
+    def compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def compact(self, expenses, theme, background=True):
+        # Rotate the journal under the lock so new appends go to a fresh file
+        # while the snapshot is written from the caller's copy of the data.
+        with self._lock:
+            if self.compacting():
+                return False
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self.rotated_path) and os.path.exists(self.journal_path):
+                # Leftover from an interrupted compaction: fold the live journal into it
+                self._repair_tail(self.rotated_path)
+                with open(self.rotated_path, 'ab') as dst, open(self.journal_path, 'rb') as src:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            elif os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.rotated_path)
+            self._pending = 0
+
+        # expenses may be a lazy iterable over a private copy of the data; it is
+        # materialized on the compaction thread
+        data = {'expenses': expenses, 'theme': theme}
+        if background:
+            self._compactor = threading.Thread(target=self._finish_compaction, args=(data,), daemon=True)
+            self._compactor.start()
+        else:
+            self._finish_compaction(data)
+        return True
+
+    def _finish_compaction(self, data):
+        self._write_snapshot(data)
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def save(self, expenses, theme):
+        # Full rewrite: the snapshot then covers everything in the journal
+        self.wait()
+        with self._lock:
+            self._write_snapshot({'expenses': expenses, 'theme': theme})
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            for path in (self.journal_path, self.rotated_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._pending = 0
+
+    def _write_snapshot(self, data):
+        data = {'expenses': list(data['expenses']), 'theme': data['theme'], 'budgets': self._budgets}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def wait(self):
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
@@ -0,0 +1,2 @@
+def expense(expense_id, date, amount=10.0, category="🍔 Food", description="Lunch"):
+    return {"id": expense_id, "category": category, "amount": amount, "date": date, "description": description}
@@ -0,0 +1,62 @@
+import random
+from datetime import datetime
+
+from aggregates import AggregateEngine
+from expense_store import ExpenseStore, period_bounds
+from helpers import expense
+
+CATEGORIES = ["🍔 Food", "🚗 Transportation", "🛒 Shopping"]
+PERIODS = ("This Week", "This Month", "Last Month", "This Year", "All Time")
+TODAY = datetime(2025, 3, 12, 15, 0)
+
+
+def random_records(count, seed=1):
+    rng = random.Random(seed)
+    return [expense(i, f"{rng.choice([2024, 2025])}-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d} "
+                       f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+                    rng.randint(1, 400) / 4, rng.choice(CATEGORIES)) for i in range(1, count + 1)]
+
+
+def scan(store, period):
+    # What the dashboard computed before the cube: a pass over the period's rows
+    start, end = period_bounds(period, TODAY)
+    rows = [row for row in range(len(store)) if start <= store.timestamps[row] < end]
+    totals = {}
+    for row in rows:
+        totals[store.category(row)] = totals.get(store.category(row), 0.0) + store.amounts[row]
+    return len(rows), sum(store.amounts[row] for row in rows), totals, len({store.days[row] for row in rows})
+
+
+def check(engine, store):
+    for period in PERIODS:
+        bucket = engine.period(period, TODAY)
+        count, total, totals, days = scan(store, period)
+        assert (bucket.count, round(bucket.total, 6), bucket.distinct_days) == (count, round(total, 6), days)
+        assert {c: round(t, 6) for c, t in engine.category_totals(bucket).items()} == \
+            {c: round(t, 6) for c, t in totals.items()}
+
+
+def test_period_buckets_match_a_scan():
+    store = ExpenseStore.from_records(random_records(600))
+    check(AggregateEngine(store, workers=1), store)
+
+
+def test_rows_added_one_at_a_time_match_a_rebuild():
+    records = random_records(300, seed=2)
+    store = ExpenseStore.from_records(records[:200])
+    engine = AggregateEngine(store, workers=1)
+    for record in records[200:]:
+        engine.add_row(store.append(record))
+    check(engine, store)
+
+    totals = engine.category_totals(engine.period("All Time"))
+    code, total = engine.period("All Time").top_category()
+    assert total == totals[store.category_names[code]] == max(totals.values())
+
+
+def test_empty_periods_are_zero():
+    store = ExpenseStore.from_records([expense(1, "2020-06-01 09:00:00")])
+    engine = AggregateEngine(store, workers=1)
+    bucket = engine.period("This Month", TODAY)
+    assert (bucket.count, bucket.total, bucket.distinct_days) == (0, 0.0, 0)
+    assert bucket.top_category() == (None, 0.0)
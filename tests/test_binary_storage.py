@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from binary_storage import BinaryStorage, SnapshotError, convert, read_snapshot
+from expense_store import ExpenseStore
+from helpers import expense
+from legacy_loader import load_document
+from storage import JournalStorage
+
+
+def test_snapshot_and_journal_round_trip(tmp_path):
+    path = str(tmp_path / "expenses.bin")
+    storage = BinaryStorage(path, fsync=False)
+    storage.set_budgets([{'period': 'month', 'category': None, 'limit': 300.0}])
+    storage.save([expense(1, "2025-01-01 09:00:00", description="Café ☕"),
+                  expense(2, "2025-01-02 09:00:00", description="")], "dark")
+    storage.update(expense(1, "2025-01-03 09:00:00", 4.5, "🛒 Shopping", "Tea"))
+    storage.delete(2)
+    storage.append(expense(3, "2025-01-04 09:00:00", description="Bus"))
+    storage.close()
+
+    store, data = BinaryStorage(path).load_store()
+    assert list(store.records()) == [expense(1, "2025-01-03 09:00:00", 4.5, "🛒 Shopping", "Tea"),
+                                     expense(3, "2025-01-04 09:00:00", description="Bus")]
+    assert data == {'theme': "dark", 'budgets': [{'period': 'month', 'category': None, 'limit': 300.0}]}
+    assert list(store.latest()) == [1, 0]
+
+
+def test_compaction_unmaps_the_snapshot_before_replacing_it(tmp_path):
+    path = str(tmp_path / "expenses.bin")
+    storage = BinaryStorage(path, compact_every=1, fsync=False)
+    storage.save([expense(i, f"2025-01-{i:02d} 09:00:00", description=f"Row {i}") for i in range(1, 4)], None)
+    store, data = storage.load_store()
+    heap = store.descriptions.heap
+    assert heap.mapped is not None
+
+    storage.append(expense(4, "2025-01-04 09:00:00", description="Row 4"))
+    store.extend([expense(4, "2025-01-04 09:00:00", description="Row 4")])
+    assert storage.compact(store.copy().records(), data['theme'], background=False)
+    storage.close()
+
+    # The live store still reads its rows, now from memory
+    assert heap.mapped is None
+    assert [store.descriptions[row] for row in range(4)] == ["Row 1", "Row 2", "Row 3", "Row 4"]
+    assert [r['description'] for r in BinaryStorage(path).load()['expenses']] == \
+        ["Row 1", "Row 2", "Row 3", "Row 4"]
+
+
+def test_read_snapshot_refuses_other_files(tmp_path):
+    path = tmp_path / "expenses.bin"
+    path.write_bytes(b'{"expenses": []}' * 4)
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+
+def test_convert_normalizes_legacy_files(tmp_path):
+    source = tmp_path / "expenses.json"
+    source.write_text(json.dumps([
+        {"id": 1, "category": "Food", "amount": 43.6, "date": "24/10/2024", "description": "Dinner"},
+        {"id": 2, "category": "Food", "amount": 5, "date": "yesterday", "description": "Snack"}
+    ]), encoding="utf-8")
+    target = str(tmp_path / "expenses.bin")
+
+    assert convert(str(source), target) == (1, 1)
+    assert BinaryStorage(target).load()['expenses'] == [
+        {"id": 1, "category": "🍔 Food", "amount": 43.6, "date": "2024-10-24 00:00:00", "description": "Dinner"}]
+    assert [e['id'] for e in load_document(str(tmp_path / "expenses.rejected.json"))['expenses']] == [2]
+
+    # And back to JSON unchanged
+    assert convert(target, str(tmp_path / "copy.json")) == (1, 0)
+    store, _ = JournalStorage(str(tmp_path / "copy.json")).load_store()
+    assert list(store.records()) == list(ExpenseStore.from_records(
+        BinaryStorage(target).load()['expenses']).records())
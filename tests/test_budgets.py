@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from aggregates import AggregateEngine
+from budgets import BudgetEngine
+from expense_store import ExpenseStore
+from helpers import expense
+
+TODAY = datetime(2025, 3, 12, 15, 0)
+
+
+def add(store, aggregates, budgets, record):
+    row = store.append(record)
+    aggregates.add_row(row)
+    return [(alert.period, alert.category, alert.threshold) for alert in budgets.check(row)]
+
+
+def test_alerts_fire_once_per_threshold_crossed():
+    store = ExpenseStore()
+    aggregates = AggregateEngine(store, workers=1)
+    budgets = BudgetEngine(aggregates, [{'period': 'month', 'category': None, 'limit': 100.0},
+                                        {'period': 'week', 'category': "🍔 Food", 'limit': 20.0}])
+
+    assert add(store, aggregates, budgets, expense(1, "2025-03-10 09:00:00", 15.0)) == []
+    assert add(store, aggregates, budgets, expense(2, "2025-03-11 09:00:00", 2.0)) == [('week', "🍔 Food", 0.8)]
+    assert add(store, aggregates, budgets, expense(3, "2025-03-11 10:00:00", 1.0)) == []
+    # One expense past both thresholds reports only the higher one
+    assert add(store, aggregates, budgets, expense(4, "2025-03-12 09:00:00", 85.0)) == [
+        ('month', None, 1.0), ('week', "🍔 Food", 1.0)]
+    # Other categories and other weeks have their own spend
+    assert add(store, aggregates, budgets, expense(5, "2025-03-12 10:00:00", 5.0, "🛒 Shopping")) == []
+    assert add(store, aggregates, budgets, expense(6, "2025-03-18 09:00:00", 16.0)) == [('week', "🍔 Food", 0.8)]
+
+
+def test_status_falls_back_to_derived_limits():
+    store = ExpenseStore.from_records([expense(1, "2025-03-02 09:00:00", 30.0),
+                                       expense(2, "2025-03-05 09:00:00", 10.0, "🛒 Shopping")])
+    budgets = BudgetEngine(AggregateEngine(store, workers=1), [])
+    budgets.set_limit('month', "🍔 Food", 40.0)
+    budgets.set_limit('month', "🛒 Shopping", 20.0)
+
+    status = budgets.status("This Month", TODAY)
+    assert (status['limit'], status['spent'], status['left']) == (60.0, 40.0, 20.0)
+    assert [c['category'] for c in status['categories']] == ["🍔 Food", "🛒 Shopping"]
+    # "All Time" is judged against the current month; a year limit scales down
+    assert budgets.status("All Time", TODAY)['period'] == 'month'
+    budgets.set_limit('year', None, 1200.0)
+    assert budgets.limit_for('week') == 1200.0 * (12 / 52) / 12
+    assert budgets.status("This Year", TODAY)['limit'] == 1200.0
+
+    budgets.set_limit('month', "🛒 Shopping", 0)
+    assert BudgetEngine(budgets.aggregates, budgets.to_list()).limits == budgets.limits
+    assert budgets.to_list()[0] == {'period': 'month', 'category': "🍔 Food", 'limit': 40.0}
@@ -0,0 +1,76 @@
+import random
+
+from aggregates import AggregateEngine
+from expense_store import ExpenseStore
+from helpers import expense
+from search_index import SearchIndex
+from storage import JournalStorage
+
+CATEGORIES = ["🍔 Food", "🚗 Transportation", "🛒 Shopping"]
+WORDS = ["coffee", "bus", "groceries", "coffee beans", "book", "taxi"]
+
+
+def random_expense(rng, expense_id):
+    return expense(expense_id, f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 09:00:00",
+                   rng.randint(1, 500) / 4, rng.choice(CATEGORIES), rng.choice(WORDS))
+
+
+def edit(store, index, aggregates, row, record):
+    # The order the app and the service use
+    aggregates.remove_row(row)
+    index.unlink_row(row)
+    store.update(row, record)
+    index.link_row(row)
+    aggregates.add_row(row)
+
+
+def delete(store, index, aggregates, row):
+    aggregates.remove_row(row)
+    index.unlink_row(row)
+    store.delete(row)
+
+
+def expected_rows(store, term, category=None):
+    rows = [row for row in store.latest() if term in store.descriptions[row]
+            and (category is None or store.category(row) == category)]
+    return sorted(rows)
+
+
+def test_index_and_aggregates_follow_edits_and_deletes():
+    rng = random.Random(7)
+    store = ExpenseStore.from_records([random_expense(rng, i) for i in range(1, 401)])
+    index = SearchIndex(store)
+    aggregates = AggregateEngine(store, workers=1)
+    for _ in range(300):
+        row = rng.choice(list(store.latest()))
+        if rng.random() < 0.3:
+            delete(store, index, aggregates, row)
+        else:
+            edit(store, index, aggregates, row, random_expense(rng, store.ids[row]))
+
+    for term in ("coffee", "bus", "o", "beans", ""):
+        for category in [None] + CATEGORIES:
+            code = None if category is None else store.category_code(category)
+            assert sorted(index.search(term, code)) == expected_rows(store, term, category)
+    rebuilt = AggregateEngine(store, workers=1)
+    for period in ("All Time", "This Year"):
+        got, want = aggregates.period(period), rebuilt.period(period)
+        assert (got.count, round(got.total, 6)) == (want.count, round(want.total, 6))
+        assert got.day_counts == want.day_counts
+        assert {c: round(t, 6) for c, t in got.category_totals.items()} == \
+            {c: round(t, 6) for c, t in want.category_totals.items()}
+
+
+def test_journal_replays_updates_and_deletes(tmp_path):
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, fsync=False)
+    storage.save([expense(1, "2025-01-01 09:00:00"), expense(2, "2025-01-02 09:00:00")], None)
+    storage.update(expense(1, "2025-01-05 09:00:00", 7.0, "🛒 Shopping", "Book"))
+    storage.delete(2)
+    storage.append(expense(3, "2025-01-03 09:00:00"))
+    storage.delete(3)
+    storage.append(expense(4, "2025-01-04 09:00:00"))
+    storage.close()
+
+    assert JournalStorage(path).load()['expenses'] == [
+        expense(1, "2025-01-05 09:00:00", 7.0, "🛒 Shopping", "Book"), expense(4, "2025-01-04 09:00:00")]
@@ -0,0 +1,69 @@
+import random
+from datetime import datetime
+
+from expense_store import ExpenseStore, TimestampParser
+from helpers import expense
+
+
+def test_store_round_trips_records_column_by_column():
+    records = [expense(1, "2025-03-01 08:30:15", 12.5, "🍔 Food", "Bagel"),
+               expense(2, "2025-03-01 23:59:59", 3.0, "🚗 Transportation", "Bus"),
+               expense(3, "2025-03-02 00:00:00", 40.0, "🍔 Food", "")]
+    store = ExpenseStore.from_records(records)
+    assert len(store) == 3
+    assert list(store.records()) == records
+    assert list(store.amounts) == [12.5, 3.0, 40.0]
+    # Categories are interned once; rows hold small codes
+    assert store.category_names == ["🍔 Food", "🚗 Transportation"]
+    assert list(store.category_codes) == [0, 1, 0]
+    assert store.days[0] == store.days[1] == store.days[2] - 1
+    assert store.timestamps[0] == datetime(2025, 3, 1, 8, 30, 15).timestamp()
+
+
+def test_timestamp_parser_matches_strptime():
+    parser = TimestampParser()
+    for text in ("2025-03-01 08:30:15", "2025-03-01 08:59:59", "2024-02-29 00:00:00", "2025-12-31 23:00:01"):
+        assert parser.parse(text) == datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+def test_single_appends_match_a_bulk_load():
+    records = [expense(i, f"2025-01-{29 - i:02d} 09:00:00", float(i)) for i in range(1, 21)]
+    one_by_one = ExpenseStore()
+    for record in records:
+        one_by_one.append(record)
+    bulk = ExpenseStore.from_records(records)
+    assert list(one_by_one.records()) == list(bulk.records())
+    assert list(one_by_one.latest()) == list(bulk.latest())
+
+
+
+def test_time_index_answers_ranges_and_latest():
+    # Out of order, with a back-dated row and two rows on the same second
+    dates = ["2025-01-05 09:00:00", "2025-01-01 09:00:00", "2025-01-09 09:00:00",
+             "2025-01-05 09:00:00", "2025-01-03 09:00:00"]
+    store = ExpenseStore.from_records([expense(i + 1, d) for i, d in enumerate(dates)])
+    store.append(expense(6, "2025-01-02 09:00:00"))
+
+    def ids(rows):
+        return [store.ids[r] for r in rows]
+
+    start = datetime(2025, 1, 3).timestamp()
+    end = datetime(2025, 1, 9).timestamp()
+    assert sorted(ids(store.rows_between(start, end))) == [1, 4, 5]
+    assert ids(store.latest(2)) == [3, 4]
+    assert ids(store.latest()) == [3, 4, 1, 5, 6, 2]
+    assert ids(store.time_index.newest_first()) == [3, 4, 1, 5, 6, 2]
+    assert ids(store.latest(10)) == ids(store.latest())
+
+
+def test_time_index_matches_a_scan_over_random_bounds():
+    rng = random.Random(3)
+    records = [expense(i, f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                          f"{rng.randint(0, 23):02d}:00:00") for i in range(1, 500)]
+    store = ExpenseStore.from_records(records[:300])
+    for record in records[300:]:
+        store.append(record)
+    for _ in range(50):
+        start, end = sorted(rng.uniform(store.time_index.keys[0], store.time_index.keys[-1]) for _ in range(2))
+        expected = [row for row in range(len(store)) if start <= store.timestamps[row] < end]
+        assert sorted(store.rows_between(start, end)) == expected
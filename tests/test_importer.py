@@ -0,0 +1,56 @@
+from expense_store import ExpenseStore
+from helpers import expense
+from importer import MERCHANT_KEYWORDS, import_file
+from storage import JournalStorage
+
+
+def write_statement(path, rows):
+    path.write_text("Date,Description,Amount\n" + "".join(f"{d},{m},{a}\n" for d, m, a in rows),
+                    encoding="utf-8")
+    return str(path)
+
+
+def run_import(tmp_path, rows, chunk_size=2, store=None):
+    statement = write_statement(tmp_path / "statement.csv", rows)
+    storage = JournalStorage(str(tmp_path / "expenses.json"), fsync=False)
+    store = store or ExpenseStore()
+    result = import_file(statement, store, storage, MERCHANT_KEYWORDS, chunk_size)
+    storage.close()
+    return result, store
+
+
+def test_non_finite_amounts_are_skipped(tmp_path):
+    result, store = run_import(tmp_path, [
+        ("2025-01-01", "Starbucks", "-4.50"),
+        ("2025-01-02", "Shell", "nan"),
+        ("2025-01-03", "Amazon", "-inf"),
+        ("2025-01-04", "Netflix", "-9.99"),
+    ])
+    assert (result.imported, result.skipped) == (2, 2)
+    assert [(r['description'], r['amount']) for r in store.records()] == [("Starbucks", 4.5), ("Netflix", 9.99)]
+
+
+def test_date_format_is_redetected_when_a_later_date_does_not_fit(tmp_path):
+    # The first chunk reads as month/day; 24/10 only fits day/month
+    result, store = run_import(tmp_path, [
+        ("01/02/2025", "Starbucks", "-4.50"),
+        ("03/04/2025", "Shell", "-30.00"),
+        ("24/10/2025", "Amazon", "-12.00"),
+        ("05/11/2025", "Netflix", "-9.99"),
+    ])
+    assert result.skipped == 0
+    assert [r['date'] for r in store.records()][2:] == ["2025-10-24 00:00:00", "2025-11-05 00:00:00"]
+
+
+def test_imported_ids_follow_every_id_ever_used(tmp_path):
+    store = ExpenseStore.from_records([expense(1, "2025-01-01 09:00:00"), expense(7, "2025-01-02 09:00:00")])
+    store.delete(store.row_of(7))
+    rows = [(f"2025-02-{day:02d}", "Coffee", "-3.00") for day in range(1, 6)] + [("bad", "Coffee", "-3.00")]
+    result, store = run_import(tmp_path, rows, store=store)
+    assert (result.imported, result.skipped) == (5, 1)
+    # A deleted id is never handed out again, and skipped lines use none up
+    assert sorted(r['id'] for r in store.records()) == [1, 8, 9, 10, 11, 12]
+    assert store.next_id == 13
+
+    replayed, _ = JournalStorage(str(tmp_path / "expenses.json")).load_store()
+    assert sorted(replayed.ids) == [8, 9, 10, 11, 12]
@@ -0,0 +1,103 @@
+import os
+
+from helpers import expense
+from storage import JournalStorage
+
+
+def ids(data):
+    return sorted(e['id'] for e in data['expenses'])
+
+
+def test_journal_replays_adds_and_settings(tmp_path):
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, fsync=False)
+    storage.save([expense(1, "2025-01-01 09:00:00")], None)
+    storage.append(expense(2, "2025-01-02 09:00:00"))
+    storage.append_many([expense(3, "2025-01-03 09:00:00"), expense(4, "2025-01-04 09:00:00")])
+    storage.set_theme("dark")
+    storage.close()
+
+    data = JournalStorage(path).load()
+    assert ids(data) == [1, 2, 3, 4]
+    assert data['theme'] == "dark"
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, compact_every=2, fsync=False)
+    storage.save([expense(1, "2025-01-01 09:00:00")], None)
+    storage.append_many([expense(2, "2025-01-02 09:00:00"), expense(3, "2025-01-03 09:00:00")])
+    assert storage.needs_compaction()
+    data = storage.load()
+    assert storage.compact(data['expenses'], data['theme'], background=False)
+    storage.close()
+
+    assert not os.path.exists(storage.journal_path)
+    assert not os.path.exists(storage.rotated_path)
+    assert ids(JournalStorage(path).load()) == [1, 2, 3]
+
+
+def test_interrupted_compaction_replays_once(tmp_path):
+    # A rotated journal left behind by a crash, partly in the snapshot already
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, fsync=False)
+    storage.save([expense(1, "2025-01-01 09:00:00"), expense(2, "2025-01-02 09:00:00")], None)
+    storage.append(expense(2, "2025-01-02 09:00:00"))
+    storage.close()
+    os.replace(storage.journal_path, storage.rotated_path)
+
+    writer = JournalStorage(path, fsync=False)
+    writer.append(expense(3, "2025-01-03 09:00:00"))
+    data = writer.load()
+    assert ids(data) == [1, 2, 3]
+    writer.compact(data['expenses'], data['theme'], background=False)
+    writer.close()
+    assert ids(JournalStorage(path).load()) == [1, 2, 3]
+
+
+def test_readers_never_cut_the_journal(tmp_path):
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, fsync=False)
+    storage.append(expense(1, "2025-01-01 09:00:00"))
+    storage.close()
+    with open(storage.journal_path, 'ab') as f:
+        # A corrupt line in the middle, a good one, and a half-written last one
+        f.write(b'{"op": "add", "expense": {\n')
+        f.write(b'{"op": "add", "expense": {"id": 2, "category": "x", "amount": 1, '
+                b'"date": "2025-01-02 09:00:00", "description": ""}}\n')
+        f.write(b'{"op": "add", "expe')
+    size = os.path.getsize(storage.journal_path)
+
+    assert ids(JournalStorage(path).load()) == [1, 2]
+    # A reader, even one racing the writer, leaves the file as it is
+    assert os.path.getsize(storage.journal_path) == size
+
+
+def test_writer_drops_a_torn_last_line_before_appending(tmp_path):
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, fsync=False)
+    storage.append(expense(1, "2025-01-01 09:00:00"))
+    storage.close()
+    with open(storage.journal_path, 'ab') as f:
+        f.write(b'{"op": "add", "expe')
+
+    writer = JournalStorage(path, fsync=False)
+    writer.append(expense(2, "2025-01-02 09:00:00"))
+    writer.close()
+    assert ids(JournalStorage(path).load()) == [1, 2]
+    with open(storage.journal_path, 'rb') as f:
+        assert len(f.read().splitlines()) == 2
+
+
+def test_writer_keeps_a_whole_last_record_missing_its_newline(tmp_path):
+    path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(path, fsync=False)
+    storage.append(expense(1, "2025-01-01 09:00:00"))
+    storage.close()
+    with open(storage.journal_path, 'rb+') as f:
+        f.truncate(os.path.getsize(storage.journal_path) - 1)
+
+    writer = JournalStorage(path, fsync=False)
+    writer.append(expense(2, "2025-01-02 09:00:00"))
+    writer.close()
+    assert ids(JournalStorage(path).load()) == [1, 2]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from analytics import CATEGORY_NAMES
+from legacy_loader import OTHER_CATEGORY, JsonStream, RecordNormalizer, load_document
+from storage import JournalStorage
+
+
+def test_both_file_layouts_load_with_small_read_chunks(tmp_path):
+    records = [{"id": i, "category": "Food", "amount": i * 1.5, "date": "24/10/2024",
+                "description": "Café ☕ \"quoted\" " * (i % 3)} for i in range(1, 40)]
+    bare = tmp_path / "expenses.json"
+    bare.write_text(json.dumps(records), encoding="utf-8")
+    wrapped = tmp_path / "premium.json"
+    wrapped.write_text(json.dumps({"theme": "Ocean Blue", "expenses": records, "budgets": None}),
+                       encoding="utf-8")
+
+    assert load_document(str(bare)) == {'expenses': records, 'theme': None}
+    assert load_document(str(wrapped)) == {'expenses': records, 'theme': "Ocean Blue", 'budgets': None}
+    # Values cut at every possible buffer edge still decode
+    with open(bare, encoding="utf-8") as f:
+        assert list(JsonStream(f, chunk_size=7).iter_array()) == records
+
+
+def test_normalizer_maps_legacy_dates_and_categories():
+    normalizer = RecordNormalizer(CATEGORY_NAMES)
+    assert normalizer.normalize({"id": 1, "category": "Food", "amount": "43.60", "date": "24/10/2024"}) == \
+        {"id": 1, "category": "🍔 Food", "amount": 43.6, "date": "2024-10-24 00:00:00"}
+    assert normalizer.category("transportation") == "🚗 Transportation"
+    assert normalizer.category("🚗 Transportation") == "🚗 Transportation"
+    assert normalizer.category("Pets") == OTHER_CATEGORY
+    assert normalizer.date("2024-10-24T08:30:00") == "2024-10-24 08:30:00"
+    canonical = {"id": 2, "category": "🍔 Food", "amount": 5.0, "date": "2024-10-24 08:30:00"}
+    assert normalizer.normalize(canonical) is canonical
+    with pytest.raises(ValueError):
+        normalizer.date("last tuesday")
+
+
+def test_quarantine_sets_unreadable_records_aside(tmp_path):
+    path = tmp_path / "expenses.json"
+    path.write_text(json.dumps([
+        {"id": 1, "category": "Food", "amount": 1, "date": "01/02/2024"},
+        {"id": 2, "category": "Food", "amount": "lots", "date": "01/02/2024"},
+        {"id": 3, "amount": 1, "date": "01/02/2024"},
+        {"id": 4, "category": "Bills", "amount": 2, "date": "2024-02-02"}
+    ]), encoding="utf-8")
+    normalizer = RecordNormalizer(CATEGORY_NAMES, quarantine=True)
+    store, _ = JournalStorage(str(path)).load_store(normalizer)
+    assert [(r['id'], r['category'], r['date']) for r in store.records()] == [
+        (1, "🍔 Food", "2024-02-01 00:00:00"), (4, "🏠 Bills", "2024-02-02 00:00:00")]
+    assert [r['id'] for r in normalizer.rejected] == [2, 3]
@@ -0,0 +1,42 @@
+import random
+
+from aggregates import AggregateEngine
+from expense_store import ExpenseStore
+from helpers import expense
+from parallel_aggregates import group_rows, parallel_groups
+
+CATEGORIES = ["🍔 Food", "🚗 Transportation", "🛒 Shopping"]
+
+
+def random_records(count, seed):
+    rng = random.Random(seed)
+    return [expense(i, f"{rng.randint(2023, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 09:00:00",
+                    rng.randint(1, 400) / 4, rng.choice(CATEGORIES)) for i in range(1, count + 1)]
+
+
+def rounded(groups):
+    totals, counts = groups
+    return {key: round(total, 6) for key, total in totals.items()}, counts
+
+
+def test_parallel_groups_match_a_single_pass():
+    store = ExpenseStore.from_records(random_records(3000, seed=3))
+    for start, stop in ((0, len(store)), (17, 2011)):
+        want = group_rows(store.days[start:stop], store.amounts[start:stop], store.category_codes[start:stop])
+        got = parallel_groups(store.days, store.amounts, store.category_codes, start, stop, workers=3)
+        assert rounded(got) == rounded(want)
+
+
+def test_parallel_build_matches_the_serial_one():
+    store = ExpenseStore.from_records(random_records(3000, seed=4))
+    for row in range(0, len(store), 7):
+        store.delete(row)
+    serial = AggregateEngine(store, workers=1)
+    parallel = AggregateEngine(store, workers=2)
+    assert serial.buckets.keys() == parallel.buckets.keys()
+    for key, bucket in serial.buckets.items():
+        other = parallel.buckets[key]
+        assert (other.count, round(other.total, 6), other.day_counts) == \
+            (bucket.count, round(bucket.total, 6), bucket.day_counts)
+        assert {c: round(t, 6) for c, t in other.category_totals.items()} == \
+            {c: round(t, 6) for c, t in bucket.category_totals.items()}
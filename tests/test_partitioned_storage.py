@@ -0,0 +1,61 @@
+import os
+from datetime import datetime
+
+from helpers import expense
+from partitioned_storage import PartitionedStorage
+
+
+def by_id(records):
+    return {r['id']: r for r in records}
+
+
+def test_partitioned_round_trip_and_lazy_months(tmp_path):
+    path = str(tmp_path / "expenses.parts")
+    this_month = datetime.now().strftime("%Y-%m")
+    recent = expense(1, f"{this_month}-01 09:00:00", 2.0)
+    old = [expense(2, "2020-01-05 09:00:00", 3.0), expense(3, "2020-01-06 09:00:00", 4.0),
+           expense(4, "2019-06-01 09:00:00", 5.0)]
+    storage = PartitionedStorage(path, fsync=False)
+    storage.save([recent] + old, "light")
+    storage.close()
+    assert sorted(storage.manifest['partitions']) == ["2019-06", "2020-01", this_month]
+    assert storage.manifest['partitions']["2020-01"] == {
+        'file': storage.manifest['partitions']["2020-01"]['file'], 'rows': 2, 'max_id': 3}
+
+    storage = PartitionedStorage(path, fsync=False)
+    store, data = storage.load_store()
+    assert data['theme'] == "light"
+    assert list(store.ids) == [1]
+    assert storage.unloaded_months() == {"2019-06", "2020-01"}
+    assert storage.partition_rows({"2020-01"}) == 2
+    # Ids stay clear of rows still on disk
+    assert store.next_id == 5
+
+    # Edit rows of an older month once it is read: move one into this month,
+    # delete another
+    store.extend(storage.read_partitions({"2020-01"}))
+    assert sorted(store.ids) == [1, 2, 3]
+    assert storage.unloaded_months() == {"2019-06"}
+    moved = expense(2, f"{this_month}-02 09:00:00", 3.0)
+    storage.update(moved)
+    storage.delete(3)
+    storage.close()
+
+    # After a restart the journal applies to months left on disk as they are read
+    storage = PartitionedStorage(path, fsync=False)
+    store, _ = storage.load_store()
+    assert by_id(store.records()) == {1: recent, 2: moved}
+    store.extend(storage.read_partitions(None))
+    assert by_id(store.records()) == {1: recent, 2: moved, 4: old[2]}
+
+    # Compaction rewrites the touched months under new file names
+    old_file = storage.manifest['partitions']["2020-01"]['file']
+    old_2019 = storage.manifest['partitions']["2019-06"]['file']
+    storage.compact(store.records(), "light", background=False)
+    storage.close()
+    assert "2020-01" not in storage.manifest['partitions']
+    assert storage.manifest['partitions'][this_month]['rows'] == 2
+    assert storage.manifest['partitions']["2019-06"]['file'] == old_2019
+    storage = PartitionedStorage(path, fsync=False, lazy=False)
+    assert by_id(storage.load()['expenses']) == by_id(store.records())
+    assert not os.path.exists(os.path.join(path, old_file))
@@ -0,0 +1,43 @@
+from expense_store import ExpenseStore
+from helpers import expense
+from query_cache import QueryCache
+from search_index import SearchIndex
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QueryCache(max_entries=2)
+    computed = []
+
+    def compute(value):
+        return lambda: computed.append(value) or value
+
+    assert cache.get('a', compute(1)) == 1
+    assert cache.get('b', compute(2)) == 2
+    assert cache.get('a', compute(10)) == 1
+    assert cache.get('c', compute(3)) == 3
+    # 'b' was the least recently used
+    assert cache.get('b', compute(20)) == 20
+    assert cache.get('a', compute(30)) == 30
+    assert computed == [1, 2, 3, 20, 30]
+    assert cache.stats() == {'entries': 2, 'hits': 1, 'misses': 5, 'evictions': 3, 'hit_rate': 1 / 6}
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_version_keys_never_serve_results_from_before_a_change():
+    store = ExpenseStore.from_records([expense(1, "2025-01-01 09:00:00", description="Coffee")])
+    index = SearchIndex(store)
+    cache = QueryCache()
+
+    def search(term):
+        return cache.get((None, term, store.version), lambda: list(index.search(term, None)))
+
+    assert search("coffee") == [0]
+    assert search("coffee") == [0]
+    row = store.append(expense(2, "2025-01-02 09:00:00", description="Coffee beans"))
+    index.add_row(row)
+    assert sorted(search("coffee")) == [0, 1]
+    index.unlink_row(0)
+    store.delete(0)
+    assert search("coffee") == [1]
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,65 @@
+from refresh_scheduler import RefreshScheduler
+
+
+class IdleRoot:
+    # Tk's after_idle(), run by hand
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after_idle(self, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def idle(self):
+        pending, self.pending = self.pending, {}
+        for callback in pending.values():
+            callback()
+
+
+def scheduler_with_views(root, ready=None):
+    rendered = []
+    scheduler = RefreshScheduler(root, ready)
+    scheduler.register('summary', lambda: rendered.append('summary'), ['data', 'period'])
+    scheduler.register('charts', lambda: rendered.append('charts'), ['data', 'period', 'theme'])
+    scheduler.register('list', lambda: rendered.append('list'), ['data', 'search'])
+    return scheduler, rendered
+
+
+def test_changes_coalesce_into_one_render_of_dirty_views():
+    root = IdleRoot()
+    scheduler, rendered = scheduler_with_views(root)
+    scheduler.invalidate('search')
+    scheduler.invalidate('theme')
+    scheduler.invalidate('search')
+    assert rendered == [] and len(root.pending) == 1
+    root.idle()
+    assert rendered == ['charts', 'list']
+
+    rendered.clear()
+    scheduler.invalidate()
+    scheduler.flush()
+    assert rendered == ['summary', 'charts', 'list']
+    # flush() took the pending idle callback with it
+    assert root.pending == {}
+
+    costs = scheduler.view_costs()
+    assert {name: (cost['renders'], cost['skipped']) for name, cost in costs.items()} == \
+        {'summary': (1, 1), 'charts': (2, 0), 'list': (2, 0)}
+
+
+def test_views_stay_dirty_until_ready():
+    root = IdleRoot()
+    ready = [False]
+    scheduler, rendered = scheduler_with_views(root, lambda: ready[0])
+    scheduler.invalidate('period')
+    root.idle()
+    assert rendered == []
+    ready[0] = True
+    scheduler.invalidate('search')
+    root.idle()
+    assert rendered == ['summary', 'charts', 'list']
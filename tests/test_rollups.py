@@ -0,0 +1,64 @@
+import json
+
+from aggregates import AggregateEngine, rollup_path
+from analytics import report
+from expense_store import ExpenseStore
+from helpers import expense
+from storage import JournalStorage
+
+
+def records(count):
+    return [expense(i, f"2025-01-{i:02d} 09:00:00", 10.0) for i in range(1, count + 1)]
+
+
+def same_cube(engine, expected):
+    assert engine.buckets.keys() == expected.buckets.keys()
+    for key, bucket in expected.buckets.items():
+        assert (engine.buckets[key].total, engine.buckets[key].count) == (bucket.total, bucket.count)
+        assert engine.buckets[key].day_counts == bucket.day_counts
+
+
+def test_saved_rollups_reload_and_fold_in_newer_rows(tmp_path):
+    path = str(tmp_path / "expenses.rollups.json")
+    store = ExpenseStore.from_records(records(5))
+    AggregateEngine(store, workers=1).save(path)
+
+    store.extend([expense(6, "2025-02-01 09:00:00", 7.5, "🚗 Transportation")])
+    loaded = AggregateEngine.load(store, path, workers=1)
+    same_cube(loaded, AggregateEngine(store, workers=1))
+    assert loaded.period("All Time").total == 57.5
+
+
+def test_rollups_are_rebuilt_after_an_edit_elsewhere(tmp_path):
+    data_path = str(tmp_path / "expenses.json")
+    storage = JournalStorage(data_path, fsync=False)
+    storage.save(records(5), None)
+    store, _ = storage.load_store()
+    AggregateEngine(store, workers=1).save(rollup_path(data_path))
+
+    # Another writer edits an early row; row count and the last row are unchanged
+    storage.update(expense(2, "2025-01-02 09:00:00", 1000.0))
+    storage.close()
+
+    result = report(data_path, ["All Time"], workers=1)
+    assert result['periods'][0]['total_spent'] == 1040.0
+
+
+def test_rollups_are_rebuilt_after_a_category_rename(tmp_path):
+    path = str(tmp_path / "expenses.rollups.json")
+    AggregateEngine(ExpenseStore.from_records(records(3)), workers=1).save(path)
+
+    renamed = [dict(r, category="🛒 Shopping") for r in records(3)]
+    store = ExpenseStore.from_records(renamed)
+    loaded = AggregateEngine.load(store, path, workers=1)
+    assert loaded.category_totals(loaded.period("All Time")) == {"🛒 Shopping": 30.0}
+
+
+def test_unreadable_or_missing_rollups_rebuild(tmp_path):
+    store = ExpenseStore.from_records(records(3))
+    path = tmp_path / "expenses.rollups.json"
+    path.write_text(json.dumps({'version': 1, 'rows': "3"}), encoding="utf-8")
+    assert AggregateEngine.load(store, str(path), workers=1).period("All Time").total == 30.0
+    assert AggregateEngine.load(store, str(tmp_path / "missing.json"), workers=1).period("All Time").count == 3
+    # Data without a local file has no cache at all
+    assert AggregateEngine.load(store, None, workers=1).period("All Time").count == 3
@@ -0,0 +1,60 @@
+from expense_store import ExpenseStore
+from helpers import expense
+from search_index import SearchIndex
+
+DESCRIPTIONS = ["Coffee beans", "coffee shop", "Bus ticket", "Book: The Coffee Trader", "Taxi", "Cafe #12"]
+
+
+def indexed(count=60):
+    records = [expense(i, f"2025-01-{i % 28 + 1:02d} {i % 24:02d}:00:00",
+                       category=["🍔 Food", "🚗 Transportation"][i % 2],
+                       description=DESCRIPTIONS[i % len(DESCRIPTIONS)]) for i in range(1, count + 1)]
+    store = ExpenseStore.from_records(records)
+    return store, SearchIndex(store)
+
+
+def scan(store, term, category=None):
+    return [row for row in range(len(store))
+            if term in store.descriptions[row].lower() and (category is None or store.category(row) == category)]
+
+
+def test_search_matches_a_substring_scan():
+    store, index = indexed()
+    for term in ("coffee", "COFFEE", "cof", "c", "ee t", "cafe #1", "bus ticket", "zzz"):
+        for category in (None, "🍔 Food", "🚗 Transportation"):
+            code = None if category is None else store.category_code(category)
+            rows = index.search(term, code)
+            assert sorted(rows) == sorted(scan(store, term.lower(), category))
+            timestamps = [store.timestamps[row] for row in rows]
+            assert timestamps == sorted(timestamps, reverse=True)
+
+
+def test_limited_search_returns_the_newest_matches():
+    store, index = indexed()
+    for term in ("coffee", "", "taxi"):
+        rows = index.search(term, limit=5)
+        everything = index.search(term)
+        assert [store.timestamps[r] for r in rows] == [store.timestamps[r] for r in everything[:5]]
+
+
+def test_new_rows_are_searchable():
+    store, index = indexed()
+    row = store.append(expense(100, "2025-02-01 09:00:00", description="Flat white"))
+    index.add_row(row)
+    assert index.search("white") == [row]
+    assert index.search("", limit=1) == [row]
+
+
+def test_search_view_pages_through_every_match():
+    store, index = indexed(600)
+    for term, category in (("coffee", None), ("", "🍔 Food"), ("taxi", "🍔 Food"), ("", None)):
+        code = None if category is None else store.category_code(category)
+        view = index.search_view(term, code)
+        rows = []
+        while True:
+            page = list(view.page(len(rows), 50))
+            if not page:
+                break
+            rows.extend(page)
+        assert len(view) == len(rows)
+        assert sorted(rows) == sorted(scan(store, term, category))
@@ -0,0 +1,67 @@
+import itertools
+import threading
+import time
+
+from search_scheduler import SearchScheduler
+
+
+class FakeRoot:
+    # Just enough of Tk's after() for the scheduler; pump() plays the main loop
+    def __init__(self):
+        self.pending = {}
+        self.ids = itertools.count()
+
+    def after(self, ms, callback, *args):
+        after_id = next(self.ids)
+        self.pending[after_id] = (time.monotonic() + ms / 1000, callback, args)
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def pump(self, until, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            now = time.monotonic()
+            for after_id, (due, callback, args) in sorted(self.pending.items(), key=lambda item: item[1][0]):
+                if due <= now:
+                    del self.pending[after_id]
+                    callback(*args)
+            time.sleep(0.001)
+        return until()
+
+
+def test_keystrokes_are_debounced_into_one_search():
+    root = FakeRoot()
+    searched, rendered = [], []
+    scheduler = SearchScheduler(root, lambda term: searched.append(term) or term.upper(), rendered.append,
+                                delay_ms=30, poll_ms=1)
+    for term in ("c", "co", "cof"):
+        scheduler.request(term)
+    assert root.pump(lambda: rendered)
+    assert searched == ["cof"]
+    assert rendered == ["COF"]
+    assert scheduler.latency_stats()['renders'] == 1
+    assert scheduler.cancelled == 2
+
+
+def test_a_result_superseded_while_running_is_never_rendered():
+    root = FakeRoot()
+    started, release = threading.Event(), threading.Event()
+    rendered = []
+
+    def search(term):
+        if term == "slow":
+            started.set()
+            release.wait(5)
+        return term
+
+    scheduler = SearchScheduler(root, search, rendered.append, delay_ms=0, poll_ms=1)
+    scheduler.request("slow")
+    assert root.pump(started.is_set)
+    scheduler.request("fast")
+    root.pump(lambda: rendered, timeout=0.2)
+    release.set()
+    assert root.pump(lambda: rendered)
+    root.pump(lambda: False, timeout=0.05)
+    assert rendered == ["fast"]
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from expense_service import ExpenseService
+from helpers import expense
+from service_client import ServiceClient, ServiceStorage
+from service_errors import ServiceError
+from storage import JournalStorage
+
+
+@pytest.fixture
+def service(tmp_path):
+    # The service on its own event loop thread, on a free port
+    path = str(tmp_path / "expenses.json")
+    seed = JournalStorage(path, fsync=False)
+    seed.save([expense(1, "2025-01-01 09:00:00")], "Dark Professional")
+    seed.close()
+
+    service = ExpenseService(JournalStorage(path, fsync=False))
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def stop():
+        server.close()
+        await server.wait_closed()
+        await service.stop()
+
+    def stop_and_reload():
+        asyncio.run_coroutine_threadsafe(stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        return JournalStorage(path).load()
+
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", stop_and_reload
+
+
+def test_concurrent_writes_are_all_committed(service):
+    url, stop_and_reload = service
+
+    def add(worker):
+        client = ServiceClient(url)
+        for i in range(20):
+            client.request('POST', '/expenses', {"category": "🍔 Food", "amount": 1.0 + worker,
+                                                 "date": "2025-01-02 09:00:00", "description": f"{worker}/{i}"})
+        client.close()
+
+    workers = [threading.Thread(target=add, args=(n,)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    storage = ServiceStorage(url)
+    storage.update(expense(1, "2025-01-01 09:00:00", 50.0))
+    stats = storage.client.request('GET', '/stats')
+    storage.close()
+    # Every write went through a group commit
+    assert stats['committed'] == 81
+    assert 1 <= stats['commits'] <= 81
+
+    data = stop_and_reload()
+    assert len(data['expenses']) == 81
+    assert len({e['id'] for e in data['expenses']}) == 81
+    assert sum(e['amount'] for e in data['expenses']) == 50.0 + 20 * (1 + 2 + 3 + 4)
+
+
+def test_refused_changes_raise_and_change_nothing(service):
+    url, stop_and_reload = service
+    storage = ServiceStorage(url)
+    with pytest.raises(ServiceError) as refused:
+        storage.append(expense(1, "2025-01-03 09:00:00"))
+    assert refused.value.status == 409
+    with pytest.raises(ServiceError) as refused:
+        storage.delete(99)
+    assert refused.value.status == 404
+    with pytest.raises(ServiceError) as refused:
+        storage.set_theme("Neon")
+    assert refused.value.status == 400
+    storage.set_theme("Ocean Blue")
+    storage.close()
+
+    data = stop_and_reload()
+    assert data['expenses'] == [expense(1, "2025-01-01 09:00:00")]
+    assert data['theme'] == "Ocean Blue"
@@ -0,0 +1,56 @@
+import json
+
+from helpers import expense
+from legacy_loader import load_document
+from sqlite_storage import SQLiteStorage, migrate_json
+
+
+def test_sqlite_round_trip_with_edits(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    storage = SQLiteStorage(path)
+    assert not storage.exists()
+    storage.append_many([expense(1, "2025-01-01 09:00:00", description="Coffee beans"),
+                         expense(2, "2025-01-02 09:00:00", description="Coffee shop")])
+    storage.update(expense(1, "2025-01-05 09:00:00", 12.0, "🛒 Shopping", "Tea leaves"))
+    # Re-adding an id, as a repeated import does, replaces the row
+    storage.append(expense(2, "2025-01-02 09:00:00", description="Bakery"))
+    storage.append(expense(3, "2025-01-03 09:00:00"))
+    storage.delete(3)
+    storage.set_theme("dark")
+    storage.set_budgets([{'period': 'month', 'category': None, 'limit': 300.0}])
+    storage.close()
+
+    storage = SQLiteStorage(path)
+    assert storage.exists()
+    data = storage.load()
+    assert data['expenses'] == [expense(1, "2025-01-05 09:00:00", 12.0, "🛒 Shopping", "Tea leaves"),
+                                expense(2, "2025-01-02 09:00:00", description="Bakery")]
+    assert data['theme'] == "dark"
+    assert data['budgets'] == [{'period': 'month', 'category': None, 'limit': 300.0}]
+
+    storage.save([expense(4, "2025-01-04 09:00:00")], "light")
+    data = storage.load()
+    storage.close()
+    assert data['expenses'] == [expense(4, "2025-01-04 09:00:00")]
+    assert data['theme'] == "light"
+
+
+def test_migrate_normalizes_legacy_files(tmp_path):
+    source = tmp_path / "expenses.json"
+    source.write_text(json.dumps([
+        {"id": 1, "category": "Food", "amount": 43.6, "date": "24/10/2024", "description": "Dinner"},
+        {"id": 2, "category": "Transportation", "amount": "12.5", "date": "21/10/2024", "description": "Bus"},
+        {"id": 3, "category": "Food", "amount": 5, "date": "yesterday", "description": "Snack"}
+    ]), encoding="utf-8")
+    target = str(tmp_path / "expenses.db")
+
+    assert migrate_json(str(source), target) == (2, 1)
+    storage = SQLiteStorage(target)
+    data = storage.load()
+    storage.close()
+    assert data['expenses'] == [
+        {"id": 1, "category": "🍔 Food", "amount": 43.6, "date": "2024-10-24 00:00:00", "description": "Dinner"},
+        {"id": 2, "category": "🚗 Transportation", "amount": 12.5, "date": "2024-10-21 00:00:00",
+         "description": "Bus"}
+    ]
+    assert [e['id'] for e in load_document(str(tmp_path / "expenses.rejected.json"))['expenses']] == [3]
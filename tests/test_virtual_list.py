@@ -0,0 +1,95 @@
+import itertools
+
+import pytest
+
+import virtual_list
+from expense_store import ExpenseStore, NewestFirstView, RowListView
+from helpers import expense
+
+
+class FakeTree:
+    # The Treeview calls VirtualTreeview makes, kept in a dict; no display needed
+    def __init__(self, *args, **kwargs):
+        self.items = {}
+        self.ids = itertools.count()
+        self.writes = 0
+
+    def bind(self, *args):
+        pass
+
+    def insert(self, parent, index, values):
+        item = f"I{next(self.ids)}"
+        self.items[item] = values
+        self.writes += 1
+        return item
+
+    def item(self, item, values):
+        self.items[item] = values
+        self.writes += 1
+
+    def delete(self, *items):
+        for item in items:
+            del self.items[item]
+
+
+class FakeScrollbar:
+    def __init__(self, *args, **kwargs):
+        self.position = None
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+@pytest.fixture
+def listing(monkeypatch):
+    monkeypatch.setattr(virtual_list.ttk, "Treeview", FakeTree)
+    monkeypatch.setattr(virtual_list.ttk, "Scrollbar", FakeScrollbar)
+    store = ExpenseStore.from_records([expense(i, f"2025-01-{i % 28 + 1:02d} {i % 24:02d}:00:00")
+                                       for i in range(1, 101)])
+    view = virtual_list.VirtualTreeview(None, ("id",), lambda row: (store.ids[row],), height=10)
+    return store, view
+
+
+def shown(view):
+    return [values[0] for values in view.tree.items.values()]
+
+
+def test_only_the_visible_window_is_in_the_tree(listing):
+    store, view = listing
+    view.set_source(NewestFirstView(store))
+    newest = [store.ids[row] for row in store.latest()]
+    assert shown(view) == newest[:10]
+    assert view.scrollbar.position == (0.0, 0.1)
+
+    view.scroll(25)
+    assert shown(view) == newest[25:35]
+    view.yview('scroll', 1, 'pages')
+    assert shown(view) == newest[35:45]
+    # Past the end clamps to the last full window
+    view.yview('moveto', '0.99')
+    assert shown(view) == newest[90:]
+    assert len(view.tree.items) == 10
+
+
+def test_a_shorter_source_drops_slots_and_maps_items_to_rows(listing):
+    store, view = listing
+    view.set_source(NewestFirstView(store))
+    view.set_source(RowListView([5, 3, 1]))
+    assert shown(view) == [store.ids[5], store.ids[3], store.ids[1]]
+    assert [view.row_for_item(item) for item in view.tree.items] == [5, 3, 1]
+    assert view.row_for_item("gone") is None
+    assert view.scrollbar.position == (0.0, 1.0)
+
+    # Unchanged slots are not rewritten
+    writes = view.tree.writes
+    view.refresh()
+    assert view.tree.writes == writes
+
+
+def test_newest_first_view_pages():
+    store = ExpenseStore.from_records([expense(i, f"2025-01-{i:02d} 09:00:00") for i in range(1, 8)])
+    view = NewestFirstView(store)
+    assert len(view) == 7
+    assert [store.ids[r] for r in view.page(0, 3)] == [7, 6, 5]
+    assert [store.ids[r] for r in view.page(6, 3)] == [1]
+    assert list(view.page(7, 3)) == []
@@ -0,0 +1,100 @@
+# Color tokens of every theme, by name. Plain data, so the service can
+# validate a theme without importing tkinter.
+THEMES = {
+    "Dark Professional": {
+        'primary': '#3b82f6',
+        'secondary': '#1e293b',
+        'accent': '#f59e0b',
+        'success': '#10b981',
+        'danger': '#ef4444',
+        'dark': '#0f172a',
+        'light': '#f8fafc',
+        'card': '#1e293b',
+        'text_light': '#f8fafc',
+        'text_dark': '#0f172a'
+    },
+    "Light Modern": {
+        'primary': '#2563eb',
+        'secondary': '#e2e8f0',
+        'accent': '#d97706',
+        'success': '#059669',
+        'danger': '#dc2626',
+        'dark': '#ffffff',
+        'light': '#1e293b',
+        'card': '#f1f5f9',
+        'text_light': '#1e293b',
+        'text_dark': '#ffffff'
+    },
+    "Pink Cute": {
+        'primary': '#ec4899',
+        'secondary': '#fbcfe8',
+        'accent': '#f59e0b',
+        'success': '#10b981',
+        'danger': '#ef4444',
+        'dark': '#fdf2f8',
+        'light': '#831843',
+        'card': '#fce7f3',
+        'text_light': '#831843',
+        'text_dark': '#fdf2f8'
+    },
+    "Ocean Blue": {
+        'primary': '#06b6d4',
+        'secondary': '#cffafe',
+        'accent': '#8b5cf6',
+        'success': '#10b981',
+        'danger': '#ef4444',
+        'dark': '#ecfeff',
+        'light': '#164e63',
+        'card': '#cffafe',
+        'text_light': '#164e63',
+        'text_dark': '#ecfeff'
+    },
+    "Forest Green": {
+        'primary': '#16a34a',
+        'secondary': '#dcfce7',
+        'accent': '#ca8a04',
+        'success': '#16a34a',
+        'danger': '#dc2626',
+        'dark': '#f0fdf4',
+        'light': '#166534',
+        'card': '#dcfce7',
+        'text_light': '#166534',
+        'text_dark': '#f0fdf4'
+    }
+}
+
+
+class ThemeRegistry:
+    # Widgets subscribe their color options to theme tokens ('primary', 'card',
+    # 'text_light', ...). apply() recolors every subscriber in place, so a theme
+    # switch costs the same however much data is loaded.
+    def __init__(self, colors):
+        self.colors = colors
+        self._bindings = []
+        self._listeners = []
+
+    def bind(self, widget, **tokens):
+        self._bindings.append((widget, tokens))
+        widget.configure(**{option: self.colors[token] for option, token in tokens.items()})
+        return widget
+
+    def subscribe(self, callback):
+        # callback(colors) runs after widgets are recolored, e.g. for ttk styles and charts
+        self._listeners.append(callback)
+        callback(self.colors)
+
+    def apply(self, colors):
+        import tkinter as tk
+
+        self.colors = colors
+        alive = []
+        for widget, tokens in self._bindings:
+            try:
+                widget.configure(**{option: colors[token] for option, token in tokens.items()})
+            except tk.TclError:
+                # Widget was destroyed; stop tracking it
+                continue
+            alive.append((widget, tokens))
+        self._bindings = alive
+        for callback in self._listeners:
+            callback(colors)
@@ -0,0 +1,84 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTreeview:
+    # A Treeview that only ever holds the visible window of rows. The source is
+    # any object with len() and page(offset, limit); scrolling fetches the next
+    # window from it and rewrites only the slots whose values changed.
+    def __init__(self, parent, columns, format_row, height=12, **tree_options):
+        self.format_row = format_row
+        self.height = height
+        self.source = ()
+        self.offset = 0
+        self.visible_rows = []
+        self._slots = []
+        self._values = []
+
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", height=height, **tree_options)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-1))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(1))
+        self.tree.bind('<Prior>', lambda e: self.scroll(-self.height))
+        self.tree.bind('<Next>', lambda e: self.scroll(self.height))
+
+    def pack(self):
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    def set_source(self, source, keep_position=False):
+        self.source = source
+        if not keep_position:
+            self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        total = len(self.source)
+        self.offset = max(0, min(self.offset, total - self.height))
+        rows = list(self.source.page(self.offset, self.height)) if total else []
+        values = [self.format_row(row) for row in rows]
+
+        for slot, row_values in enumerate(values):
+            if slot < len(self._slots):
+                if self._values[slot] != row_values:
+                    self.tree.item(self._slots[slot], values=row_values)
+            else:
+                self._slots.append(self.tree.insert("", "end", values=row_values))
+        if len(self._slots) > len(values):
+            self.tree.delete(*self._slots[len(values):])
+            del self._slots[len(values):]
+
+        self._values = values
+        self.visible_rows = rows
+        self._update_scrollbar(total)
+
+    def _update_scrollbar(self, total):
+        if total <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.height) / total)
+
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.source))
+            self.refresh()
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            self.scroll(step * self.height if args[2] == 'pages' else step)
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.refresh()
+        return "break"
+
+    def row_for_item(self, item):
+        # Store row number behind a Treeview item id
+        if item in self._slots:
+            slot = self._slots.index(item)
+            if slot < len(self.visible_rows):
+                return self.visible_rows[slot]
+        return None